@@ -1,4 +1,6 @@
 from flask import Flask, request, make_response, jsonify
+import click
+import json
 import mysql.connector
 import hashlib
 import uuid
@@ -9,18 +11,54 @@ from functools import wraps # Import wraps for decorator
 from .courses_routes import courses_bp
 from .content_routes import content_bp
 from .views_routes import views_bp
-from .utilities import (connect_to_mysql,
-generate_salt, generate_hashed_password, get_next_user_id,
-get_next_student_id, get_next_lec_id, create_jwt, decode_jwt, token_required)
+from .calendar_routes import calendar_bp
+from .export_routes import export_bp
+from .db_pool import all_pool_stats
+from .statements import fetch_one, statement_stats
+from .report_tables import rebuild_reports
+from .blob_store import get_blob_store, migrate_blobs, collect_garbage
+from .migrations import run_migrations, explain_route_queries
+from .counters import reconcile_counters
+from .bulk_loader import BulkLoader, discover_inputs, refresh_after_load
+from .dataset_generator import generate_dataset
+from .load_test import LoadTest, sample_accounts, format_results, compare_results
+from .response_cache import configure_report_cache
+from .grade_stats import configure_grade_stats_cache
+from .serializer import init_serialization, benchmark_serialization
+from .metrics import init_metrics
+from .query_diagnostics import init_query_diagnostics
+from .token_cache import token_cache
+from .password_hashing import (password_hasher, configure_password_hasher,
+calibrate_iterations, HashingBusyError)
+from .utilities import (connect_to_mysql, release_request_connection,
+generate_salt, get_next_user_id,
+get_next_student_id, get_next_lec_id, get_next_id, create_jwt, decode_jwt, token_required, revoke_token)
 
 app = Flask(__name__)
 app.config.from_object(Config)
+configure_report_cache(app.config)
+configure_grade_stats_cache(app.config)
+token_cache.max_entries = app.config['TOKEN_CACHE_MAX_ENTRIES']
+token_cache.ttl = app.config['TOKEN_CACHE_TTL']
+configure_password_hasher(app.config)
 # app.config['VALID_DEPARTMENTS']
 
 
 app.register_blueprint(courses_bp)
 app.register_blueprint(content_bp)
 app.register_blueprint(views_bp)
+app.register_blueprint(calendar_bp)
+app.register_blueprint(export_bp)
+
+# Hand each request's pooled connection back when the request ends
+app.teardown_appcontext(release_request_connection)
+
+# orjson-backed jsonify and gzip/brotli responses (COMPRESS_RESPONSES)
+init_serialization(app)
+# Per-route request/DB metrics on /metrics (METRICS_ENABLED)
+init_metrics(app)
+# N+1 detection, slow-query log and query budgets in development (QUERY_DIAGNOSTICS)
+init_query_diagnostics(app)
 
 #  python -m venv venv
 # .\venv\Scripts\activate
@@ -29,6 +67,147 @@ app.register_blueprint(views_bp)
 
 
 
+@app.cli.command('rebuild-reports')
+def rebuild_reports_command():
+    """Repopulates the materialized report tables from the base tables."""
+    cnx = connect_to_mysql(app.config)
+    for table, result in rebuild_reports(cnx).items():
+        print(f"{table}: {result['rows']} rows in {result['elapsed_seconds']}s")
+
+
+@app.cli.command('migrate')
+@click.option('--explain', is_flag=True, help='Print EXPLAIN plans of route queries before and after.')
+def migrate_command(explain):
+    """Applies pending schema migrations (indexes, generated columns, new tables)."""
+    cnx = connect_to_mysql(app.config)
+    if explain:
+        print("== Plans before migrating")
+        explain_route_queries(cnx)
+    run_migrations(cnx)
+    if explain:
+        print("== Plans after migrating")
+        explain_route_queries(cnx)
+
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Repairs drift in Student/Lecturer.CourseCount."""
+    cnx = connect_to_mysql(app.config)
+    for table, repaired in reconcile_counters(cnx).items():
+        print(f"{table}: {repaired} counters repaired")
+
+
+@app.cli.command('migrate-blobs')
+@click.option('--batch-size', default=100, help='Rows moved per committed batch.')
+def migrate_blobs_command(batch_size):
+    """Moves CourseContent/Submission BLOBs into the blob store."""
+    cnx = connect_to_mysql(app.config)
+    for table, moved in migrate_blobs(cnx, get_blob_store(app.config), batch_size).items():
+        print(f"{table}: {moved} rows moved")
+
+
+@app.cli.command('gc-blobs')
+def gc_blobs_command():
+    """Deletes blobs no CourseContent or Submission row refers to."""
+    cnx = connect_to_mysql(app.config)
+    result = collect_garbage(cnx, get_blob_store(app.config), app.config['BLOB_GC_GRACE_SECONDS'])
+    print(f"Repaired {result['refcounts_repaired']} reference counts, deleted {result['deleted']} "
+          f"unreferenced and {result['orphans_deleted']} orphaned blobs")
+
+
+@app.cli.command('generate-dataset')
+@click.argument('directory', type=click.Path(file_okay=False))
+@click.option('--students', default=1000000)
+@click.option('--courses', default=10000)
+@click.option('--seed', default=42, help='Same seed and options always produce the same files.')
+@click.option('--course-skew', default=1.0, help='Zipf exponent of course popularity; 0 is uniform.')
+@click.option('--student-skew', default=1.5, help='Pareto shape of student activity; lower is more skewed.')
+@click.option('--assignments-per-course', default=3)
+@click.option('--submit-rate', default=0.5, help='Mean share of assignments a student submits.')
+@click.option('--grade-rate', default=0.8, help='Share of submissions that are graded.')
+def generate_dataset_command(directory, students, courses, seed, course_skew, student_skew,
+                             assignments_per_course, submit_rate, grade_rate):
+    """Writes a large reproducible dataset as <Table>.csv files for `flask load-dataset`."""
+    rows = generate_dataset(directory, students=students, courses=courses, seed=seed,
+                            course_skew=course_skew, student_skew=student_skew,
+                            assignments_per_course=assignments_per_course,
+                            submit_rate=submit_rate, grade_rate=grade_rate)
+    for table, count in rows.items():
+        print(f"{table}: {count} rows")
+
+
+@app.cli.command('load-dataset')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False), default='sql_generation')
+@click.option('--batch-rows', default=5000, help='Rows per multi-row INSERT for .sql inputs.')
+@click.option('--workers', default=4, help='Tables loaded in parallel within a dependency level.')
+@click.option('--no-refresh', is_flag=True, help='Skip counter reconciliation and report rebuild afterwards.')
+def load_dataset_command(directory, batch_rows, workers, no_refresh):
+    """Bulk-loads insert_*.sql and <Table>.csv files from DIRECTORY."""
+    inputs = discover_inputs(directory)
+    if not inputs:
+        raise click.ClickException(f"No insert_*.sql or .csv files in {directory}")
+    loader = BulkLoader({
+        'host': app.config['MYSQL_HOST'],
+        'user': app.config['MYSQL_USER'],
+        'password': app.config['MYSQL_PASSWORD'],
+        'database': app.config['MYSQL_DB'],
+        'port': app.config['MYSQL_PORT'],
+    }, batch_rows=batch_rows, workers=workers)
+    loaded = loader.load(inputs)
+    print(f"Loaded {sum(loaded.values())} rows into {len(loaded)} tables")
+    if not no_refresh:
+        refresh_after_load(connect_to_mysql(app.config))
+        print("Counters reconciled, reports rebuilt, ID sequences raised past the loaded IDs")
+        print("Restart running servers: ID blocks they reserved before the load may collide with loaded rows")
+
+
+@app.cli.command('load-test')
+@click.argument('dataset_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--base-url', default='http://127.0.0.1:5000', help='Server under test.')
+@click.option('--concurrency', default=16, help='Concurrent virtual clients.')
+@click.option('--duration', default=60.0, help='Seconds to drive load for.')
+@click.option('--students', default=200, help='Generated students to log in as.')
+@click.option('--lecturers', default=20, help='Generated lecturers to log in as.')
+@click.option('--seed', default=0)
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the results as JSON here.')
+@click.option('--compare', 'baseline', type=click.File(), help='Earlier results JSON to check for regressions.')
+def load_test_command(dataset_dir, base_url, concurrency, duration, students, lecturers, seed, output, baseline):
+    """Drives a weighted route mix as generated users and reports latency percentiles."""
+    accounts = sample_accounts(dataset_dir, students, lecturers, seed)
+    test = LoadTest(base_url, accounts, concurrency=concurrency, duration=duration, seed=seed)
+    test.prepare()
+    results = test.run()
+    print(format_results(results))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {output}")
+    if baseline:
+        regressions = compare_results(json.load(baseline), results)
+        print("\n".join(regressions) if regressions else "No regressions against baseline")
+
+
+@app.cli.command('calibrate-hashing')
+@click.option('--target-ms', default=250, help='Target time for one password hash.')
+def calibrate_hashing_command(target_ms):
+    """Picks PASSWORD_HASH_ITERATIONS for a target hashing latency on this machine."""
+    recommended, timings = calibrate_iterations(target_ms)
+    for iterations, elapsed_ms in timings:
+        print(f"{iterations:>10} iterations: {elapsed_ms} ms")
+    print(f"PASSWORD_HASH_ITERATIONS={recommended}")
+
+
+@app.cli.command('benchmark-serialization')
+@click.option('--rows', default=10000)
+@click.option('--repeat', default=5)
+def benchmark_serialization_command(rows, repeat):
+    """Compares the old per-route row loops with RowSerializer and the fast JSON encoder."""
+    results = benchmark_serialization(rows, repeat)
+    for name, seconds in results.items():
+        print(f"{name:>10}: {seconds * 1000:.1f} ms for {rows} rows")
+    print(f"speedup: {results['legacy'] / results['serializer']:.1f}x")
+
+
 @app.route('/hello_world', methods=['GET'])
 def hello_world():
     return "hello world"
@@ -44,23 +223,26 @@ def login():
         return jsonify({'message': 'Username and password are required'}), 400
 
     cnx = connect_to_mysql(app.config)
-    cursor = cnx.cursor()
 
     try:
-        cursor.execute("SELECT * FROM User WHERE Username=%s", (username,))
-        user = cursor.fetchone()
-        cursor.close()
+        user = fetch_one(cnx, 'user_by_username', (username,))
 
         if user:
             stored_salt = user[4]
             stored_hashed_password = user[2]
-            print(stored_salt)
-            print(stored_hashed_password)
 
             # Hash the provided password with the stored salt
-            provided_hashed_password = generate_hashed_password(password, stored_salt)
+            matches, needs_rehash = password_hasher.verify(password, stored_salt, stored_hashed_password)
+
+            if matches:
+                if needs_rehash:
+                    # Upgrade legacy SHA-256 / low-cost hashes now that we know the password
+                    cursor = cnx.cursor()
+                    cursor.execute("UPDATE User SET Password = %s WHERE UserId = %s",
+                                   (password_hasher.hash(password, stored_salt), user[0]))
+                    cnx.commit()
+                    cursor.close()
 
-            if provided_hashed_password == stored_hashed_password:
                 user_data = {  # Create a dictionary for JWT payload
                                 'UserId': user[0],  # Access by integer index
                                 'Username': user[1],
@@ -75,6 +257,9 @@ def login():
         else:
             return jsonify({'message': 'Invalid credentials'}), 401
 
+    except HashingBusyError as e:
+        return jsonify({'message': str(e)}), 503, {'Retry-After': '1'}
+
     except Exception as e:
         return jsonify({'message': f'Login failed: {str(e)}'}), 500
 
@@ -83,7 +268,13 @@ def login():
 
 @app.route('/logout', methods=['POST'])
 def logout():
-    # Invalidate the JWT token (this can be done by simply not sending it in future requests)
+    # Revoke the JWT token so token_required rejects it until it expires
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return jsonify({'message': 'Token is missing or invalid'}), 401
+
+    if not revoke_token(auth_header.split(' ')[1]):
+        return jsonify({'message': 'Invalid token'}), 401
     return jsonify({'message': 'Logged out successfully'}), 200
 
 @app.route('/protected', methods=['GET'])
@@ -91,6 +282,22 @@ def logout():
 def protected(user_data):  # Receive user data from the decorator
     return jsonify({'message': f'Hello, {user_data["username"]}! Your role is {user_data["role"]}'})
 
+#connection pool statistics
+@app.route('/pool/stats', methods=['GET'])
+@token_required
+def pool_stats(user_data):
+    if user_data['role'] != 'admin':
+        return jsonify({'message': 'Access denied: Insufficient privileges'}), 403
+    return jsonify(all_pool_stats()), 200
+
+#prepared statement statistics
+@app.route('/statements/stats', methods=['GET'])
+@token_required
+def statement_stats_route(user_data):
+    if user_data['role'] != 'admin':
+        return jsonify({'message': 'Access denied: Insufficient privileges'}), 403
+    return jsonify(statement_stats.snapshot()), 200
+
 
 #register student or lecturer or admin
 @app.route('/register', methods=['POST'])
@@ -116,7 +323,7 @@ def register_user():
     try:
         # 1. Generate Salt and Hashed Password
         salt = generate_salt()
-        hashed_password = generate_hashed_password(password, salt)
+        hashed_password = password_hasher.hash(password, salt)
 
         # 2. Insert into User table (generate UserId)
         user_id = get_next_user_id(cnx)
@@ -137,6 +344,9 @@ def register_user():
         print(f"User registered successfully: {username} with role {role}")
         return jsonify({'message': 'User registered successfully'}), 201
 
+    except HashingBusyError as e:
+        return jsonify({'message': str(e)}), 503, {'Retry-After': '1'}
+
     except Exception as e:
         return jsonify({'message': f'Registration failed: {str(e)}'}), 500
 
@@ -323,7 +533,7 @@ def retrieve_members(course_id):
 #     finally:
 #         cnx.close()
 
-#retrieve calendar events for a course - Likely superseded by content_routes.py or similar
+#retrieve calendar events for a course - see calendar_routes.py for date ranges and the .ics feed
 @app.route('/retrieve_calendar_events/<int:course_id>', methods=['GET'])
 @token_required # Should be protected
 def retrieve_calendar_events(user_data, course_id):
@@ -336,30 +546,18 @@ def retrieve_calendar_events(user_data, course_id):
     cursor = cnx.cursor(dictionary=True)
 
     try:
-        # Assuming CalendarEvents table: EventId, CourseId, EventName, EventDescription, EventDate, CreatedBy, CreatedAt
+        # MySQL formats the date and time columns, so the rows are JSON-ready as fetched
         query = """
-        SELECT *
-        FROM calendarevent
+        SELECT EventId, CourseId,
+               DATE_FORMAT(EventDate, '%%Y-%%m-%%dT%%H:%%i:%%s') AS EventDate,
+               TIME_FORMAT(EventTime, '%%H:%%i:%%s') AS EventTime,
+               Description
+        FROM CalendarEvent
         WHERE CourseId = %s
-        ORDER BY EventDate
+        ORDER BY CalendarEvent.EventDate
         """
         cursor.execute(query, (course_id,))
-        events_raw = cursor.fetchall()
-
-        events_list = []
-        for event_dict in events_raw:
-            processed_event = {}
-            for key, value in event_dict.items():
-                if isinstance(value, (datetime.datetime, datetime.date)):
-                    processed_event[key] = value.isoformat()
-                elif isinstance(value, datetime.timedelta):
-                    # Convert timedelta to a string representation (e.g., "HH:MM:SS")
-                    processed_event[key] = str(value)
-                else:
-                    processed_event[key] = value
-            events_list.append(processed_event)
-
-        return jsonify(events_list), 200
+        return jsonify(cursor.fetchall()), 200
 
     except Exception as e:
         app.logger.error(f"Failed to retrieve calendar events: {e}", exc_info=True)
@@ -374,26 +572,37 @@ def retrieve_calendar_events(user_data, course_id):
 #retrieve calendar events for student
 @app.route('/retrieve_calendar_events_for_student', methods=['GET'])
 def retrieve_calendar_events_for_student():
-    data = request.get_json()
+    data = request.get_json(silent=True) or request.args
     user_id = data.get('user_id')
     event_date = data.get('event_date')
 
     if not user_id or not event_date:
         return jsonify({'message': 'Missing user ID or event date'}), 400
 
-    cnx = connect_to_mysql()
+    try:
+        day = datetime.date.fromisoformat(str(event_date)[:10])
+    except ValueError:
+        return jsonify({'message': 'event_date must be a date in YYYY-MM-DD format'}), 400
+
+    cnx = connect_to_mysql(app.config)
     cursor = cnx.cursor(dictionary=True)
 
     try:
+        # A half-open range on the bare EventDate column lets MySQL use
+        # idx_calendarevent_course_date for each enrolled course
         query = """
-        SELECT ce.EventId, ce.EventName, ce.EventDescription, ce.EventDate, c.CourseName
-        FROM CalendarEvents ce
-        JOIN Courses c ON ce.CourseId = c.CourseId
-        JOIN CourseRegistrations cr ON ce.CourseId = cr.CourseId
-        WHERE cr.UserId = %s AND DATE(ce.EventDate) = DATE(%s) AND cr.Role = 'student'
-        ORDER BY ce.EventDate
+        SELECT ce.EventId, ce.CourseId, c.CourseName,
+               DATE_FORMAT(ce.EventDate, '%%Y-%%m-%%d') AS EventDate,
+               TIME_FORMAT(ce.EventTime, '%%H:%%i:%%s') AS EventTime,
+               ce.Description
+        FROM Student s
+        JOIN Enrollment e ON e.StudentID = s.StudentID
+        JOIN CalendarEvent ce ON ce.CourseId = e.CourseId
+        JOIN Course c ON c.CourseId = ce.CourseId
+        WHERE s.UserId = %s AND ce.EventDate >= %s AND ce.EventDate < %s
+        ORDER BY ce.EventDate, ce.EventTime
         """
-        cursor.execute(query, (user_id, event_date))
+        cursor.execute(query, (user_id, day, day + datetime.timedelta(days=1)))
         events = cursor.fetchall()
         return jsonify(events), 200
 
@@ -401,6 +610,7 @@ def retrieve_calendar_events_for_student():
         return jsonify({'message': f'Failed to retrieve calendar events for student: {str(e)}'}), 500
 
     finally:
+        cursor.close()
         cnx.close()
 
 
@@ -417,17 +627,27 @@ def create_calendar_event():
     if not course_id or not event_name or not event_date or not created_by:
         return jsonify({'message': 'Missing required event data'}), 400
 
-    cnx = connect_to_mysql()
+    try:
+        event_at = datetime.datetime.fromisoformat(str(event_date))
+    except ValueError:
+        return jsonify({'message': 'event_date must be an ISO date or datetime'}), 400
+
+    cnx = connect_to_mysql(app.config)
     cursor = cnx.cursor()
 
     try:
-        cursor.execute("INSERT INTO CalendarEvents (CourseId, EventName, EventDescription, EventDate, CreatedBy) VALUES (%s, %s, %s, %s, %s)",
-                       (course_id, event_name, event_description, event_date, created_by))
+        # CalendarEvent has no name column; the name leads the description
+        description = f"{event_name}: {event_description}" if event_description else event_name
+        event_id = get_next_id(cnx, "CalendarEvent", "EventId")
+        cursor.execute("INSERT INTO CalendarEvent (EventId, CourseId, EventDate, EventTime, Description) VALUES (%s, %s, %s, %s, %s)",
+                       (event_id, course_id, event_at, event_at.time(), description))
         cnx.commit()
-        return jsonify({'message': 'Calendar event created successfully'}), 201
+        return jsonify({'message': 'Calendar event created successfully', 'event_id': event_id}), 201
 
     except Exception as e:
+        cnx.rollback()
         return jsonify({'message': f'Failed to create calendar event: {str(e)}'}), 500
 
     finally:
-        cnx.close()
\ No newline at end of file
+        cursor.close()
+        cnx.close()
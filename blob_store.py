@@ -0,0 +1,220 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+
+
+class BlobStore(object):
+    """Interface for content-addressed blob storage; blobs are named by their SHA-256."""
+
+    def put(self, data):
+        """Stores data (bytes) and returns (sha256_hex, size). Identical data is stored once."""
+        raise NotImplementedError
+
+    def path(self, digest):
+        """Returns the local filesystem path the blob is (or would be) stored at; downloads are sent from it."""
+        raise NotImplementedError
+
+    def read(self, digest):
+        raise NotImplementedError
+
+    def exists(self, digest):
+        raise NotImplementedError
+
+    def delete(self, digest, older_than=None):
+        """Deletes the blob; with older_than, only if it was last written before that timestamp."""
+        raise NotImplementedError
+
+    def iter_digests(self):
+        """Yields (digest, modified_at) for every stored blob."""
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Stores blobs as files under root/ab/cd/<sha256>.
+
+    Writes go to a temporary file in the same directory and are renamed into
+    place, so readers never see a partial blob and concurrent uploads of the
+    same data are harmless.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            # Touch it so a concurrent garbage collection sweep leaves it alone
+            os.utime(path)
+            return digest, len(data)
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest, len(data)
+
+    def read(self, digest):
+        """Returns the blob as a read-only memory map (or b'' for an empty blob)."""
+        with open(self.path(digest), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def delete(self, digest, older_than=None):
+        path = self.path(digest)
+        try:
+            if older_than is not None and os.path.getmtime(path) >= older_than:
+                return False
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def iter_digests(self):
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if len(filename) == 64 and not filename.startswith('.'):
+                    yield filename, os.path.getmtime(os.path.join(directory, filename))
+
+
+BACKENDS = {
+    'local': lambda config: LocalBlobStore(config['BLOB_STORE_PATH']),
+}
+
+_stores = {}
+
+
+def get_blob_store(config):
+    """Returns the configured blob store (BLOB_STORE_BACKEND, default 'local')."""
+    key = (config.get('BLOB_STORE_BACKEND', 'local'), config.get('BLOB_STORE_PATH'))
+    if key not in _stores:
+        _stores[key] = BACKENDS[key[0]](config)
+    return _stores[key]
+
+
+# (table, key column, legacy BLOB column, hash column, size column)
+BLOB_COLUMNS = (
+    ('CourseContent', 'ContentId', 'Content', 'ContentHash', 'ContentSize'),
+    ('Submission', 'SubmissionId', 'SubmissionContent', 'SubmissionHash', 'SubmissionSize'),
+)
+
+
+def add_blob_reference(cursor, digest, size):
+    """Counts one more row pointing at a blob; runs in the caller's transaction."""
+    cursor.execute("""
+        INSERT INTO BlobRef (Hash, Size, RefCount) VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE RefCount = RefCount + 1
+    """, (digest, size))
+
+
+def migrate_blobs(cnx, store, batch_size=100):
+    """
+    Moves legacy BLOB columns into the blob store, one committed batch at a time.
+
+    Rows are processed in key order and the BLOB is cleared once its hash
+    is recorded, so the command can be interrupted and rerun. Returns the
+    number of rows moved per table.
+    """
+    moved = {}
+    cursor = cnx.cursor()
+    try:
+        for table, key, blob_column, hash_column, size_column in BLOB_COLUMNS:
+            moved[table] = 0
+            last_key = -1
+            while True:
+                cursor.execute(f"""
+                    SELECT {key}, {blob_column} FROM {table}
+                    WHERE {key} > %s AND {hash_column} IS NULL AND {blob_column} IS NOT NULL
+                    ORDER BY {key}
+                    LIMIT %s
+                """, (last_key, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                for row_key, data in rows:
+                    digest, size = store.put(bytes(data))
+                    add_blob_reference(cursor, digest, size)
+                    cursor.execute(f"""
+                        UPDATE {table} SET {hash_column} = %s, {size_column} = %s, {blob_column} = NULL
+                        WHERE {key} = %s
+                    """, (digest, size, row_key))
+                cnx.commit()
+                moved[table] += len(rows)
+                last_key = rows[-1][0]
+        return moved
+    except Exception:
+        cnx.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def collect_garbage(cnx, store, grace_seconds=3600):
+    """
+    Deletes blobs nothing refers to any more.
+
+    Reference counts are first reconciled against the tables, then blobs
+    whose count is zero are removed, along with files that never got a
+    BlobRef row (uploads whose transaction rolled back). Anything touched
+    within grace_seconds is kept so in-flight uploads are not collected.
+    """
+    references = " UNION ALL ".join(
+        f"SELECT {hash_column} AS Hash FROM {table} WHERE {hash_column} IS NOT NULL"
+        for table, _, _, hash_column, _ in BLOB_COLUMNS)
+    cursor = cnx.cursor()
+    try:
+        cursor.execute(f"""
+            UPDATE BlobRef B
+            LEFT JOIN (SELECT Hash, COUNT(*) AS Refs FROM ({references}) R GROUP BY Hash) X
+                ON X.Hash = B.Hash
+            SET B.RefCount = COALESCE(X.Refs, 0)
+        """)
+        repaired = cursor.rowcount
+        cnx.commit()
+
+        cursor.execute("""
+            SELECT Hash FROM BlobRef
+            WHERE RefCount = 0 AND UpdatedAt < NOW() - INTERVAL %s SECOND
+        """, (grace_seconds,))
+        cutoff = time.time() - grace_seconds
+        deleted = 0
+        for (digest,) in cursor.fetchall():
+            # Re-check under the row lock in case an upload reused the blob meanwhile;
+            # put() touches the file, so a blob being re-uploaded right now is kept
+            cursor.execute("DELETE FROM BlobRef WHERE Hash = %s AND RefCount = 0", (digest,))
+            if cursor.rowcount and store.delete(digest, older_than=cutoff):
+                deleted += 1
+            cnx.commit()
+
+        cursor.execute("SELECT Hash FROM BlobRef")
+        known = {row[0] for row in cursor.fetchall()}
+        orphans = 0
+        for digest, modified_at in store.iter_digests():
+            if digest not in known and modified_at < cutoff and store.delete(digest, older_than=cutoff):
+                orphans += 1
+
+        return {'refcounts_repaired': repaired, 'deleted': deleted, 'orphans_deleted': orphans}
+    except Exception:
+        cnx.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,256 @@
+import csv
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import mysql.connector
+from .counters import reconcile_counters
+from .id_allocator import SEQUENCES
+from .report_tables import rebuild_reports
+from .versions import bump_catalog_version
+
+# Parent tables each table references; tables are loaded level by level in
+# this order, and tables on the same level in parallel.
+DEPENDENCIES = {
+    'User': set(),
+    'Lecturer': {'User'},
+    'Student': {'User'},
+    'Course': set(),
+    'CourseLecturer': {'Course', 'Lecturer'},
+    'Enrollment': {'Student', 'Course'},
+    'Assignment': {'Course'},
+    'Forum': {'Course'},
+    'DiscussionThread': {'Forum', 'Student'},
+    'CalendarEvent': {'Course'},
+    'CourseContent': {'Course'},
+    'Submission': {'Assignment', 'Student'},
+    'Grade': {'Submission'},
+}
+
+_INSERT_HEADER = re.compile(r'\s*INSERT\s+INTO\s+`?(\w+)`?\s*(\([^)]*\))\s*VALUES\s*', re.IGNORECASE)
+_READ_SIZE = 1 << 16
+
+
+def load_levels(tables):
+    """Groups tables into FK-dependency levels (parents before children)."""
+    remaining = set(tables)
+    levels = []
+    while remaining:
+        level = sorted(t for t in remaining if not (DEPENDENCIES.get(t, set()) & remaining))
+        if not level:
+            raise ValueError(f"Circular dependencies between {sorted(remaining)}")
+        levels.append(level)
+        remaining -= set(level)
+    return levels
+
+
+def iter_insert_batches(path, batch_rows):
+    """
+    Streams an `INSERT INTO T (...) VALUES (...), (...);` file and yields
+    (table, statement) with at most batch_rows rows per statement, without
+    reading the whole file into memory.
+    """
+    with open(path, encoding='utf-8') as f:
+        header = table = None
+        rows = []
+        row = []
+        depth = 0
+        quote = None
+        escaped = False
+        pending = ''
+
+        while True:
+            block = f.read(_READ_SIZE)
+            if not block:
+                break
+            text = pending + block
+            pending = ''
+            i = 0
+            while i < len(text):
+                if header is None:
+                    # Wait until the whole INSERT ... VALUES header is buffered
+                    match = _INSERT_HEADER.match(text, i)
+                    if not match:
+                        rest = text[i:]
+                        if 'VALUES' not in rest.upper():
+                            pending = rest
+                            break
+                        raise ValueError(f"{path}: expected INSERT INTO ... VALUES")
+                    table = match.group(1)
+                    header = f"INSERT INTO {table} {match.group(2)} VALUES "
+                    i = match.end()
+                    continue
+
+                ch = text[i]
+                if depth:
+                    row.append(ch)
+                    if quote:
+                        if escaped:
+                            escaped = False
+                        elif ch == '\\':
+                            escaped = True
+                        elif ch == quote:
+                            quote = None
+                    elif ch in ("'", '"'):
+                        quote = ch
+                    elif ch == '(':
+                        depth += 1
+                    elif ch == ')':
+                        depth -= 1
+                        if not depth:
+                            rows.append(''.join(row))
+                            row = []
+                            if len(rows) >= batch_rows:
+                                yield table, header + ','.join(rows)
+                                rows = []
+                elif ch == '(':
+                    depth = 1
+                    row = ['(']
+                elif ch == ';':
+                    if rows:
+                        yield table, header + ','.join(rows)
+                        rows = []
+                    header = None
+                i += 1
+
+        if rows:
+            yield table, header + ','.join(rows)
+
+
+def peek_insert_table(path):
+    with open(path, encoding='utf-8') as f:
+        match = _INSERT_HEADER.match(f.read(4096))
+    return match.group(1) if match else None
+
+
+def discover_inputs(directory):
+    """Maps table -> input file for insert_*.sql and <Table>.csv files in a directory."""
+    inputs = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith('.csv'):
+            inputs[os.path.splitext(name)[0]] = path
+        elif name.startswith('insert_') and name.endswith('.sql'):
+            table = peek_insert_table(path)
+            if table:
+                inputs.setdefault(table, path)
+    return inputs
+
+
+class BulkLoader(object):
+    """
+    Loads generated SQL/CSV data with relaxed checks and per-table parallelism.
+
+    Every worker uses its own connection with foreign_key_checks and
+    unique_checks switched off for the session, commits every batch, and
+    switches the checks back on before the connection is closed.
+    """
+
+    def __init__(self, connect_args, batch_rows=5000, workers=4, log=print):
+        self.connect_args = dict(connect_args, allow_local_infile=True)
+        self.batch_rows = batch_rows
+        self.workers = workers
+        self.log = log
+        self._log_lock = threading.Lock()
+
+    def _connect(self, local_infile_dir=None):
+        args = dict(self.connect_args)
+        if local_infile_dir:
+            args['allow_local_infile_in_path'] = local_infile_dir
+        cnx = mysql.connector.connect(**args)
+        cursor = cnx.cursor()
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        cursor.execute("SET SESSION unique_checks = 0")
+        cursor.close()
+        cnx.autocommit = False
+        return cnx
+
+    @staticmethod
+    def _restore_and_close(cnx):
+        try:
+            cursor = cnx.cursor()
+            cursor.execute("SET SESSION unique_checks = 1")
+            cursor.execute("SET SESSION foreign_key_checks = 1")
+            cursor.close()
+        finally:
+            cnx.close()
+
+    def load_table(self, table, path):
+        started = time.monotonic()
+        is_csv = path.endswith('.csv')
+        cnx = self._connect(os.path.dirname(os.path.abspath(path)) if is_csv else None)
+        try:
+            rows = self._load_csv(cnx, table, path) if is_csv else self._load_sql(cnx, path)
+        except Exception:
+            cnx.rollback()
+            raise
+        finally:
+            self._restore_and_close(cnx)
+
+        elapsed = time.monotonic() - started
+        rate = rows / elapsed if elapsed else float('inf')
+        with self._log_lock:
+            self.log(f"{table:<18} {rows:>10} rows in {elapsed:8.2f}s  ({rate:,.0f} rows/sec)")
+        return rows
+
+    def _load_sql(self, cnx, path):
+        cursor = cnx.cursor()
+        rows = 0
+        for _, statement in iter_insert_batches(path, self.batch_rows):
+            cursor.execute(statement)
+            rows += cursor.rowcount
+            cnx.commit()
+        cursor.close()
+        return rows
+
+    def _load_csv(self, cnx, table, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            columns = next(csv.reader(f))
+        cursor = cnx.cursor()
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            IGNORE 1 LINES
+            ({', '.join(columns)})
+        """, (os.path.abspath(path),))
+        rows = cursor.rowcount
+        cnx.commit()
+        cursor.close()
+        return rows
+
+    def load(self, inputs):
+        """Loads {table: path} level by level; returns rows loaded per table."""
+        loaded = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for level in load_levels(inputs):
+                futures = {table: executor.submit(self.load_table, table, inputs[table]) for table in level}
+                for table, future in futures.items():
+                    loaded[table] = future.result()
+        return loaded
+
+
+def refresh_after_load(cnx):
+    """
+    Brings derived state back in line with freshly loaded data.
+
+    ID sequences are only ever raised past the loaded IDs, never reset, so
+    blocks already handed out stay unique. Running servers may still hold
+    blocks the load used and must be restarted.
+    """
+    reconcile_counters(cnx)
+    rebuild_reports(cnx)
+    cursor = cnx.cursor()
+    # Sequences without a row are seeded from MAX(id) when first used
+    for name, (table, column, _) in SEQUENCES.items():
+        cursor.execute(f"""
+            UPDATE IdSequence
+            SET NextId = GREATEST(NextId, (SELECT COALESCE(MAX({column}), 0) + 1 FROM `{table}`))
+            WHERE Name = %s
+        """, (name,))
+    # Invalidates every cached ETag
+    bump_catalog_version(cursor)
+    cnx.commit()
+    cursor.close()
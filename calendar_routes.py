@@ -0,0 +1,236 @@
+import datetime
+import hashlib
+from flask import Blueprint, Response, jsonify, request, stream_with_context, current_app as app
+from .utilities import connect_to_mysql, token_required
+from .statements import fetch_one
+from .db_pool import close_streaming_cursor
+
+calendar_bp = Blueprint('calendar', __name__)
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+FEED_PAST_DAYS = 30  # the .ics feed covers this many days back ...
+FEED_FUTURE_DAYS = 365  # ... and this many ahead
+STREAM_BATCH_SIZE = 500
+
+# Event columns formatted by MySQL so rows go straight to JSON. Every range
+# predicate compares the bare EventDate column so idx_calendarevent_course_date
+# (CourseId, EventDate) can be range-scanned per course.
+EVENT_COLUMNS = """
+    CE.EventId AS event_id,
+    CE.CourseId AS course_id,
+    C.CourseCode AS course_code,
+    C.CourseName AS course_name,
+    DATE_FORMAT(CE.EventDate, '%%Y-%%m-%%d') AS event_date,
+    TIME_FORMAT(CE.EventTime, '%%H:%%i:%%s') AS event_time,
+    CE.Description AS description"""
+
+STUDENT_EVENTS = f"""
+    SELECT {EVENT_COLUMNS}
+    FROM Enrollment E
+    JOIN CalendarEvent CE ON CE.CourseId = E.CourseId
+    JOIN Course C ON C.CourseId = CE.CourseId
+    WHERE E.StudentID = %s AND CE.EventDate >= %s AND CE.EventDate < %s
+    ORDER BY CE.EventDate, CE.EventTime, CE.EventId"""
+
+COURSE_EVENTS = f"""
+    SELECT {EVENT_COLUMNS}
+    FROM CalendarEvent CE
+    JOIN Course C ON C.CourseId = CE.CourseId
+    WHERE CE.CourseId = %s AND CE.EventDate >= %s AND CE.EventDate < %s
+    ORDER BY CE.EventDate, CE.EventTime, CE.EventId"""
+
+# One row summarizing the feed contents; any added, edited, moved or
+# unenrolled event changes it
+STUDENT_FEED_FINGERPRINT = """
+    SELECT COUNT(*), COALESCE(MAX(CE.EventId), 0),
+           COALESCE(BIT_XOR(CRC32(CONCAT_WS('|', CE.EventId, CE.CourseId, CE.EventDate, CE.EventTime,
+                                            CE.Description))), 0)
+    FROM Enrollment E
+    JOIN CalendarEvent CE ON CE.CourseId = E.CourseId
+    WHERE E.StudentID = %s AND CE.EventDate >= %s AND CE.EventDate < %s"""
+
+
+def parse_range(args):
+    """
+    Reads ?from=YYYY-MM-DD&to=YYYY-MM-DD (both inclusive) and returns the
+    half-open [start, end) datetimes used in the range predicate.
+    """
+    try:
+        start = datetime.date.fromisoformat(args['from']) if args.get('from') else datetime.date.today()
+        last = datetime.date.fromisoformat(args['to']) if args.get('to') else \
+            start + datetime.timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    except ValueError:
+        raise ValueError('from and to must be dates in YYYY-MM-DD format')
+    if last < start:
+        raise ValueError('to must not be before from')
+    if (last - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'The range can span at most {MAX_RANGE_DAYS} days')
+    return (datetime.datetime.combine(start, datetime.time()),
+            datetime.datetime.combine(last + datetime.timedelta(days=1), datetime.time()))
+
+
+def student_events(cnx, student_id, start, end):
+    cursor = cnx.cursor(dictionary=True)
+    try:
+        cursor.execute(STUDENT_EVENTS, (student_id, start, end))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+#calendar events for a student's enrolled courses in a date range
+@calendar_bp.route('/student/<int:student_id>/calendar', methods=['GET'])
+@token_required
+def get_student_calendar(user_data, student_id):
+    if user_data['role'] not in ['admin', 'lecturer', 'student']:
+        return jsonify({'message': 'Access denied'}), 403
+
+    try:
+        start, end = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    cnx = connect_to_mysql(app.config)
+
+    try:
+        if not fetch_one(cnx, 'student_exists', (student_id,)):
+            return jsonify({'message': 'Student not found'}), 404
+        return jsonify(student_events(cnx, student_id, start, end)), 200
+    except Exception as e:
+        return jsonify({'message': f'Failed to retrieve calendar: {str(e)}'}), 500
+    finally:
+        cnx.close()
+
+
+#calendar events of one course in a date range
+@calendar_bp.route('/course/<int:course_id>/calendar', methods=['GET'])
+@token_required
+def get_course_calendar(user_data, course_id):
+    if user_data['role'] not in ['admin', 'lecturer', 'student']:
+        return jsonify({'message': 'Access denied'}), 403
+
+    try:
+        start, end = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    cnx = connect_to_mysql(app.config)
+    cursor = cnx.cursor(dictionary=True)
+
+    try:
+        if not fetch_one(cnx, 'course_exists', (course_id,)):
+            return jsonify({'message': 'Course not found'}), 404
+        cursor.execute(COURSE_EVENTS, (course_id, start, end))
+        return jsonify(cursor.fetchall()), 200
+    except Exception as e:
+        return jsonify({'message': f'Failed to retrieve calendar: {str(e)}'}), 500
+    finally:
+        cursor.close()
+        cnx.close()
+
+
+#iCalendar feed of a student's events, for calendar clients to poll
+@calendar_bp.route('/student/<int:student_id>/calendar.ics', methods=['GET'])
+@token_required
+def get_student_calendar_feed(user_data, student_id):
+    """
+    Streams the student's events from FEED_PAST_DAYS ago to FEED_FUTURE_DAYS
+    ahead as text/calendar.
+
+    The ETag comes from a single aggregate over the same rows, so a client
+    polling with If-None-Match gets a 304 without the events being read out.
+    """
+    if user_data['role'] not in ['admin', 'lecturer', 'student']:
+        return jsonify({'message': 'Access denied'}), 403
+
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    start = today - datetime.timedelta(days=FEED_PAST_DAYS)
+    end = today + datetime.timedelta(days=FEED_FUTURE_DAYS)
+
+    cnx = connect_to_mysql(app.config)
+    cursor = cnx.cursor()
+
+    try:
+        if not fetch_one(cnx, 'student_exists', (student_id,)):
+            return jsonify({'message': 'Student not found'}), 404
+
+        cursor.execute(STUDENT_FEED_FINGERPRINT, (student_id, start, end))
+        fingerprint = cursor.fetchone()
+        etag = hashlib.sha1(f'{student_id}:{start:%Y%m%d}:{fingerprint}'.encode('utf-8')).hexdigest()
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        cursor.close()
+        cursor = None
+        response = Response(stream_with_context(_stream_ics(cnx, student_id, start, end)),
+                            mimetype='text/calendar')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.headers['Content-Disposition'] = f'inline; filename="student-{student_id}.ics"'
+        return response
+    except Exception as e:
+        return jsonify({'message': f'Failed to build calendar feed: {str(e)}'}), 500
+    finally:
+        if cursor: cursor.close()
+        cnx.close()
+
+
+def _ics_text(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_line(line):
+    """Folds a content line at 75 octets as RFC 5545 requires."""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74  # continuation lines start with a space
+        while cut and (data[cut] & 0xC0) == 0x80:  # do not split a UTF-8 sequence
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    parts.append(data.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _stream_ics(cnx, student_id, start, end):
+    stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    cursor = cnx.cursor()  # unbuffered: events are written out as they are read
+    try:
+        cursor.execute("""
+            SELECT CE.EventId, C.CourseCode, C.CourseName, TIMESTAMP(DATE(CE.EventDate), CE.EventTime), CE.Description
+            FROM Enrollment E
+            JOIN CalendarEvent CE ON CE.CourseId = E.CourseId
+            JOIN Course C ON C.CourseId = CE.CourseId
+            WHERE E.StudentID = %s AND CE.EventDate >= %s AND CE.EventDate < %s
+            ORDER BY CE.EventDate, CE.EventTime, CE.EventId
+        """, (student_id, start, end))
+
+        yield ''.join(map(_ics_line, ('BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//LMS//Course Calendar//EN',
+                                      f'X-WR-CALNAME:Courses of student {student_id}')))
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            chunk = []
+            for event_id, course_code, course_name, starts_at, description in rows:
+                summary = f'{course_code}: {description}' if description else course_code
+                chunk.extend(map(_ics_line, (
+                    'BEGIN:VEVENT',
+                    f'UID:event-{event_id}@lms',
+                    f'DTSTAMP:{stamp}',
+                    f'DTSTART:{starts_at:%Y%m%dT%H%M%S}',
+                    f'SUMMARY:{_ics_text(summary[:120])}',
+                    f'DESCRIPTION:{_ics_text(description)}',
+                    f'CATEGORIES:{_ics_text(course_name)}',
+                    'END:VEVENT',
+                )))
+            yield ''.join(chunk)
+        yield _ics_line('END:VCALENDAR')
+    finally:
+        close_streaming_cursor(cnx, cursor)
@@ -10,8 +10,45 @@ class Config(object):
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD') or 'your_password'
     MYSQL_DB = os.environ.get('MYSQL_DB') or 'your_database'
     MYSQL_PORT = int(os.environ.get('MYSQL_PORT') or 3306)
+    MYSQL_POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE') or 10)
+    MYSQL_POOL_MAX_OVERFLOW = int(os.environ.get('MYSQL_POOL_MAX_OVERFLOW') or 5)
+    MYSQL_POOL_TIMEOUT = float(os.environ.get('MYSQL_POOL_TIMEOUT') or 5)  # seconds to wait for a free connection
+    MYSQL_POOL_PING_INTERVAL = float(os.environ.get('MYSQL_POOL_PING_INTERVAL') or 30)  # ping connections idle this many seconds; 0 = every checkout
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() != 'false'  # /metrics and per-request DB stats
+    QUERY_DIAGNOSTICS = (os.environ.get('QUERY_DIAGNOSTICS') or 'false').lower() == 'true'  # N+1 / slow-query log, dev only
+    QUERY_DIAGNOSTICS_STRICT = (os.environ.get('QUERY_DIAGNOSTICS_STRICT') or 'false').lower() == 'true'  # raise instead of log; always on under app.testing
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD') or 5)  # same statement shape more often than this is flagged
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS') or 100)
+    DEFAULT_QUERY_BUDGET = int(os.environ.get('DEFAULT_QUERY_BUDGET') or 30)  # per request, unless the route sets @query_budget
+    ID_BLOCK_SIZE = int(os.environ.get('ID_BLOCK_SIZE') or 100)  # IDs reserved per trip to IdSequence
     SECRET_KEY = os.environ.get('SECRET_KEY')
     JWT_EXPIRATION_HOURS = int(os.environ.get('JWT_EXPIRATION_HOURS') or 1)
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS') or 600000)  # see `flask calibrate-hashing`
+    HASH_POOL_WORKERS = int(os.environ.get('HASH_POOL_WORKERS') or 2)
+    HASH_QUEUE_LIMIT = int(os.environ.get('HASH_QUEUE_LIMIT') or 16)  # hashes waiting beyond the workers before 503
+    HASH_TIMEOUT = float(os.environ.get('HASH_TIMEOUT') or 10)
+    TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES') or 10000)
+    TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL') or 30)  # seconds a logout on another worker can go unnoticed
+    DASHBOARD_SECTION_TIMEOUT = float(os.environ.get('DASHBOARD_SECTION_TIMEOUT') or 2)  # seconds per dashboard section
+    DASHBOARD_WORKERS = int(os.environ.get('DASHBOARD_WORKERS') or 8)  # threads shared by all dashboard requests
+    DASHBOARD_QUEUE_TIMEOUT = float(os.environ.get('DASHBOARD_QUEUE_TIMEOUT') or 2)  # seconds a section may wait for a worker
+    MEMBERS_PAGE_SIZE = int(os.environ.get('MEMBERS_PAGE_SIZE') or 100)
+    MEMBERS_MAX_PAGE_SIZE = int(os.environ.get('MEMBERS_MAX_PAGE_SIZE') or 1000)
+    BULK_ENROLLMENT_MAX_ROWS = int(os.environ.get('BULK_ENROLLMENT_MAX_ROWS') or 50000)
+    BULK_ENROLLMENT_CHUNK_SIZE = int(os.environ.get('BULK_ENROLLMENT_CHUNK_SIZE') or 1000)  # rows per transaction
+    REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL') or 60)  # seconds; 0 disables the cache
+    REPORT_CACHE_MAX_ENTRIES = int(os.environ.get('REPORT_CACHE_MAX_ENTRIES') or 256)
+    GRADE_STATS_CACHE_MAX_ENTRIES = int(os.environ.get('GRADE_STATS_CACHE_MAX_ENTRIES') or 1024)
+    GRADE_STATS_CACHE_TTL = int(os.environ.get('GRADE_STATS_CACHE_TTL') or 3600)  # seconds; keys carry the grade versions
+    CONTENT_CHUNK_SIZE = int(os.environ.get('CONTENT_CHUNK_SIZE') or 256 * 1024)  # bytes per streamed read
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 1000)  # rows fetched and written per chunk
+    EXPORT_NET_WRITE_TIMEOUT = int(os.environ.get('EXPORT_NET_WRITE_TIMEOUT') or 600)  # seconds MySQL waits on a slow client
+    COMPRESS_RESPONSES = (os.environ.get('COMPRESS_RESPONSES') or 'true').lower() != 'false'  # gzip/brotli JSON and text
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)  # bytes; smaller bodies are sent as is
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)  # gzip level; brotli quality is capped at 11
+    BLOB_STORE_BACKEND = os.environ.get('BLOB_STORE_BACKEND') or 'local'
+    BLOB_STORE_PATH = os.environ.get('BLOB_STORE_PATH') or os.path.join(os.path.dirname(__file__), 'blobs')
+    BLOB_GC_GRACE_SECONDS = int(os.environ.get('BLOB_GC_GRACE_SECONDS') or 3600)
     COURSE_CODE_PREFIX_LENGTH = 3
     COURSE_CODE_NUMERICE_LENGTH = 3
     VALID_DEPARTMENTS =[ dept.strip() for dept in os.environ.get('DEPARTMENTS', '').split(',')
@@ -1,10 +1,27 @@
-from flask import Blueprint, jsonify, request, current_app as app
-from .utilities import connect_to_mysql, token_required
+import json
+import mimetypes
+from urllib.parse import quote
+from werkzeug.http import quote_header_value
+from flask import Blueprint, Response, jsonify, request, send_file, stream_with_context, current_app as app
+from .utilities import connect_to_mysql, token_required, get_next_id
+from .statements import fetch_one, fetch_described
 from .config import Config
+from .grade_engine import recalculate_grades
+from .report_tables import refresh_student_averages
+from .response_cache import report_cache
+from .blob_store import get_blob_store, add_blob_reference
+from .query_diagnostics import query_budget
+from .versions import (bump_course_version, bump_grade_version, bump_submission_grade_version,
+                       conditional_on_version, grade_version_key, CATALOG)
+from .grade_stats import course_grade_stats, all_course_grade_stats, grade_stats_cache
+from .serializer import RowSerializer, serialize_rows
 from datetime import datetime
 
 content_bp = Blueprint('content', __name__)
 
+ASSIGNMENT_KEYS = {'AssignmentId': 'assignment_id', 'Title': 'title', 'Description': 'description',
+                   'DueDate': 'due_date'}
+
 #add coure content
 @content_bp.route('/course/<int:course_id>/content', methods=['POST'])
 @token_required
@@ -34,20 +51,22 @@ def add_course_content(user_data, course_id):
 
     try:
         # Check if the course exists
-        cursor.execute("SELECT CourseID FROM Course WHERE CourseID = %s", (course_id,))
-        course = cursor.fetchone()
+        course = fetch_one(cnx, 'course_exists', (course_id,))
         if not course:
             return jsonify({'message': 'Course not found'}), 404
 
         # Get the next available ContentId
-        cursor.execute("SELECT MAX(ContentId) FROM CourseContent")
-        max_content_id = cursor.fetchone()[0]
-        next_content_id = 1 if max_content_id is None else max_content_id + 1
+        next_content_id = get_next_id(cnx, "CourseContent", "ContentId")
+
+        # The body goes to the blob store; the row keeps only its hash and size
+        content_hash, content_size = get_blob_store(app.config).put(str(content).encode('utf-8'))
+        add_blob_reference(cursor, content_hash, content_size)
 
         cursor.execute("""
-            INSERT INTO CourseContent (ContentId, CourseId, Section, Content, Metadata)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (next_content_id, course_id, section, str(content), str(metadata)))
+            INSERT INTO CourseContent (ContentId, CourseId, Section, ContentHash, ContentSize, Metadata)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (next_content_id, course_id, section, content_hash, content_size, str(metadata)))
+        bump_course_version(cursor, course_id)
 
         cnx.commit()
         return jsonify({'message': 'Course content added successfully', 'content_id': next_content_id}), 201
@@ -62,74 +81,30 @@ def add_course_content(user_data, course_id):
 #Retrieve Course Content
 @content_bp.route('/course/<int:course_id>/content', methods=['GET'])
 @token_required
+@conditional_on_version(['admin', 'lecturer', 'student'])
 def get_course_content(user_data, course_id):
     if user_data['role'] not in ['admin', 'lecturer', 'student']:
         return jsonify({'message': 'Access denied'}), 403
 
     cnx = connect_to_mysql(app.config)
-    # Use a dictionary cursor for easier access by column name
-    cursor = cnx.cursor(dictionary=True) # <-- Change: Use dictionary cursor
+    cursor = cnx.cursor()
 
     try:
         # Check if the course exists
-        cursor.execute("SELECT CourseID FROM Course WHERE CourseID = %s", (course_id,))
-        course = cursor.fetchone()
+        course = fetch_one(cnx, 'course_exists', (course_id,))
         if not course:
             return jsonify({'message': 'Course not found'}), 404
 
+        # Only metadata here; the bodies are served by /content/<id>/data
         cursor.execute("""
-            SELECT ContentId, Section, Content, Metadata
+            SELECT ContentId AS content_id, Section AS section, Metadata AS metadata,
+                   COALESCE(ContentSize, LENGTH(Content)) AS size,
+                   CONCAT('/content/', ContentId, '/data') AS data_url
             FROM CourseContent
             WHERE CourseId = %s
         """, (course_id,))
 
-        content_list = []
-        content_data = cursor.fetchall()
-
-        for content_row in content_data: # Renamed loop variable for clarity
-            section_value = content_row.get('Section')
-            content_value = content_row.get('Content')
-            metadata_value = content_row.get('Metadata')
-
-            # Decode Section if it's bytes (might be VARCHAR/TEXT)
-            if isinstance(section_value, bytes):
-                try:
-                    section_string = section_value.decode('utf-8')
-                except UnicodeDecodeError:
-                    section_string = f"[Binary data Section: {len(section_value)} bytes]"
-            else:
-                # Use str() for other types (like INT) or if already a string
-                section_string = str(section_value) if section_value is not None else None
-
-            # Decode Content if it's bytes (likely BLOB/TEXT)
-            if isinstance(content_value, bytes):
-                 try:
-                     # Attempt to decode assuming UTF-8, adjust if needed
-                     content_string = content_value.decode('utf-8')
-                 except UnicodeDecodeError:
-                     # Fallback if decoding fails (e.g., binary data)
-                     content_string = f"[Binary data Content: {len(content_value)} bytes]"
-            else:
-                 # Use str() for other types or if already a string
-                 content_string = str(content_value) if content_value is not None else None
-
-            # Decode Metadata if it's bytes (likely TEXT)
-            if isinstance(metadata_value, bytes):
-                try:
-                    metadata_string = metadata_value.decode('utf-8')
-                except UnicodeDecodeError:
-                    metadata_string = f"[Binary data Metadata: {len(metadata_value)} bytes]"
-            else:
-                metadata_string = str(metadata_value) if metadata_value is not None else None
-
-            content_list.append({
-                "content_id": content_row.get('ContentId'),
-                "section": section_string,
-                "content": content_string,
-                "metadata": metadata_string
-            })
-
-        return jsonify(content_list), 200
+        return jsonify(serialize_rows(cursor)), 200
 
     except Exception as e:
         # Log the full error for debugging
@@ -139,6 +114,134 @@ def get_course_content(user_data, course_id):
         cursor.close()
         cnx.close()
 
+#Download course content
+@content_bp.route('/content/<int:content_id>/data', methods=['GET'])
+@token_required
+def download_course_content(user_data, content_id):
+    """
+    Streams the body of one CourseContent row in chunks.
+
+    Supports single byte ranges (Range / If-Range) and a strong ETag
+    (If-None-Match) so large files can be resumed and cached.
+    """
+    if user_data['role'] not in ['admin', 'lecturer', 'student']:
+        return jsonify({'message': 'Access denied'}), 403
+
+    cnx = connect_to_mysql(app.config)
+    cursor = cnx.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT ContentHash, Metadata, ContentSize, ContentDigest, Content IS NOT NULL
+            FROM CourseContent
+            WHERE ContentId = %s
+        """, (content_id,))
+        row = cursor.fetchone()
+        if not row or (row[0] is None and not row[4]):
+            return jsonify({'message': 'Content not found'}), 404
+
+        content_hash, metadata, length, digest, _ = row
+        content_type, filename = _content_type_and_filename(metadata)
+
+        if content_hash:
+            # Served from the blob store; send_file handles Range, ETag and sendfile
+            store = get_blob_store(app.config)
+            if not store.exists(content_hash):
+                app.logger.error(f"Blob {content_hash} of content {content_id} is missing from the store")
+                return jsonify({'message': 'Content not found'}), 404
+            response = send_file(store.path(content_hash), mimetype=content_type, conditional=True,
+                                 etag=content_hash, download_name=filename)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        # Legacy rows still holding the body inline
+        if digest is None:
+            digest, length = _persist_legacy_digest(cnx, cursor, content_id)
+        etag = f'"{digest}"'
+        headers = {'ETag': etag, 'Accept-Ranges': 'bytes', 'Cache-Control': 'private, no-cache'}
+        if filename:
+            headers['Content-Disposition'] = _content_disposition(filename)
+
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            return Response(status=304, headers=headers)
+
+        start, stop, status = 0, length, 200
+        if request.range and request.headers.get('If-Range', etag) == etag:
+            byte_range = request.range.range_for_length(length)
+            if byte_range is not None:
+                start, stop = byte_range
+                status = 206
+                headers['Content-Range'] = f'bytes {start}-{stop - 1}/{length}'
+            elif len(request.range.ranges) == 1:
+                headers['Content-Range'] = f'bytes */{length}'
+                return Response(status=416, headers=headers)
+            # Multiple ranges are not supported; the Range header is ignored
+            # and the whole body is sent, as RFC 9110 allows
+
+        headers['Content-Length'] = str(stop - start)
+        return Response(stream_with_context(_stream_content(cnx, content_id, start, stop)),
+                        status=status, headers=headers, content_type=content_type)
+
+    except Exception as e:
+        app.logger.error(f"Error downloading content {content_id}: {e}", exc_info=True)
+        return jsonify({'message': f'Failed to download content: {str(e)}'}), 500
+    finally:
+        cursor.close()
+        cnx.close()
+
+
+def _content_type_and_filename(metadata):
+    """Reads the filename from the JSON Metadata column, if any, and guesses its type."""
+    if isinstance(metadata, bytes):
+        metadata = metadata.decode('utf-8', errors='replace')
+    try:
+        filename = json.loads(metadata).get('filename') if metadata else None
+    except (ValueError, AttributeError):
+        filename = None
+    content_type = mimetypes.guess_type(filename)[0] if filename else None
+    return content_type or 'application/octet-stream', filename
+
+
+def _content_disposition(filename):
+    """An inline Content-Disposition with an ASCII filename and the exact name as filename*."""
+    fallback = filename.encode('ascii', errors='replace').decode('ascii').replace('?', '_')
+    return f"inline; filename={quote_header_value(fallback)}; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def _persist_legacy_digest(cnx, cursor, content_id):
+    """
+    Hashes a legacy inline body once and stores the digest and size on the
+    row, for rows loaded after migration 10 backfilled the rest.
+    """
+    cursor.execute("""
+        UPDATE CourseContent SET ContentDigest = SHA2(Content, 256), ContentSize = LENGTH(Content)
+        WHERE ContentId = %s AND ContentDigest IS NULL
+    """, (content_id,))
+    cursor.execute("SELECT ContentDigest, ContentSize FROM CourseContent WHERE ContentId = %s", (content_id,))
+    row = cursor.fetchone()
+    cnx.commit()
+    return row
+
+
+def _stream_content(cnx, content_id, start, stop):
+    """Yields bytes [start, stop) of a Content BLOB one SUBSTRING chunk at a time."""
+    chunk_size = app.config['CONTENT_CHUNK_SIZE']
+    cursor = cnx.cursor()
+    try:
+        position = start
+        while position < stop:
+            size = min(chunk_size, stop - position)
+            # SUBSTRING positions are 1-based
+            cursor.execute("SELECT SUBSTRING(Content, %s, %s) FROM CourseContent WHERE ContentId = %s",
+                           (position + 1, size, content_id))
+            chunk = cursor.fetchone()[0]
+            if not chunk:
+                break
+            yield bytes(chunk)
+            position += len(chunk)
+    finally:
+        cursor.close()
+
 #create assignment
 @content_bp.route('/course/<int:course_id>/assignments', methods=['POST'])
 @token_required
@@ -167,20 +270,18 @@ def create_assignment(user_data, course_id):
 
     try:
         # Check if the course exists
-        cursor.execute("SELECT CourseID FROM Course WHERE CourseID = %s", (course_id,))
-        course = cursor.fetchone()
+        course = fetch_one(cnx, 'course_exists', (course_id,))
         if not course:
             return jsonify({'message': 'Course not found'}), 404
 
         # Get the next available AssignmentId
-        cursor.execute("SELECT MAX(AssignmentId) FROM Assignment")
-        max_assignment_id = cursor.fetchone()[0]
-        next_assignment_id = 1 if max_assignment_id is None else max_assignment_id + 1
+        next_assignment_id = get_next_id(cnx, "Assignment", "AssignmentId")
 
         cursor.execute("""
             INSERT INTO Assignment (AssignmentId, CourseId, Title, Description, DueDate)
             VALUES (%s, %s, %s, %s, %s)
         """, (next_assignment_id, course_id, title, description, due_date))
+        bump_course_version(cursor, course_id)
 
         cnx.commit()
         return jsonify({'message': 'Assignment created successfully', 'assignment_id': next_assignment_id}), 201
@@ -195,6 +296,7 @@ def create_assignment(user_data, course_id):
 #get assignments
 @content_bp.route('/course/<int:course_id>/assignments', methods=['GET'])
 @token_required
+@conditional_on_version(['admin', 'lecturer', 'student'])
 def get_assignments(user_data, course_id):
     if user_data['role'] not in ['admin', 'lecturer', 'student']:
         return jsonify({'message': 'Access denied'}), 403
@@ -204,27 +306,12 @@ def get_assignments(user_data, course_id):
 
     try:
         # Check if the course exists
-        cursor.execute("SELECT CourseID FROM Course WHERE CourseID = %s", (course_id,))
-        course = cursor.fetchone()
+        course = fetch_one(cnx, 'course_exists', (course_id,))
         if not course:
             return jsonify({'message': 'Course not found'}), 404
 
-        cursor.execute("""
-            SELECT AssignmentId, Title, Description, DueDate
-            FROM Assignment
-            WHERE CourseId = %s
-        """, (course_id,))
-        assignment_list = []
-        assignment_data = cursor.fetchall()
-        for assignment in assignment_data:
-            assignment_list.append({
-                "assignment_id": assignment[0],
-                "title": assignment[1],
-                "description": assignment[2],
-                "due_date": assignment[3].strftime('%Y-%m-%d %H:%M:%S') # Convert datetime to string
-            })
-
-        return jsonify(assignment_list), 200
+        description, rows = fetch_described(cnx, 'course_assignments', (course_id,))
+        return jsonify(RowSerializer(description, ASSIGNMENT_KEYS).rows(rows)), 200
 
     except Exception as e:
         return jsonify({'message': f'Failed to retrieve assignments: {str(e)}'}), 500
@@ -235,6 +322,7 @@ def get_assignments(user_data, course_id):
 #submit assignment
 @content_bp.route('/assignment/<int:assignment_id>/submit', methods=['POST'])
 @token_required
+@query_budget(6)
 def submit_assignment(user_data, assignment_id):
     """
     Allows a student to submit an assignment.
@@ -254,47 +342,38 @@ def submit_assignment(user_data, assignment_id):
 
     try:
         # Check if the assignment exists
-        cursor.execute("SELECT AssignmentId FROM Assignment WHERE AssignmentId = %s", (assignment_id,))
-        assignment = cursor.fetchone()
+        assignment = fetch_one(cnx, 'assignment_exists', (assignment_id,))
         if not assignment:
             return jsonify({'message': 'Assignment not found'}), 404
 
         # Check if the student exists
-        cursor.execute("SELECT StudentID FROM Student WHERE StudentID = %s", (student_id,))
-        student = cursor.fetchone()
+        student = fetch_one(cnx, 'student_exists', (student_id,))
         if not student:
             return jsonify({'message': 'Student not found'}), 404
 
         # Check if the student is enrolled in the course related to the assignment
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM Enrollment E
-            JOIN Assignment A ON E.CourseId = A.CourseId
-            WHERE E.StudentID = %s AND A.AssignmentId = %s
-        """, (student_id, assignment_id))
-
-        is_enrolled = cursor.fetchone()[0]
+        is_enrolled = fetch_one(cnx, 'student_enrolled_for_assignment', (student_id, assignment_id))[0]
         if not is_enrolled:
             return jsonify({'message': 'Student is not enrolled in the course associated with this assignment'}), 400
 
 
         # Check if a submission already exists for this assignment and student
-        cursor.execute("SELECT * FROM Submission WHERE AssignmentId = %s AND StudentID = %s", (assignment_id, student_id))
-        existing_submission = cursor.fetchone()
+        existing_submission = fetch_one(cnx, 'submission_for_student', (assignment_id, student_id))
         if existing_submission:
             return jsonify({'message': 'Submission already exists for this assignment and student'}), 400
 
 
         # Get the next available SubmissionId
-        cursor.execute("SELECT MAX(SubmissionId) FROM Submission")
-        max_submission_id = cursor.fetchone()[0]
-        next_submission_id = 1 if max_submission_id is None else max_submission_id + 1
+        next_submission_id = get_next_id(cnx, "Submission", "SubmissionId")
 
         # Add the submission
+        submission_hash, submission_size = get_blob_store(app.config).put(str(submission_content).encode('utf-8'))
+        add_blob_reference(cursor, submission_hash, submission_size)
+
         cursor.execute("""
-            INSERT INTO Submission (SubmissionId, AssignmentId, StudentID, SubmissionContent)
-            VALUES (%s, %s, %s, %s)
-        """, (next_submission_id, assignment_id, student_id, submission_content))
+            INSERT INTO Submission (SubmissionId, AssignmentId, StudentID, SubmissionHash, SubmissionSize)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (next_submission_id, assignment_id, student_id, submission_hash, submission_size))
 
         cnx.commit()
         return jsonify({'message': 'Assignment submitted successfully', 'submission_id': next_submission_id}), 201
@@ -310,6 +389,7 @@ def submit_assignment(user_data, assignment_id):
 #grade assignment
 @content_bp.route('/submission/<int:submission_id>/grade', methods=['POST'])
 @token_required
+@query_budget(4)
 def grade_submission(user_data, submission_id):
     """
     Allows a lecturer to grade a student's assignment submission.
@@ -330,29 +410,27 @@ def grade_submission(user_data, submission_id):
 
     try:
         # Check if the submission exists
-        cursor.execute("SELECT SubmissionId FROM Submission WHERE SubmissionId = %s", (submission_id,))
-        submission = cursor.fetchone()
+        submission = fetch_one(cnx, 'submission_exists', (submission_id,))
         if not submission:
             return jsonify({'message': 'Submission not found'}), 404
 
         # Check if a grade already exists for this submission
-        cursor.execute("SELECT * FROM Grade WHERE SubmissionId = %s", (submission_id,))
-        existing_grade = cursor.fetchone()
+        existing_grade = fetch_one(cnx, 'grade_for_submission', (submission_id,))
         if existing_grade:
             return jsonify({'message': 'Grade already exists for this submission'}), 400
 
         # Get the next available GradeId
-        cursor.execute("SELECT MAX(GradeId) FROM Grade")
-        max_grade_id = cursor.fetchone()[0]
-        next_grade_id = 1 if max_grade_id is None else max_grade_id + 1
+        next_grade_id = get_next_id(cnx, "Grade", "GradeId")
 
         # Add the grade
         cursor.execute("""
             INSERT INTO Grade (GradeId, SubmissionId, Grade)
             VALUES (%s, %s, %s)
         """, (next_grade_id, submission_id, grade))
+        bump_submission_grade_version(cursor, submission_id)
 
         cnx.commit()
+        report_cache.invalidate('grades')
         return jsonify({'message': 'Submission graded successfully', 'grade_id': next_grade_id}), 201
 
     except Exception as e:
@@ -377,14 +455,14 @@ def get_student_grades(user_data, student_id):
 
     try:
         # Check if the student exists
-        cursor.execute("SELECT StudentID FROM Student WHERE StudentID = %s", (student_id,))
-        student = cursor.fetchone()
+        student = fetch_one(cnx, 'student_exists', (student_id,))
         if not student:
             return jsonify({'message': 'Student not found'}), 404
 
         # Retrieve all grades for the student, including assignment details
         cursor.execute("""
-            SELECT G.GradeId, A.Title, G.Grade, C.CourseName, E.StudentID
+            SELECT G.GradeId AS grade_id, A.Title AS assignment_title, G.Grade AS grade,
+                   C.CourseName AS course_name, E.StudentID AS student_id
             FROM Grade G
             JOIN Submission S ON G.SubmissionId = S.SubmissionId
             JOIN Assignment A ON S.AssignmentId = A.AssignmentId
@@ -394,18 +472,7 @@ def get_student_grades(user_data, student_id):
             ORDER BY C.CourseName, S.StudentID
         """, (student_id,))
 
-        grades_list = []
-        grades_data = cursor.fetchall()
-        for grade in grades_data:
-            grades_list.append({
-                "grade_id": grade[0],
-                "assignment_title": grade[1],
-                "grade": grade[2],
-                "course_name": grade[3],
-                "student_id": grade[4]
-            })
-
-        return jsonify(grades_list), 200
+        return jsonify(serialize_rows(cursor)), 200
 
     except Exception as e:
         return jsonify({'message': f'Failed to retrieve student grades: {str(e)}'}), 500
@@ -416,6 +483,7 @@ def get_student_grades(user_data, student_id):
 #use new grades from grades tables to calculate or adjust grade in enrollments
 @content_bp.route('/course/<int:course_id>/calculate-grades', methods=['POST'])
 @token_required
+@query_budget(9)
 def calculate_course_grades(user_data, course_id):
     """
     Calculates and updates grades in Enrollment table based on submitted assignments.
@@ -429,67 +497,111 @@ def calculate_course_grades(user_data, course_id):
 
     try:
         # Check if the course exists
-        cursor.execute("SELECT CourseID FROM Course WHERE CourseID = %s", (course_id,))
-        course = cursor.fetchone()
+        course = fetch_one(cnx, 'course_exists', (course_id,))
         if not course:
             return jsonify({'message': 'Course not found'}), 404
 
-        # Get all students enrolled in the course
-        cursor.execute("SELECT StudentID FROM Enrollment WHERE CourseID = %s", (course_id,))
-        student_ids = [row[0] for row in cursor.fetchall()]
-
-        # Track students whose grades were updated
-        updated_students = []
-
-        for student_id in student_ids:
-            # Calculate average grade for this student in this course from assignments
-            cursor.execute("""
-                SELECT AVG(G.Grade)
-                FROM Grade G
-                JOIN Submission S ON G.SubmissionId = S.SubmissionId
-                JOIN Assignment A ON S.AssignmentId = A.AssignmentId
-                WHERE S.StudentID = %s AND A.CourseID = %s
-            """, (student_id, course_id))
-
-            new_avg_grade = cursor.fetchone()[0]
-
-            # If student has assignment grades
-            if new_avg_grade is not None:
-                # Check if there's an existing grade in Enrollment
-                cursor.execute("""
-                    SELECT Grade FROM Enrollment
-                    WHERE StudentID = %s AND CourseID = %s
-                """, (student_id, course_id))
-
-                existing_grade_row = cursor.fetchone()
-                existing_grade = existing_grade_row[0] if existing_grade_row and existing_grade_row[0] is not None else None
-
-                if existing_grade is not None:
-                    # Average the existing grade with the new grade
-                    final_grade = (existing_grade + new_avg_grade) / 2
-                else:
-                    # Use the new grade directly if no existing grade
-                    final_grade = new_avg_grade
-
-                # Update the Enrollment record
-                cursor.execute("""
-                    UPDATE Enrollment
-                    SET Grade = %s
-                    WHERE StudentID = %s AND CourseID = %s
-                """, (final_grade, student_id, course_id))
-
-                updated_students.append(student_id)
+        result = recalculate_grades(cnx, course_id)
+        refresh_student_averages(cursor, course_id)
+        bump_grade_version(cursor, course_id)
+        cnx.commit()
+        report_cache.invalidate('grades')
+        return jsonify(dict(result, message='Grades calculated and updated successfully')), 200
 
+    except Exception as e:
+        cnx.rollback()
+        return jsonify({'message': f'Failed to calculate grades: {str(e)}'}), 500
+    finally:
+        cursor.close()
+        cnx.close()
+
+#recalculate enrollment grades for every course in one job
+@content_bp.route('/courses/calculate-grades', methods=['POST'])
+@token_required
+def calculate_all_course_grades(user_data):
+    """
+    Recalculates Enrollment grades for all courses in a single set-based pass.
+    """
+    if user_data['role'] != 'admin':
+        return jsonify({'message': 'Access denied: Only admins can recalculate all grades'}), 403
+
+    cnx = connect_to_mysql(app.config)
+    cursor = cnx.cursor()
+
+    try:
+        result = recalculate_grades(cnx)
+        refresh_student_averages(cursor)
+        # Every course's grade statistics include the catalog's GradeVersion
+        bump_grade_version(cursor, CATALOG)
         cnx.commit()
-        return jsonify({
-            'message': 'Grades calculated and updated successfully',
-            'updated_students': updated_students,
-            'total_updated': len(updated_students)
-        }), 200
+        report_cache.invalidate('grades')
+        return jsonify(dict(result, message='Grades calculated and updated for all courses')), 200
 
     except Exception as e:
         cnx.rollback()
         return jsonify({'message': f'Failed to calculate grades: {str(e)}'}), 500
     finally:
         cursor.close()
-        cnx.close()
\ No newline at end of file
+        cnx.close()
+
+
+#grade distributions and per-assignment difficulty for one course
+@content_bp.route('/course/<int:course_id>/grade-stats', methods=['GET'])
+@token_required
+@query_budget(4)
+def get_course_grade_stats(user_data, course_id):
+    """
+    Mean, median, percentiles, standard deviation and a histogram of the
+    course's final and assignment grades, and per-assignment difficulty.
+    Cached until the course's grades, members or assignments change.
+    """
+    if user_data['role'] not in ['admin', 'lecturer']:
+        return jsonify({'message': 'Access denied'}), 403
+
+    cnx = connect_to_mysql(app.config)
+
+    try:
+        if not fetch_one(cnx, 'course_exists', (course_id,)):
+            return jsonify({'message': 'Course not found'}), 404
+        key = ('course', course_id, grade_version_key(cnx, course_id))
+        return _cached_grade_stats(key, lambda: course_grade_stats(cnx, course_id))
+    except Exception as e:
+        return jsonify({'message': f'Failed to compute grade statistics: {str(e)}'}), 500
+    finally:
+        cnx.close()
+
+
+#grade distribution summary of every course
+@content_bp.route('/courses/grade-stats', methods=['GET'])
+@token_required
+@query_budget(2)
+def get_all_course_grade_stats(user_data):
+    """
+    Per-course grade summaries for all courses, computed in one pass over
+    all grades. Cached until any course's grades or members change.
+    """
+    if user_data['role'] != 'admin':
+        return jsonify({'message': 'Access denied'}), 403
+
+    cnx = connect_to_mysql(app.config)
+
+    try:
+        key = ('all', grade_version_key(cnx))
+        return _cached_grade_stats(key, lambda: all_course_grade_stats(cnx))
+    except Exception as e:
+        return jsonify({'message': f'Failed to compute grade statistics: {str(e)}'}), 500
+    finally:
+        cnx.close()
+
+
+def _cached_grade_stats(key, compute):
+    entry = grade_stats_cache.get(key)
+    if entry is not None:
+        response = jsonify(entry[2])
+        response.headers['X-Cache'] = 'HIT'
+        return response, 200
+    stats = compute()
+    grade_stats_cache.set(key, (), stats, 200, None)
+    response = jsonify(stats)
+    response.headers['X-Cache'] = 'MISS'
+    return response, 200
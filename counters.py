@@ -0,0 +1,42 @@
+LIMIT_SQLSTATE = '45000'  # SIGNALed by the enrollment/teaching limit triggers
+MAX_STUDENT_COURSES = 6  # same limit as the check_student_enrollment_limit trigger
+MAX_LECTURER_COURSES = 5  # same limit as the check_lecturer_course_limit trigger
+
+# (table, key, counted table) for each maintained CourseCount column
+COUNTERS = (
+    ('Student', 'StudentID', 'Enrollment'),
+    ('Lecturer', 'LecId', 'CourseLecturer'),
+)
+
+
+def is_limit_error(err):
+    """True if a mysql.connector error came from one of the course-limit triggers."""
+    return getattr(err, 'sqlstate', None) == LIMIT_SQLSTATE
+
+
+def reconcile_counters(cnx):
+    """
+    Repairs Student/Lecturer.CourseCount drift against the actual rows.
+
+    Only rows whose counter is wrong are written. Returns the number of
+    rows repaired per table.
+    """
+    cursor = cnx.cursor()
+    repaired = {}
+    try:
+        for table, key, counted in COUNTERS:
+            cursor.execute(f"""
+                UPDATE {table} T
+                LEFT JOIN (SELECT {key}, COUNT(*) AS Actual FROM {counted} GROUP BY {key}) X
+                    ON X.{key} = T.{key}
+                SET T.CourseCount = COALESCE(X.Actual, 0)
+                WHERE T.CourseCount <> COALESCE(X.Actual, 0)
+            """)
+            repaired[table] = cursor.rowcount
+        cnx.commit()
+        return repaired
+    except Exception:
+        cnx.rollback()
+        raise
+    finally:
+        cursor.close()
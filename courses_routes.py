@@ -1,10 +1,26 @@
-from flask import Blueprint, jsonify, request, current_app as app
-from .utilities import connect_to_mysql, token_required
+import csv
+import io
+import json
+import mysql.connector
+from flask import Blueprint, Response, jsonify, request, stream_with_context, current_app as app
+from .utilities import connect_to_mysql, release_request_connection, token_required
+from .statements import fetch_one, fetch_all
 from .config import Config
 from .utilities import get_next_course_code, get_next_course_id
+from .report_tables import record_enrollment, record_enrollments, record_lecturer_assignment
+from .response_cache import report_cache
+from .counters import is_limit_error, MAX_STUDENT_COURSES
+from .query_diagnostics import query_budget
+from .dashboard import fetch_dashboard
+from .db_pool import close_streaming_cursor
+from .versions import (bump_course_version, bump_course_versions, bump_catalog_version,
+                       conditional_on_version)
 
 courses_bp = Blueprint('courses', __name__)
 
+STREAM_BATCH_SIZE = 1000
+LOOKUP_CHUNK_SIZE = 1000 # IDs per IN (...) list
+
 
 #create course
 @courses_bp.route('/createcourse', methods=['POST'])
@@ -33,6 +49,7 @@ def create_course(user_data):
 
       cursor.execute("INSERT INTO Course (CourseID, CourseName, CourseCode) VALUES (%s, %s, %s)",
       (next_course_id, course_name, next_course_code))
+      bump_catalog_version(cursor)
       cnx.commit()
       return jsonify({'message': 'Course created successfully', 'course_code': next_course_code}), 201
     except Exception as e:
@@ -46,6 +63,7 @@ def create_course(user_data):
 #get courses
 @courses_bp.route('/courses', methods=['GET'])
 @token_required
+@conditional_on_version(['admin', 'lecturer', 'student'])
 def get_courses(user_data):
     if user_data['role'] not in ['admin', 'lecturer', 'student']:
         return jsonify({'message': 'Access denied'}), 403
@@ -56,8 +74,7 @@ def get_courses(user_data):
 
 
     try:
-        cursor.execute("SELECT CourseID, CourseName, CourseCode FROM Course")
-        courses = cursor.fetchall()
+        courses = fetch_all(cnx, 'all_courses')
         courses_list = [{'CourseID': course[0], 'CourseName': course[1], 'CourseCode': course[2]} for course in courses]
         return jsonify(courses_list), 200
     except Exception as e:
@@ -88,9 +105,7 @@ def get_student_courses(user_data, student_id):
 #                 if user_student_id != student_id:
 #                     return jsonify({'message': 'Access denied'}), 403
 
-        cursor.execute("""SELECT Course.CourseID, CourseName, CourseCode FROM Course
-        JOIN Enrollment ON Course.CourseID = Enrollment.CourseID WHERE StudentID = %s""", (student_id,))
-        courses = cursor.fetchall()
+        courses = fetch_all(cnx, 'student_courses', (student_id,))
         courses_list = [{'CourseID': course[0], 'CourseName': course[1], 'CourseCode': course[2]} for course in courses]
         return jsonify(courses_list), 200
     except Exception as e:
@@ -99,6 +114,42 @@ def get_student_courses(user_data, student_id):
         cursor.close()
         cnx.close()
 
+#student dashboard: courses, assignments, grades and upcoming events in one call
+@courses_bp.route('/student/<int:student_id>/dashboard', methods=['GET'])
+@token_required
+def get_student_dashboard(user_data, student_id):
+    """
+    Returns a student's home page in one document.
+
+    The sections are fetched concurrently on separate pooled connections.
+    A section that fails, exceeds DASHBOARD_SECTION_TIMEOUT or waits longer
+    than DASHBOARD_QUEUE_TIMEOUT for a worker comes back as null, with the
+    reason under "errors"; the rest are still returned.
+    ?days=N sets how far ahead calendar events are listed (default 14).
+    """
+    if user_data['role'] not in ['admin', 'lecturer', 'student']:
+        return jsonify({'message': 'Access denied'}), 403
+
+    days = request.args.get('days', 14, type=int)
+    if not 1 <= days <= 366:
+        return jsonify({'message': 'days must be between 1 and 366'}), 400
+
+    cnx = connect_to_mysql(app.config)
+
+    try:
+        if not fetch_one(cnx, 'student_exists', (student_id,)):
+            return jsonify({'message': 'Student not found'}), 404
+
+        # Hand the request's connection back so it is not held idle while the
+        # sections wait for theirs
+        release_request_connection()
+        sections, errors = fetch_dashboard(app.config, student_id, days)
+        return jsonify(dict(sections, student_id=student_id, errors=errors)), 200
+    except Exception as e:
+        return jsonify({'message': f'Failed to retrieve dashboard: {str(e)}'}), 500
+    finally:
+        cnx.close()
+
 #get lecturer courses
 @courses_bp.route('/lecturer/<int:lecturer_id>/courses', methods=['GET'])
 @token_required
@@ -110,9 +161,7 @@ def get_lecturer_courses(user_data, lecturer_id):
     cursor = cnx.cursor()
 
     try:
-        cursor.execute("""SELECT Course.CourseID, CourseName, CourseCode FROM Course
-        JOIN CourseLecturer ON Course.CourseID = CourseLecturer.CourseID WHERE LecID = %s""", (lecturer_id,))
-        courses = cursor.fetchall()
+        courses = fetch_all(cnx, 'lecturer_courses', (lecturer_id,))
         courses_list = [{'CourseID': course[0], 'CourseName': course[1], 'CourseCode': course[2]} for course in courses]
         return jsonify(courses_list), 200
     except Exception as e:
@@ -133,30 +182,32 @@ def assign_lecturer_to_course(user_data, course_id, lecturer_id):
     cursor = cnx.cursor()
 
     try:
-        cursor.execute("SELECT CourseID FROM Course WHERE CourseID = %s", (course_id,))
-        course = cursor.fetchone()
+        course = fetch_one(cnx, 'course_exists', (course_id,))
         if not course:
             return jsonify({'message': 'Course not found'}), 404
-        course_result = cursor.fetchall() # Consume the result
 
-        cursor.execute("SELECT LecId FROM Lecturer WHERE LecId = %s", (lecturer_id,))
-        lecturer = cursor.fetchone()
+        lecturer = fetch_one(cnx, 'lecturer_exists', (lecturer_id,))
         if not lecturer:
             return jsonify({'message': 'Lecturer not found'}), 404
-        lecturer_result = cursor.fetchall() # Consume the result
 
         # Check if any lecturer is already assigned to the course
-        cursor.execute("SELECT LecId FROM CourseLecturer WHERE CourseID = %s", (course_id,))
-        existing_lecturer = cursor.fetchone()
+        existing_lecturer = fetch_one(cnx, 'course_lecturer_id', (course_id,))
         if existing_lecturer:
             return jsonify({'message': 'Course already has a lecturer assigned'}), 400
-        existing_lecturer_result = cursor.fetchall() # Consume the result
 
 
-        # Assign the lecturer to the course
+        # Assign the lecturer to the course; the trigger enforces the 5-course limit
         cursor.execute("INSERT INTO CourseLecturer (CourseID, LecID) VALUES (%s, %s)", (course_id, lecturer_id))
+        record_lecturer_assignment(cursor, lecturer_id)
+        bump_course_version(cursor, course_id)
         cnx.commit()
+        report_cache.invalidate('lecturer')
         return jsonify({'message': 'Lecturer assigned to course successfully'}), 201
+    except mysql.connector.Error as e:
+        cnx.rollback()
+        if is_limit_error(e):
+            return jsonify({'message': 'Lecturer cannot teach more than 5 courses'}), 400
+        return jsonify({'message': f'Failed to assign lecturer to course: {str(e)}'}), 500
     except Exception as e:
         cnx.rollback()
         return jsonify({'message': f'Failed to assign lecturer to course: {str(e)}'}), 500
@@ -175,93 +226,330 @@ def enroll_student_in_course(user_data, student_id, course_id):
     cursor = cnx.cursor()
 
     try:
-        cursor.execute("SELECT CourseID FROM Course WHERE CourseID = %s", (course_id,))
-        course = cursor.fetchone()
+        course = fetch_one(cnx, 'course_exists', (course_id,))
         if not course:
             return jsonify({'message': 'Course not found'}), 404
 
-        cursor.execute("SELECT StudentID FROM Student WHERE StudentID = %s", (student_id,))
-        student = cursor.fetchone()
+        student = fetch_one(cnx, 'student_exists', (student_id,))
         if not student:
             return jsonify({'message': 'Student not found'}), 404
 
         # Check if the student is already enrolled in the course
-        cursor.execute("SELECT * FROM Enrollment WHERE StudentID = %s AND CourseID = %s", (student_id, course_id))
-        enrollment = cursor.fetchone()
+        enrollment = fetch_one(cnx, 'enrollment_exists', (student_id, course_id))
         if enrollment:
             return jsonify({'message': 'Student is already enrolled in this course'}), 400
 
-        #Check if the student is doing more than 6 courses
-        cursor.execute("SELECT COUNT(*) FROM Enrollment WHERE StudentID = %s", (student_id,))
-        count = cursor.fetchone()[0]
-        if count >= 6:
-            return jsonify({'message': 'Student cannot enroll in more than 6 courses'}), 400
-
-        # Enroll the student in the course
+        # Enroll the student in the course; the enrollment trigger enforces the
+        # 6-course limit with a guarded increment of Student.CourseCount
         cursor.execute("INSERT INTO Enrollment (StudentID, CourseID) VALUES (%s, %s)", (student_id, course_id))
+        record_enrollment(cursor, student_id, course_id)
+        bump_course_version(cursor, course_id)
         cnx.commit()
+        report_cache.invalidate('enrollment')
         return jsonify({'message': 'Student enrolled in course successfully'}), 201
+    except mysql.connector.Error as e:
+        cnx.rollback()
+        if is_limit_error(e):
+            return jsonify({'message': 'Student cannot enroll in more than 6 courses'}), 400
+        return jsonify({'message': f'Failed to enroll student in course: {str(e)}'}), 500
     except Exception as e:
         cnx.rollback()
         return jsonify({'message': f'Failed to enroll student in course: {str(e)}'}), 500
     finally:
         cnx.close()
 
+#enroll many students in courses in one call
+@courses_bp.route('/enrollments/bulk', methods=['POST'])
+@token_required
+def bulk_enroll_students(user_data):
+    """
+    Enrolls a batch of (student_id, course_id) pairs.
+
+    Accepts a JSON list of {"student_id", "course_id"} objects (optionally
+    wrapped as {"enrollments": [...]}) or CSV with student_id,course_id
+    columns. Rows are validated with set-based lookups, the 6-course limit
+    is applied across the whole batch, and accepted rows are inserted with
+    multi-row statements, one transaction per chunk. Returns a result for
+    every input row.
+    """
+    if user_data['role'] not in ['admin', 'lecturer']:
+        return jsonify({'message': 'Access denied'}), 403
+
+    try:
+        pairs = _parse_bulk_enrollments()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if len(pairs) > app.config['BULK_ENROLLMENT_MAX_ROWS']:
+        return jsonify({'message': f"At most {app.config['BULK_ENROLLMENT_MAX_ROWS']} rows per request"}), 400
+
+    cnx = connect_to_mysql(app.config)
+    cursor = cnx.cursor()
+
+    try:
+        results = [{'row': i, 'student_id': student_id, 'course_id': course_id}
+                   for i, (student_id, course_id) in enumerate(pairs)]
+        for result in results:
+            if result['student_id'] is None or result['course_id'] is None:
+                _reject(result, 'student_id and course_id must be integers')
+
+        student_ids = {r['student_id'] for r in results if 'status' not in r}
+        course_ids = {r['course_id'] for r in results if 'status' not in r}
+
+        existing_courses = set()
+        for chunk in _chunks(sorted(course_ids), LOOKUP_CHUNK_SIZE):
+            cursor.execute(f"SELECT CourseId FROM Course WHERE CourseId IN ({', '.join(['%s'] * len(chunk))})",
+                           chunk)
+            existing_courses.update(row[0] for row in cursor.fetchall())
+
+        # One pass gives which students exist and what they are already taking
+        enrolled = {}
+        for chunk in _chunks(sorted(student_ids), LOOKUP_CHUNK_SIZE):
+            cursor.execute(f"""
+                SELECT S.StudentID, E.CourseId
+                FROM Student S
+                LEFT JOIN Enrollment E ON E.StudentID = S.StudentID
+                WHERE S.StudentID IN ({', '.join(['%s'] * len(chunk))})
+            """, chunk)
+            for student_id, course_id in cursor.fetchall():
+                courses = enrolled.setdefault(student_id, set())
+                if course_id is not None:
+                    courses.add(course_id)
+
+        accepted = []
+        for result in results:
+            if 'status' in result:
+                continue
+            student_id, course_id = result['student_id'], result['course_id']
+            if course_id not in existing_courses:
+                _reject(result, 'Course not found')
+            elif student_id not in enrolled:
+                _reject(result, 'Student not found')
+            elif course_id in enrolled[student_id]:
+                _reject(result, 'Student is already enrolled in this course')
+            elif len(enrolled[student_id]) >= MAX_STUDENT_COURSES:
+                _reject(result, f'Student cannot enroll in more than {MAX_STUDENT_COURSES} courses')
+            else:
+                enrolled[student_id].add(course_id)
+                accepted.append(result)
+
+        for chunk in _chunks(accepted, app.config['BULK_ENROLLMENT_CHUNK_SIZE']):
+            _insert_enrollment_chunk(cnx, cursor, chunk)
+
+        if any(r['status'] == 'accepted' for r in accepted):
+            report_cache.invalidate('enrollment')
+
+        accepted_count = sum(1 for r in results if r['status'] == 'accepted')
+        return jsonify({
+            'accepted': accepted_count,
+            'rejected': len(results) - accepted_count,
+            'results': results
+        }), 200
+
+    except Exception as e:
+        cnx.rollback()
+        return jsonify({'message': f'Bulk enrollment failed: {str(e)}'}), 500
+    finally:
+        cursor.close()
+        cnx.close()
+
+
+def _parse_bulk_enrollments():
+    """Returns [(student_id, course_id)] from a JSON or CSV body; unparseable IDs become None."""
+    if request.mimetype == 'text/csv':
+        reader = csv.DictReader(io.StringIO(request.get_data(as_text=True)))
+        if not reader.fieldnames or not {'student_id', 'course_id'} <= set(reader.fieldnames):
+            raise ValueError('CSV must have student_id and course_id columns')
+        rows = list(reader)
+    else:
+        data = request.get_json(silent=True)
+        rows = data.get('enrollments') if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValueError('Expected a list of enrollments')
+    if not rows:
+        raise ValueError('No enrollments provided')
+
+    pairs = []
+    for row in rows:
+        if not isinstance(row, dict):
+            raise ValueError('Each enrollment must be an object with student_id and course_id')
+        pairs.append((_as_int(row.get('student_id')), _as_int(row.get('course_id'))))
+    return pairs
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _reject(result, reason):
+    result['status'] = 'rejected'
+    result['reason'] = reason
+
+
+def _insert_enrollment_chunk(cnx, cursor, chunk):
+    """
+    Inserts a chunk with one multi-row INSERT. If the chunk fails (e.g. the
+    enrollment trigger fires because of a concurrent enrollment), its rows
+    are retried one by one so each gets its own result.
+    """
+    pairs = [(r['student_id'], r['course_id']) for r in chunk]
+    try:
+        cursor.execute("INSERT INTO Enrollment (StudentID, CourseID) VALUES " + ', '.join(['(%s, %s)'] * len(pairs)),
+                       [value for pair in pairs for value in pair])
+        record_enrollments(cursor, pairs)
+        bump_course_versions(cursor, [course_id for _, course_id in pairs])
+        cnx.commit()
+        for result in chunk:
+            result['status'] = 'accepted'
+        return
+    except mysql.connector.Error:
+        cnx.rollback()
+
+    for result in chunk:
+        try:
+            cursor.execute("INSERT INTO Enrollment (StudentID, CourseID) VALUES (%s, %s)",
+                           (result['student_id'], result['course_id']))
+            record_enrollment(cursor, result['student_id'], result['course_id'])
+            bump_course_version(cursor, result['course_id'])
+            cnx.commit()
+            result['status'] = 'accepted'
+        except mysql.connector.Error as e:
+            cnx.rollback()
+            _reject(result, e.msg)
+
 #Should return members of a particular course
 @courses_bp.route('/course/<int:course_id>/members', methods=['GET'])
 @token_required
+@conditional_on_version(['admin', 'lecturer', 'student'])
+@query_budget(4)
 def get_course_members(user_data, course_id):
+    """
+    Returns the members of a course, lecturer first, then students by StudentID.
+
+    Students are paged with a keyset cursor: ?limit=N&after=<StudentID>.
+    When more students remain, the X-Next-After header carries the cursor
+    for the next page. ?stream=json or ?stream=ndjson instead streams every
+    student (from ?after on) straight off an unbuffered cursor.
+    """
     if user_data['role'] not in ['admin', 'lecturer', 'student']:
         return jsonify({'message': 'Access denied'}), 403
+
+    try:
+        limit = int(request.args.get('limit', app.config['MEMBERS_PAGE_SIZE']))
+        after = request.args.get('after', type=int)
+        if after is None and request.args.get('after'):
+            raise ValueError
+    except ValueError:
+        return jsonify({'message': 'limit and after must be integers'}), 400
+    if not 1 <= limit <= app.config['MEMBERS_MAX_PAGE_SIZE']:
+        return jsonify({'message': f"limit must be between 1 and {app.config['MEMBERS_MAX_PAGE_SIZE']}"}), 400
+
+    stream = request.args.get('stream')
+    if stream not in (None, 'json', 'ndjson'):
+        return jsonify({'message': 'stream must be json or ndjson'}), 400
+
     cnx = connect_to_mysql(app.config)
     cursor = cnx.cursor()
 
     try:
         # Check if the course exists
-        cursor.execute("SELECT CourseID FROM Course WHERE CourseID = %s", (course_id,))
-        course = cursor.fetchone()
+        course = fetch_one(cnx, 'course_exists', (course_id,))
         if not course:
             return jsonify({'message': 'Course not found'}), 404
 
         members = []
 
-        # Get the lecturer for the course
-        cursor.execute("""
-            SELECT L.LecId, L.LecFirstName, L.LecLastName
-            FROM Lecturer L
-            JOIN CourseLecturer CL ON L.LecId = CL.LecId
-            WHERE CL.CourseID = %s
-        """, (course_id,))
-        lecturer = cursor.fetchone()
-        if lecturer:
-            members.append({
-                'member_id': lecturer[0],
-                'first_name': lecturer[1],
-                'last_name': lecturer[2],
-                'role': 'lecturer'
-            })
-
-        # Get the students enrolled in the course
+        # The lecturer is only listed on the first page
+        if after is None:
+            lecturer = fetch_one(cnx, 'course_lecturer', (course_id,))
+            if lecturer:
+                members.append(_member_dict(lecturer, 'lecturer'))
+
+        if stream:
+            cursor.close()
+            cursor = None
+            return Response(stream_with_context(_stream_course_members(cnx, course_id, after, members, stream)),
+                            mimetype='application/x-ndjson' if stream == 'ndjson' else 'application/json'), 200
+
+        # Get the next page of students enrolled in the course, fetching one
+        # extra row to know whether another page follows
         cursor.execute("""
             SELECT S.StudentID, S.FirstName, S.LastName
-            FROM Student S
-            JOIN Enrollment E ON S.StudentID = E.StudentID
-            WHERE E.CourseID = %s
-        """, (course_id,))
+            FROM Enrollment E
+            JOIN Student S ON S.StudentID = E.StudentID
+            WHERE E.CourseID = %s AND E.StudentID > %s
+            ORDER BY E.StudentID
+            LIMIT %s
+        """, (course_id, after or 0, limit + 1))
         students = cursor.fetchall()
-        for student in students:
-            members.append({
-                'member_id': student[0],
-                'first_name': student[1],
-                'last_name': student[2],
-                'role': 'student'
-            })
+        has_more = len(students) > limit
+        for student in students[:limit]:
+            members.append(_member_dict(student, 'student'))
 
-        return jsonify(members), 200
+        response = jsonify(members)
+        if has_more:
+            next_after = students[limit - 1][0]
+            response.headers['X-Next-After'] = str(next_after)
+            response.headers['Link'] = f'<{request.path}?limit={limit}&after={next_after}>; rel="next"'
+        return response, 200
 
     except Exception as e:
         return jsonify({'message': f'Failed to retrieve course members: {str(e)}'}), 500
     finally:
-        cursor.close()
+        if cursor: cursor.close()
         cnx.close()
 
+
+def _member_dict(row, role):
+    return {
+        'member_id': row[0],
+        'first_name': row[1],
+        'last_name': row[2],
+        'role': role
+    }
+
+
+def _stream_course_members(cnx, course_id, after, leading_members, stream):
+    """Yields course members as a JSON array or NDJSON lines, batch by batch."""
+    cursor = cnx.cursor() # unbuffered: rows are read from the socket as we go
+    try:
+        cursor.execute("""
+            SELECT S.StudentID, S.FirstName, S.LastName
+            FROM Enrollment E
+            JOIN Student S ON S.StudentID = E.StudentID
+            WHERE E.CourseID = %s AND E.StudentID > %s
+            ORDER BY E.StudentID
+        """, (course_id, after or 0))
+
+        if stream == 'ndjson':
+            for member in leading_members:
+                yield json.dumps(member) + '\n'
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                yield ''.join(json.dumps(_member_dict(row, 'student')) + '\n' for row in rows)
+        else:
+            separator = '['
+            for member in leading_members:
+                yield separator + json.dumps(member)
+                separator = ','
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                chunk = []
+                for row in rows:
+                    chunk.append(separator + json.dumps(_member_dict(row, 'student')))
+                    separator = ','
+                yield ''.join(chunk)
+            yield '[]' if separator == '[' else ']'
+    finally:
+        close_streaming_cursor(cnx, cursor)
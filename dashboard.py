@@ -0,0 +1,126 @@
+import datetime
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from .db_pool import get_pool
+from .serializer import serialize_rows
+
+# Each section runs on its own pooled connection. The MAX_EXECUTION_TIME hint
+# makes MySQL abandon a section query that outlives the section timeout, so a
+# timed-out section does not keep holding its connection.
+#
+# Sections wait no longer than the section timeout for a connection, and the
+# route hands its own connection back before fanning out. Even so,
+# MYSQL_POOL_SIZE + MYSQL_POOL_MAX_OVERFLOW should be at least
+# DASHBOARD_WORKERS plus the number of request threads, or busy dashboards
+# starve ordinary requests of connections.
+SECTION_QUERIES = {
+    'courses': """
+        SELECT /*+ MAX_EXECUTION_TIME({ms}) */ C.CourseID, C.CourseName, C.CourseCode, E.Grade
+        FROM Enrollment E
+        JOIN Course C ON C.CourseID = E.CourseID
+        WHERE E.StudentID = %s
+        ORDER BY C.CourseName""",
+    'assignments': """
+        SELECT /*+ MAX_EXECUTION_TIME({ms}) */ A.AssignmentId, A.CourseId, A.Title, A.DueDate,
+               S.SubmissionId IS NOT NULL AS Submitted
+        FROM Enrollment E
+        JOIN Assignment A ON A.CourseId = E.CourseId
+        LEFT JOIN Submission S ON S.AssignmentId = A.AssignmentId AND S.StudentID = E.StudentID
+        WHERE E.StudentID = %s
+        ORDER BY A.DueDate""",
+    'grades': """
+        SELECT /*+ MAX_EXECUTION_TIME({ms}) */ G.GradeId, A.AssignmentId, A.Title, A.CourseId, G.Grade, G.Feedback
+        FROM Submission S
+        JOIN Grade G ON G.SubmissionId = S.SubmissionId
+        JOIN Assignment A ON A.AssignmentId = S.AssignmentId
+        WHERE S.StudentID = %s
+        ORDER BY G.GradingDate DESC""",
+    'events': """
+        SELECT /*+ MAX_EXECUTION_TIME({ms}) */ CE.EventId, CE.CourseId, CE.EventDate, CE.EventTime, CE.Description
+        FROM Enrollment E
+        JOIN CalendarEvent CE ON CE.CourseId = E.CourseId
+        WHERE E.StudentID = %s AND CE.EventDate >= %s AND CE.EventDate < %s
+        ORDER BY CE.EventDate, CE.EventTime""",
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard')
+    return _executor
+
+
+def _fetch_section(config, name, params, timeout):
+    pool = get_pool(config)
+    cnx = pool.connection(timeout=min(timeout, pool.timeout))
+    try:
+        cursor = cnx.cursor()
+        cursor.execute(SECTION_QUERIES[name].format(ms=int(timeout * 1000)), params)
+        rows = serialize_rows(cursor)
+        cursor.close()
+        return rows
+    finally:
+        cnx.release()
+
+
+def _timed_section(started, config, name, params, timeout):
+    started[name] = time.monotonic()
+    return _fetch_section(config, name, params, timeout)
+
+
+def fetch_dashboard(config, student_id, event_days=14):
+    """
+    Fetches the dashboard sections for a student concurrently.
+
+    Returns (sections, errors): sections maps each section name to its rows,
+    or None when it failed; errors says why for each missing section. A
+    section gets DASHBOARD_SECTION_TIMEOUT from when a worker starts it, and
+    one still waiting for a worker after DASHBOARD_QUEUE_TIMEOUT is dropped
+    as queued rather than timed out.
+    """
+    timeout = config['DASHBOARD_SECTION_TIMEOUT']
+    queue_timeout = config['DASHBOARD_QUEUE_TIMEOUT']
+    today = datetime.date.today()
+    params = {
+        'courses': (student_id,),
+        'assignments': (student_id,),
+        'grades': (student_id,),
+        'events': (student_id, today, today + datetime.timedelta(days=event_days)),
+    }
+    executor = _get_executor(config['DASHBOARD_WORKERS'])
+    submitted = time.monotonic()
+    started = {}  # name -> when a worker picked the section up
+    futures = {name: executor.submit(_timed_section, started, config, name, params[name], timeout)
+               for name in SECTION_QUERIES}
+
+    def deadline(name):
+        return started[name] + timeout if name in started else submitted + queue_timeout
+
+    while True:
+        now = time.monotonic()
+        pending = {name: future for name, future in futures.items() if not future.done() and now < deadline(name)}
+        if not pending:
+            break
+        wait(pending.values(), timeout=min(deadline(name) for name in pending) - now, return_when=FIRST_COMPLETED)
+
+    sections, errors = {}, {}
+    for name, future in futures.items():
+        sections[name] = None
+        if not future.done():
+            # cancel() only succeeds for a section no worker has started
+            if future.cancel():
+                errors[name] = f'queued for more than {queue_timeout}s; the dashboard workers are busy'
+            else:
+                errors[name] = f'timed out after {timeout}s'
+        elif future.exception() is not None:
+            errors[name] = str(future.exception())
+        else:
+            sections[name] = future.result()
+    return sections, errors
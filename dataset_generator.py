@@ -0,0 +1,215 @@
+import bisect
+import csv
+import datetime
+import os
+import random
+import time
+from .counters import MAX_STUDENT_COURSES, MAX_LECTURER_COURSES
+from .utilities import generate_hashed_password
+
+MIN_STUDENTS_PER_COURSE = 10
+DEFAULT_PASSWORD = 'password'  # every generated student and lecturer; the admin uses 'admin'
+
+LECTURER_ID_START = 10000001
+STUDENT_ID_START = 620000001
+TERM_START = datetime.datetime(2025, 9, 1, 9, 0)
+
+# Department -> (course code prefix, subjects)
+DEPARTMENTS = {
+    'Computer Science': ('CSC', ('Data Structures', 'Operating Systems', 'Database Systems', 'Machine Learning',
+                                 'Computer Networks', 'Software Engineering')),
+    'Engineering': ('ENG', ('Dynamics', 'Thermodynamics', 'Circuit Analysis', 'Fluid Mechanics',
+                            'Materials Science', 'Control Systems')),
+    'Mathematics': ('MAT', ('Calculus', 'Linear Algebra', 'Real Analysis', 'Probability', 'Number Theory',
+                            'Differential Equations')),
+    'Physics': ('PHY', ('Mechanics', 'Electromagnetism', 'Quantum Physics', 'Optics', 'Astrophysics',
+                        'Statistical Physics')),
+    'Chemistry': ('CHE', ('Organic Chemistry', 'Inorganic Chemistry', 'Physical Chemistry', 'Biochemistry',
+                          'Analytical Chemistry', 'Polymer Chemistry')),
+    'Biology': ('BIO', ('Genetics', 'Cell Biology', 'Ecology', 'Microbiology', 'Zoology', 'Botany')),
+    'Geography': ('GEO', ('Climatology', 'Cartography', 'Urban Geography', 'Geomorphology', 'Hydrology',
+                          'Population Geography')),
+    'History': ('HIS', ('Ancient History', 'Medieval Europe', 'Caribbean History', 'Modern World History',
+                        'Economic History', 'Historiography')),
+    'Economics': ('ECO', ('Microeconomics', 'Macroeconomics', 'Econometrics', 'Development Economics',
+                          'Public Finance', 'International Trade')),
+    'Sociology': ('SOC', ('Social Theory', 'Criminology', 'Sociology of Education', 'Urban Sociology',
+                          'Research Methods', 'Social Stratification')),
+    'Psychology': ('PSY', ('Cognitive Psychology', 'Developmental Psychology', 'Social Psychology',
+                           'Abnormal Psychology', 'Neuropsychology', 'Psychometrics')),
+    'Political Science': ('POL', ('Comparative Politics', 'Political Theory', 'International Relations',
+                                  'Public Policy', 'Electoral Systems', 'Caribbean Politics')),
+    'Business Administration': ('BUS', ('Accounting', 'Marketing', 'Operations Management', 'Corporate Finance',
+                                        'Human Resource Management', 'Entrepreneurship')),
+    'Fine Arts': ('ART', ('Drawing', 'Art History', 'Sculpture', 'Photography', 'Printmaking', 'Digital Media')),
+    'Linguistics': ('LIN', ('Phonetics', 'Syntax', 'Semantics', 'Sociolinguistics', 'Morphology',
+                            'Language Acquisition')),
+}
+FIRST_NAMES = ('Ava', 'Liam', 'Maya', 'Noah', 'Zara', 'Ethan', 'Leah', 'Omar', 'Chloe', 'Ravi', 'Nia', 'Lucas',
+               'Aaliyah', 'Mateo', 'Priya', 'Jamal', 'Sofia', 'Kai', 'Imani', 'Diego', 'Hana', 'Andre', 'Keisha',
+               'Tariq', 'Elena', 'Jonah', 'Amara', 'Marcus', 'Yuki', 'Tristan')
+LAST_NAMES = ('Brown', 'Campbell', 'Williams', 'Clarke', 'Thompson', 'Grant', 'Reid', 'Francis', 'Bailey',
+              'Morgan', 'Henry', 'Gordon', 'Lewis', 'Walker', 'Chin', 'Singh', 'Patel', 'Garcia', 'Nguyen',
+              'Okafor', 'Mendez', 'Kowalski', 'Haddad', 'Ferreira', 'Tanaka', 'Murray', 'Stewart', 'Hall',
+              'Edwards', 'Bennett')
+
+# Output file -> columns; files are named after their table so `flask load-dataset` can pick them up
+TABLE_COLUMNS = {
+    'User': ('UserId', 'Username', 'Password', 'Role', 'Salt'),
+    'Lecturer': ('LecId', 'LecFirstName', 'LecLastName', 'Department', 'UserId'),
+    'Course': ('CourseId', 'CourseName', 'CourseCode'),
+    'CourseLecturer': ('CourseId', 'LecId'),
+    'Student': ('StudentID', 'FirstName', 'LastName', 'UserId'),
+    'Enrollment': ('StudentID', 'CourseId', 'Grade'),
+    'Assignment': ('AssignmentId', 'CourseId', 'Title', 'Description', 'DueDate'),
+    'Submission': ('SubmissionId', 'AssignmentId', 'StudentID', 'SubmissionContent', 'SubmissionDate'),
+    'Grade': ('GradeId', 'SubmissionId', 'Grade', 'Feedback', 'GradingDate'),
+}
+FEEDBACK = ('Excellent work.', 'Good effort, see comments.', 'Needs more detail.', 'Well structured.',
+            'Late analysis section is weak.', 'Please see me during office hours.')
+
+
+class _Writers(object):
+    """One streaming CSV writer per table, counting rows as they are written."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.files = {}
+        self.writers = {}
+        self.rows = dict.fromkeys(TABLE_COLUMNS, 0)
+        for table, columns in TABLE_COLUMNS.items():
+            f = self.files[table] = open(os.path.join(directory, f'{table}.csv'), 'w', newline='', encoding='utf-8')
+            self.writers[table] = csv.writer(f, lineterminator='\n')
+            self.writers[table].writerow(columns)
+
+    def write(self, table, *values):
+        self.writers[table].writerow(['NULL' if v is None else v for v in values])
+        self.rows[table] += 1
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def _clamp_grade(value):
+    return max(0, min(100, int(round(value))))
+
+
+def _user(out, rng, user_id, first, last, role, username=None, password=DEFAULT_PASSWORD):
+    salt = f'{rng.getrandbits(128):032x}'
+    username = username or f'{first.lower()}.{last.lower()}{user_id}'
+    out.write('User', user_id, username, generate_hashed_password(password, salt), role, salt)
+
+
+def generate_dataset(directory, students=1000000, courses=10000, seed=42, course_skew=1.0, student_skew=1.5,
+                     assignments_per_course=3, submit_rate=0.5, grade_rate=0.8, log=print):
+    """
+    Writes a reproducible dataset as one CSV per table into directory.
+
+    Rows are written as they are generated, so memory grows with the number
+    of courses but not with the number of students. The same seed and
+    parameters always produce the same files.
+
+    course_skew is the Zipf exponent of course popularity (0 = uniform);
+    student_skew is the Pareto shape of per-student activity (lower means a
+    few students submit far more than the rest). Returns rows per table.
+    """
+    if students < courses * MIN_STUDENTS_PER_COURSE:
+        raise ValueError(f"Need at least {courses * MIN_STUDENTS_PER_COURSE} students for {courses} courses")
+    rng = random.Random(seed)
+    out = _Writers(directory)
+    started = time.monotonic()
+    next_user_id = 0
+
+    try:
+        # Lecturers and their courses: each lecturer teaches 1-5 courses in their department
+        department_names = sorted(DEPARTMENTS)
+        codes_used = dict.fromkeys(department_names, 0)
+        course_codes = [None]  # indexed by course id
+        course_id = 0
+        lec_id = LECTURER_ID_START
+        while course_id < courses:
+            department = rng.choice(department_names)
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            _user(out, rng, next_user_id, first, last, 'lecturer')
+            out.write('Lecturer', lec_id, first, last, department, next_user_id)
+            next_user_id += 1
+
+            prefix, subjects = DEPARTMENTS[department]
+            for _ in range(min(rng.randint(1, MAX_LECTURER_COURSES), courses - course_id)):
+                course_id += 1
+                code = f'{prefix}{100 + codes_used[department]}'
+                codes_used[department] += 1
+                course_codes.append(code)
+                out.write('Course', course_id, f'{rng.choice(subjects)} {code}', code)
+                out.write('CourseLecturer', course_id, lec_id)
+            lec_id += 1
+
+        # Assignments: assignments_per_course per course, ids derived from the course id
+        due_dates = []
+        for cid in range(1, courses + 1):
+            for j in range(assignments_per_course):
+                due = TERM_START + datetime.timedelta(days=14 * (j + 1) + rng.randint(0, 6), hours=rng.randint(0, 8))
+                due_dates.append(due)
+                assignment_id = (cid - 1) * assignments_per_course + j + 1
+                out.write('Assignment', assignment_id, cid, f'Assignment {j + 1} - {course_codes[cid]}',
+                          f'Coursework {j + 1} for course {cid}.', due)
+
+        # Hot courses: Zipf weights over a shuffled ranking so popularity is not tied to the id
+        ranking = list(range(1, courses + 1))
+        rng.shuffle(ranking)
+        cum_weights = []
+        total = 0.0
+        for rank in range(1, courses + 1):
+            total += 1.0 / rank ** course_skew
+            cum_weights.append(total)
+
+        def popular_course():
+            return ranking[bisect.bisect_left(cum_weights, rng.random() * total)]
+
+        mean_activity = student_skew / (student_skew - 1) if student_skew > 1 else 1.0
+        submission_id = grade_id = 0
+        for i in range(students):
+            student_id = STUDENT_ID_START + i
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            _user(out, rng, next_user_id, first, last, 'student')
+            out.write('Student', student_id, first, last, next_user_id)
+            next_user_id += 1
+
+            # The first students are spread round-robin so every course gets its minimum
+            enrolled = []
+            if i < courses * MIN_STUDENTS_PER_COURSE:
+                enrolled.append(i % courses + 1)
+            # Never more courses than exist, or the loop below could not finish
+            target = min(rng.randint(3, MAX_STUDENT_COURSES), courses)
+            while len(enrolled) < target:
+                cid = popular_course()
+                if cid not in enrolled:
+                    enrolled.append(cid)
+
+            ability = rng.gauss(68, 12)
+            activity = min(1.0, submit_rate * rng.paretovariate(student_skew) / mean_activity)
+            for cid in enrolled:
+                out.write('Enrollment', student_id, cid, _clamp_grade(ability + rng.gauss(0, 8)))
+                for j in range(assignments_per_course):
+                    if rng.random() >= activity:
+                        continue
+                    assignment_id = (cid - 1) * assignments_per_course + j + 1
+                    due = due_dates[assignment_id - 1]
+                    submission_id += 1
+                    submitted = due - datetime.timedelta(minutes=rng.randint(0, 7 * 24 * 60))
+                    out.write('Submission', submission_id, assignment_id, student_id,
+                              f'Submission {submission_id} by {student_id}', submitted)
+                    if rng.random() < grade_rate:
+                        grade_id += 1
+                        out.write('Grade', grade_id, submission_id, _clamp_grade(ability + rng.gauss(0, 10)),
+                                  rng.choice(FEEDBACK), due + datetime.timedelta(days=rng.randint(1, 14)))
+
+            if (i + 1) % 100000 == 0:
+                log(f"{i + 1} students, {out.rows['Enrollment']} enrollments, "
+                    f"{out.rows['Submission']} submissions ({time.monotonic() - started:.1f}s)")
+
+        _user(out, rng, next_user_id, 'admin', 'admin', 'admin', username='admin', password='admin')
+        return out.rows
+    finally:
+        out.close()
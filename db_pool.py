@@ -0,0 +1,268 @@
+import threading
+import time
+import mysql.connector
+from .query_stats import InstrumentedCursor
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out before the pool timeout."""
+
+
+class PooledConnection(object):
+    """
+    Thin wrapper around a pooled MySQL connection.
+
+    Routes still call cnx.close() in their finally blocks; for a pooled
+    connection that is a no-op, the connection goes back to the pool when
+    the Flask request is torn down.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        # Released on request teardown (see release_request_connection)
+        pass
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw)
+
+    def discard(self):
+        """Closes the connection instead of returning it, e.g. with an unread result still on the socket."""
+        if not self._released:
+            self._released = True
+            self._pool.discard(self._raw)
+
+
+class ConnectionPool(object):
+    """
+    Fixed-size MySQL connection pool with bounded overflow.
+
+    Up to `size` connections are kept open and reused; up to `max_overflow`
+    extra connections may be opened under load and are closed again when
+    they are returned. Callers wait at most `timeout` seconds for a free
+    connection before PoolTimeoutError is raised.
+    """
+
+    def __init__(self, connect_args, size=10, max_overflow=5, timeout=5.0, ping_interval=30.0):
+        self.connect_args = connect_args
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._idle = []  # list of (connection, returned_at)
+        self._open = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+
+    def _new_connection(self):
+        cnx = mysql.connector.connect(**self.connect_args)
+        self._created += 1
+        return cnx
+
+    def _is_usable(self, cnx, returned_at):
+        """Ping a connection that has been idle longer than ping_interval."""
+        if self.ping_interval and time.monotonic() - returned_at < self.ping_interval:
+            return True
+        try:
+            cnx.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def _discard(self, cnx):
+        self._discarded += 1
+        try:
+            cnx.close()
+        except mysql.connector.Error:
+            pass
+
+    def acquire(self, timeout=None):
+        """
+        Checks out a validated connection, opening one if the pool allows it.
+        timeout, if given, replaces the pool's own wait limit for this call.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                while True:
+                    if self._idle:
+                        cnx, returned_at = self._idle.pop()
+                        # Counted as in use while it is pinged outside the lock
+                        self._in_use += 1
+                        break
+                    if self._open < self.size + self.max_overflow:
+                        self._open += 1
+                        cnx = None
+                        break
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._record_wait(started, waited)
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout}s waiting for a MySQL connection")
+                    waited = True
+                    self._cond.wait(remaining)
+            if cnx is None:
+                break
+
+            # The ping is a network round trip; other threads keep checking
+            # connections in and out meanwhile
+            if self._is_usable(cnx, returned_at):
+                with self._cond:
+                    self._checkouts += 1
+                    self._record_wait(started, waited)
+                return cnx
+            with self._cond:
+                self._in_use -= 1
+                self._open -= 1
+                self._cond.notify()
+            self._discard(cnx)
+
+        # Open the new connection outside the lock so a slow handshake
+        # does not block other threads returning connections.
+        try:
+            cnx = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._in_use += 1
+            self._checkouts += 1
+            self._record_wait(started, waited)
+        return cnx
+
+    def _record_wait(self, started, waited):
+        if waited:
+            self._waits += 1
+            self._wait_time += time.monotonic() - started
+
+    def release(self, cnx):
+        """Returns a connection to the pool, rolling back any open transaction."""
+        try:
+            if cnx.in_transaction:
+                cnx.rollback()
+            healthy = True
+        except mysql.connector.Error:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy and len(self._idle) < self.size:
+                self._idle.append((cnx, time.monotonic()))
+            else:
+                self._open -= 1
+                self._discard(cnx)
+            self._cond.notify()
+
+    def discard(self, cnx):
+        """
+        Closes a checked-out connection without reusing it. Closing the socket
+        makes the server abort whatever it is still sending, where a rollback
+        in release() would first read the rest of an unbuffered result.
+        """
+        with self._cond:
+            self._in_use -= 1
+            self._open -= 1
+            self._discard(cnx)
+            self._cond.notify()
+
+    def connection(self, timeout=None):
+        """Checks out a connection wrapped for request-scoped use."""
+        return PooledConnection(self, self.acquire(timeout))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_seconds': round(self._wait_time, 6),
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+            }
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                cnx, _ = self._idle.pop()
+                self._open -= 1
+                self._discard(cnx)
+
+
+def close_streaming_cursor(cnx, cursor):
+    """
+    Closes an unbuffered cursor at the end of a streamed response. If the
+    client went away before the result was read to the end, the rows still
+    on the socket would make cursor.close() fail, so the connection is
+    discarded instead of being drained and reused.
+    """
+    if cnx.unread_result:
+        cnx.discard()
+    else:
+        cursor.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config):
+    """Returns the process-wide pool for the given Flask config, creating it on first use."""
+    key = (config['MYSQL_HOST'], config['MYSQL_PORT'], config['MYSQL_USER'], config['MYSQL_DB'])
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(
+                    connect_args={
+                        'host': config['MYSQL_HOST'],
+                        'user': config['MYSQL_USER'],
+                        'password': config['MYSQL_PASSWORD'],
+                        'database': config['MYSQL_DB'],
+                        'port': config['MYSQL_PORT'],
+                    },
+                    size=config.get('MYSQL_POOL_SIZE', 10),
+                    max_overflow=config.get('MYSQL_POOL_MAX_OVERFLOW', 5),
+                    timeout=config.get('MYSQL_POOL_TIMEOUT', 5.0),
+                    ping_interval=config.get('MYSQL_POOL_PING_INTERVAL', 30.0),
+                )
+                _pools[key] = pool
+    return pool
+
+
+def all_pool_stats():
+    return [dict(pool.stats(), database=key[3]) for key, pool in list(_pools.items())]
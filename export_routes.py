@@ -0,0 +1,164 @@
+import csv
+import io
+from flask import Blueprint, Response, jsonify, request, stream_with_context, current_app as app
+from .utilities import connect_to_mysql, token_required
+from .serializer import RowSerializer, dumps
+from .db_pool import close_streaming_cursor
+
+export_bp = Blueprint('export', __name__)
+
+# Each export is one query walked in primary-key order, so the key of the
+# last row received is enough to resume it. The key columns come first in
+# every row and are what ?after= takes, comma separated.
+EXPORTS = {
+    'enrollments': {
+        'key': ('student_id', 'course_id'),
+        'query': """
+            SELECT E.StudentID AS student_id, E.CourseId AS course_id, C.CourseCode AS course_code,
+                   S.FirstName AS first_name, S.LastName AS last_name, E.Grade AS grade
+            FROM Enrollment E
+            JOIN Student S ON S.StudentID = E.StudentID
+            JOIN Course C ON C.CourseId = E.CourseId
+            WHERE E.StudentID > %s OR (E.StudentID = %s AND E.CourseId > %s)
+            ORDER BY E.StudentID, E.CourseId""",
+    },
+    'submissions': {
+        'key': ('submission_id',),
+        'query': """
+            SELECT S.SubmissionId AS submission_id, S.AssignmentId AS assignment_id, A.CourseId AS course_id,
+                   S.StudentID AS student_id, S.SubmissionDate AS submitted_at, S.SubmissionSize AS size,
+                   G.Grade AS grade, G.Feedback AS feedback, G.GradingDate AS graded_at
+            FROM Submission S
+            JOIN Assignment A ON A.AssignmentId = S.AssignmentId
+            LEFT JOIN Grade G ON G.SubmissionId = S.SubmissionId
+            WHERE S.SubmissionId > %s
+            ORDER BY S.SubmissionId""",
+    },
+    'rosters': {
+        'key': ('course_id', 'student_id'),
+        'query': """
+            SELECT E.CourseId AS course_id, E.StudentID AS student_id, C.CourseCode AS course_code,
+                   C.CourseName AS course_name, S.FirstName AS first_name, S.LastName AS last_name
+            FROM Enrollment E
+            JOIN Course C ON C.CourseId = E.CourseId
+            JOIN Student S ON S.StudentID = E.StudentID
+            WHERE E.CourseId > %s OR (E.CourseId = %s AND E.StudentID > %s)
+            ORDER BY E.CourseId, E.StudentID""",
+    },
+}
+
+
+def parse_after(value, key):
+    """Turns ?after=a,b into the query parameters that skip every row up to and including that key."""
+    if not value:
+        after = (0,) * len(key)
+    else:
+        try:
+            after = tuple(int(part) for part in value.split(','))
+        except ValueError:
+            after = ()
+        if len(after) != len(key):
+            raise ValueError(f"after must be {len(key)} comma separated integers: {','.join(key)}")
+    if len(after) == 1:
+        return after
+    return after[0], after[0], after[1]
+
+
+#list the available exports
+@export_bp.route('/export', methods=['GET'])
+@token_required
+def list_exports(user_data):
+    if user_data['role'] != 'admin':
+        return jsonify({'message': 'Access denied'}), 403
+    return jsonify({name: {'key': list(export['key']), 'formats': ['ndjson', 'csv']}
+                    for name, export in EXPORTS.items()}), 200
+
+
+#stream a whole export as NDJSON or CSV
+@export_bp.route('/export/<name>', methods=['GET'])
+@token_required
+def export_dataset(user_data, name):
+    """
+    Streams every row of an export from a single unbuffered query, one
+    batch at a time, so memory use does not grow with the export.
+
+    ?format=ndjson (default) or csv. An interrupted download is resumed by
+    passing the key columns of the last complete row as ?after=.
+    """
+    if user_data['role'] != 'admin':
+        return jsonify({'message': 'Access denied'}), 403
+
+    export = EXPORTS.get(name)
+    if export is None:
+        return jsonify({'message': f'Unknown export {name}; available: {", ".join(EXPORTS)}'}), 404
+
+    output = request.args.get('format', 'ndjson')
+    if output not in ('ndjson', 'csv'):
+        return jsonify({'message': 'format must be ndjson or csv'}), 400
+    try:
+        params = parse_after(request.args.get('after'), export['key'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    cnx = connect_to_mysql(app.config)
+    if cnx is None:
+        return jsonify({'message': 'Database connection failed'}), 500
+
+    if output == 'csv':
+        response = Response(stream_with_context(_stream_csv(cnx, export['query'], params)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename="{name}.csv"'
+    else:
+        response = Response(stream_with_context(_stream_ndjson(cnx, export['query'], params)),
+                            mimetype='application/x-ndjson')
+    response.headers['X-Export-Key'] = ','.join(export['key'])
+    return response, 200
+
+
+def _export_rows(cnx, query, params):
+    """
+    Runs an export on one unbuffered cursor. Yields the output column names
+    first, then each batch of rows as JSON-ready dicts.
+    """
+    batch_size = app.config['EXPORT_BATCH_SIZE']
+    cursor = cnx.cursor()  # unbuffered: rows stay on the server until fetched
+    try:
+        # A slow client stalls the server's writes; allow it longer than the 60s default.
+        # Only ever raised, so it is left set on the pooled connection.
+        cursor.execute("SET SESSION net_write_timeout = %s", (app.config['EXPORT_NET_WRITE_TIMEOUT'],))
+        cursor.execute(query, params)
+        serializer = RowSerializer(cursor.description)
+        yield serializer.keys
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield serializer.rows(rows)
+    finally:
+        close_streaming_cursor(cnx, cursor)
+
+
+def _stream_ndjson(cnx, query, params):
+    batches = _export_rows(cnx, query, params)
+    try:
+        next(batches)
+        for rows in batches:
+            yield ''.join(dumps(row) + '\n' for row in rows)
+    finally:
+        batches.close()  # runs _export_rows' cleanup now if the client disconnected
+
+
+def _stream_csv(cnx, query, params):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    batches = _export_rows(cnx, query, params)
+    try:
+        for batch in batches:
+            if isinstance(batch, tuple):
+                writer.writerow(batch)  # the header
+            else:
+                writer.writerows(row.values() for row in batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    finally:
+        batches.close()
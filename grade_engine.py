@@ -0,0 +1,56 @@
+import time
+
+# Per enrolled student and course, the average of their graded submissions.
+# Students without any graded submission do not appear, so their
+# Enrollment.Grade is left untouched.
+_AVERAGES_SQL = """
+    SELECT E.StudentID, E.CourseId, AVG(G.Grade) AS AvgGrade
+    FROM Enrollment E
+    JOIN Assignment A ON A.CourseId = E.CourseId
+    JOIN Submission S ON S.AssignmentId = A.AssignmentId AND S.StudentID = E.StudentID
+    JOIN Grade G ON G.SubmissionId = S.SubmissionId
+    {where}
+    GROUP BY E.StudentID, E.CourseId
+"""
+
+# An existing Enrollment grade is averaged with the new assignment average;
+# otherwise the assignment average is used as is.
+_APPLY_SQL = """
+    UPDATE Enrollment E
+    JOIN GradeAverages X ON X.StudentID = E.StudentID AND X.CourseId = E.CourseId
+    SET E.Grade = IF(E.Grade IS NULL, X.AvgGrade, (E.Grade + X.AvgGrade) / 2)
+"""
+
+
+def recalculate_grades(cnx, course_id=None):
+    """
+    Recalculates Enrollment grades from assignment grades in one set-based pass.
+
+    The averages are aggregated once, into a temporary table the UPDATE
+    joins. total_updated counts the Enrollment rows updated (matched, even
+    if the grade came out the same); with a course_id the IDs of those
+    students are returned too. The caller commits.
+    """
+    started = time.monotonic()
+    where, params = ("WHERE E.CourseId = %s", (course_id,)) if course_id is not None else ("", ())
+
+    cursor = cnx.cursor()
+    try:
+        # Temporary tables do not end the caller's transaction
+        cursor.execute("CREATE TEMPORARY TABLE GradeAverages (PRIMARY KEY (StudentID, CourseId)) " +
+                       _AVERAGES_SQL.format(where=where), params)
+        result = {}
+        if course_id is not None:
+            cursor.execute("SELECT StudentID FROM GradeAverages ORDER BY StudentID")
+            result['updated_students'] = [row[0] for row in cursor.fetchall()]
+            result['total_updated'] = len(result['updated_students'])
+        else:
+            cursor.execute("SELECT COUNT(*) FROM GradeAverages")
+            result['total_updated'] = cursor.fetchone()[0]
+
+        cursor.execute(_APPLY_SQL)
+        result['elapsed_seconds'] = round(time.monotonic() - started, 3)
+        return result
+    finally:
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS GradeAverages")
+        cursor.close()
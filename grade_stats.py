@@ -0,0 +1,270 @@
+import math
+from collections import Counter
+from .response_cache import ResponseCache
+from .statements import fetch_all
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PASS_MARK = 50
+HISTOGRAM_BIN_WIDTH = 10  # ten bins over 0-100; 100 falls in the last one
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Final grades (AssignmentId 0) and assignment grades of the scope in one
+# result. Ungraded enrollments come back as -1 so rows load straight into
+# a numeric array.
+_GRADES_SQL = """
+    SELECT E.CourseId, 0, COALESCE(E.Grade, -1)
+    FROM Enrollment E
+    {enrollment_where}
+    UNION ALL
+    SELECT A.CourseId, A.AssignmentId, G.Grade
+    FROM Assignment A
+    JOIN Submission S ON S.AssignmentId = A.AssignmentId
+    JOIN Grade G ON G.SubmissionId = S.SubmissionId
+    {assignment_where}
+"""
+
+grade_stats_cache = ResponseCache(max_entries=1024, ttl=3600)
+
+
+def configure_grade_stats_cache(config):
+    grade_stats_cache.max_entries = config.get('GRADE_STATS_CACHE_MAX_ENTRIES', grade_stats_cache.max_entries)
+    grade_stats_cache.ttl = config.get('GRADE_STATS_CACHE_TTL', grade_stats_cache.ttl)
+
+
+def load_grades(cnx, course_id=None):
+    """Returns the scope's (course, assignment, grade) rows; assignment 0 holds final grades."""
+    if course_id is None:
+        query, params = _GRADES_SQL.format(enrollment_where='', assignment_where=''), ()
+    else:
+        query = _GRADES_SQL.format(enrollment_where='WHERE E.CourseId = %s', assignment_where='WHERE A.CourseId = %s')
+        params = (course_id, course_id)
+    cursor = cnx.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _round(value):
+    return None if value is None or math.isnan(value) else round(float(value), 2)
+
+
+def _histogram_edges():
+    return [[low, low + HISTOGRAM_BIN_WIDTH] for low in range(0, 100, HISTOGRAM_BIN_WIDTH)]
+
+
+# numpy implementations ------------------------------------------------------
+
+def _describe_np(values):
+    count = int(values.size)
+    bins = 100 // HISTOGRAM_BIN_WIDTH
+    if not count:
+        return _empty_description(bins)
+    percentiles = np.percentile(values, PERCENTILES)
+    histogram = np.bincount(np.minimum(values.astype(np.int64) // HISTOGRAM_BIN_WIDTH, bins - 1), minlength=bins)
+    return {
+        'count': count,
+        'mean': _round(values.mean()),
+        'median': _round(percentiles[PERCENTILES.index(50)]),
+        'std': _round(values.std()),
+        'min': _round(values.min()),
+        'max': _round(values.max()),
+        'fail_rate': _round(np.count_nonzero(values < PASS_MARK) / count),
+        'percentiles': {f'p{p}': _round(v) for p, v in zip(PERCENTILES, percentiles)},
+        'histogram': [int(n) for n in histogram],
+    }
+
+
+def _describe_groups_np(groups, values):
+    """Per-group statistics for parallel group/value arrays, without a Python loop over rows."""
+    if not values.size:
+        return []
+    ids, inverse, counts = np.unique(groups, return_inverse=True, return_counts=True)
+    sums = np.bincount(inverse, weights=values)
+    means = sums / counts
+    variances = np.maximum(np.bincount(inverse, weights=values * values) / counts - means * means, 0)
+    fails = np.bincount(inverse, weights=(values < PASS_MARK).astype(np.float64))
+
+    # Sort by group, then value, and interpolate each group's percentiles
+    # from its slice the way np.percentile does
+    ordered = values[np.lexsort((values, inverse))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    quartiles = {}
+    for name, q in (('p25', 0.25), ('median', 0.5), ('p75', 0.75)):
+        position = starts + q * (counts - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        quartiles[name] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+    return [{
+        'id': int(ids[i]),
+        'count': int(counts[i]),
+        'mean': _round(means[i]),
+        'median': _round(quartiles['median'][i]),
+        'std': _round(math.sqrt(variances[i])),
+        'p25': _round(quartiles['p25'][i]),
+        'p75': _round(quartiles['p75'][i]),
+        'fail_rate': _round(fails[i] / counts[i]),
+    } for i in range(ids.size)]
+
+
+# Pure Python fallback when numpy is not installed -----------------------------
+
+def _percentile(ordered, q):
+    """Linear interpolation between closest ranks, as np.percentile's default."""
+    position = q * (len(ordered) - 1)
+    low, high = math.floor(position), math.ceil(position)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _moments(values):
+    count = len(values)
+    mean = sum(values) / count
+    return mean, math.sqrt(max(sum(v * v for v in values) / count - mean * mean, 0))
+
+
+def _describe_py(values):
+    count = len(values)
+    bins = 100 // HISTOGRAM_BIN_WIDTH
+    if not count:
+        return _empty_description(bins)
+    ordered = sorted(values)
+    mean, std = _moments(values)
+    histogram = [0] * bins
+    for value in values:
+        histogram[min(int(value) // HISTOGRAM_BIN_WIDTH, bins - 1)] += 1
+    return {
+        'count': count,
+        'mean': _round(mean),
+        'median': _round(_percentile(ordered, 0.5)),
+        'std': _round(std),
+        'min': _round(ordered[0]),
+        'max': _round(ordered[-1]),
+        'fail_rate': _round(sum(1 for v in values if v < PASS_MARK) / count),
+        'percentiles': {f'p{p}': _round(_percentile(ordered, p / 100)) for p in PERCENTILES},
+        'histogram': histogram,
+    }
+
+
+def _describe_groups_py(groups, values):
+    grouped = {}
+    for group, value in zip(groups, values):
+        grouped.setdefault(group, []).append(value)
+    result = []
+    for group in sorted(grouped):
+        members = grouped[group]
+        ordered = sorted(members)
+        mean, std = _moments(members)
+        result.append({
+            'id': int(group),
+            'count': len(members),
+            'mean': _round(mean),
+            'median': _round(_percentile(ordered, 0.5)),
+            'std': _round(std),
+            'p25': _round(_percentile(ordered, 0.25)),
+            'p75': _round(_percentile(ordered, 0.75)),
+            'fail_rate': _round(sum(1 for v in members if v < PASS_MARK) / len(members)),
+        })
+    return result
+
+
+def _empty_description(bins):
+    return {'count': 0, 'mean': None, 'median': None, 'std': None, 'min': None, 'max': None,
+            'fail_rate': None, 'percentiles': {f'p{p}': None for p in PERCENTILES}, 'histogram': [0] * bins}
+
+
+# ---------------------------------------------------------------------------
+
+def _columns(rows):
+    """Splits (course, assignment, grade) rows into columns: arrays with numpy, lists without."""
+    if np is not None:
+        data = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        return data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2]
+    if not rows:
+        return [], [], []
+    courses, assignments, grades = zip(*rows)
+    return list(courses), list(assignments), [float(g) for g in grades]
+
+
+def _where(predicate, *columns):
+    """The rows of columns for which predicate holds; with numpy it is evaluated once on whole arrays."""
+    if np is not None:
+        mask = predicate(*columns)
+        return tuple(column[mask] for column in columns)
+    keep = [predicate(*values) for values in zip(*columns)]
+    return tuple([value for value, kept in zip(column, keep) if kept] for column in columns)
+
+
+def _counts(groups):
+    if np is not None:
+        ids, counts = np.unique(groups, return_counts=True)
+        return dict(zip(ids.tolist(), counts.tolist()))
+    return dict(Counter(groups))
+
+
+def describe(values):
+    return _describe_np(values) if np is not None else _describe_py(values)
+
+
+def describe_groups(groups, values):
+    return _describe_groups_np(groups, values) if np is not None else _describe_groups_py(groups, values)
+
+
+def course_grade_stats(cnx, course_id):
+    """
+    Distribution of final grades and of assignment grades in one course,
+    plus per-assignment statistics with a 0-1 difficulty (1 - mean / 100),
+    hardest first.
+    """
+    _, assignments, grades = _columns(load_grades(cnx, course_id))
+    _, enrolled = _where(lambda a, g: a == 0, assignments, grades)
+    _, final = _where(lambda a, g: (a == 0) & (g >= 0), assignments, grades)
+    assignment_ids, assignment_grades = _where(lambda a, g: a != 0, assignments, grades)
+
+    per_assignment = {row['id']: row for row in describe_groups(assignment_ids, assignment_grades)}
+    titles = fetch_all(cnx, 'course_assignments', (course_id,))
+    by_assignment = []
+    for assignment_id, title, _, due_date in titles:
+        row = per_assignment.get(assignment_id, {'count': 0, 'mean': None, 'median': None, 'std': None,
+                                                 'p25': None, 'p75': None, 'fail_rate': None})
+        row.pop('id', None)
+        by_assignment.append(dict(row, assignment_id=assignment_id, title=title,
+                                  due_date=due_date.strftime('%Y-%m-%d %H:%M:%S') if due_date else None,
+                                  difficulty=_round(1 - row['mean'] / 100) if row['mean'] is not None else None))
+    by_assignment.sort(key=lambda row: (row['difficulty'] is None, -(row['difficulty'] or 0), row['assignment_id']))
+
+    return {
+        'course_id': course_id,
+        'enrolled': len(enrolled),
+        'final_grades': describe(final),
+        'assignment_grades': describe(assignment_grades),
+        'histogram_bins': _histogram_edges(),
+        'assignments': by_assignment,
+        'engine': 'numpy' if np is not None else 'python',
+    }
+
+
+def all_course_grade_stats(cnx):
+    """Per-course summaries of final and assignment grades for every course with enrollments or grades."""
+    courses, assignments, grades = _columns(load_grades(cnx))
+    enrolled_courses, _, enrolled_grades = _where(lambda c, a, g: a == 0, courses, assignments, grades)
+    enrolled = _counts(enrolled_courses)
+    finals = {row.pop('id'): row for row in
+              describe_groups(*_where(lambda c, g: g >= 0, enrolled_courses, enrolled_grades))}
+    assignment_stats = {row.pop('id'): row for row in
+                        describe_groups(*_where(lambda c, a, g: a != 0, courses, assignments, grades)[::2])}
+
+    return {
+        'courses': [{
+            'course_id': course_id,
+            'enrolled': enrolled.get(course_id, 0),
+            'final_grades': finals.get(course_id),
+            'assignment_grades': assignment_stats.get(course_id),
+        } for course_id in sorted(set(enrolled) | set(finals) | set(assignment_stats))],
+        'engine': 'numpy' if np is not None else 'python',
+    }
@@ -0,0 +1,133 @@
+import threading
+import mysql.connector
+from .db_pool import get_pool
+
+# Sequence name -> (table, id column, first id when the table is empty)
+SEQUENCES = {
+    'User': ('User', 'UserId', 1),
+    'Student': ('Student', 'StudentID', 62001),
+    'Lecturer': ('Lecturer', 'LecId', 1),
+    'Course': ('Course', 'CourseId', 1),
+    'CourseContent': ('CourseContent', 'ContentId', 1),
+    'Assignment': ('Assignment', 'AssignmentId', 1),
+    'Submission': ('Submission', 'SubmissionId', 1),
+    'Grade': ('Grade', 'GradeId', 1),
+    'CalendarEvent': ('CalendarEvent', 'EventId', 1),
+}
+
+_CREATE_SEQUENCE_TABLE = """
+    CREATE TABLE IF NOT EXISTS IdSequence (
+        Name VARCHAR(64) PRIMARY KEY,
+        NextId BIGINT NOT NULL
+    )
+"""
+
+
+class IdAllocator(object):
+    """
+    Hands out primary keys from blocks reserved in the IdSequence table.
+
+    Each process reserves `block_size` IDs at a time with a single atomic
+    UPDATE, so concurrent workers (threads or processes) never receive the
+    same ID, and most inserts need no ID query at all. IDs left unused in a
+    block when a process exits are skipped, so sequences may have gaps.
+
+    Reservations run on a connection of the allocator's own, never one from
+    the request pool: a request already holds a pooled connection, and
+    waiting for a second one can deadlock the pool under load.
+    """
+
+    def __init__(self, connect_args, block_size=100):
+        self.connect_args = connect_args
+        self.block_size = block_size
+        self._cnx = None
+        self._cnx_lock = threading.Lock()  # one reservation at a time on the shared connection
+        self._blocks = {}  # name -> [next_id, end_exclusive]
+        self._seeded = set()
+        self._locks = {}  # name -> lock; a slow reservation only blocks its own sequence
+        self._locks_lock = threading.Lock()
+
+    def _lock_for(self, name):
+        lock = self._locks.get(name)
+        if lock is None:
+            with self._locks_lock:
+                lock = self._locks.setdefault(name, threading.Lock())
+        return lock
+
+    def next_id(self, name, table=None, column=None, start=1):
+        with self._lock_for(name):
+            block = self._blocks.get(name)
+            if block is None or block[0] >= block[1]:
+                block = self._blocks[name] = self._reserve(name, table, column, start)
+            next_id = block[0]
+            block[0] += 1
+            return next_id
+
+    def _connection(self):
+        if self._cnx is None or not self._cnx.is_connected():
+            self._cnx = mysql.connector.connect(**self.connect_args)
+        return self._cnx
+
+    def _reserve(self, name, table, column, start):
+        """Reserves the next block on the allocator's connection, outside the caller's transaction."""
+        if name in SEQUENCES:
+            table, column, start = SEQUENCES[name]
+        with self._cnx_lock:
+            return self._reserve_on(self._connection(), name, table, column, start)
+
+    def _reserve_on(self, cnx, name, table, column, start):
+        try:
+            cursor = cnx.cursor()
+            for attempt in range(2):
+                if name not in self._seeded:
+                    self._seed(cursor, name, table, column, start)
+                cursor.execute(
+                    "UPDATE IdSequence SET NextId = LAST_INSERT_ID(NextId + %s) WHERE Name = %s",
+                    (self.block_size, name))
+                if cursor.rowcount == 1:
+                    break
+                # The row was deleted after this process seeded it; LAST_INSERT_ID()
+                # would now return a stale value from another statement
+                cnx.rollback()
+                self._seeded.discard(name)
+            else:
+                raise RuntimeError(f"IdSequence row for {name} could not be created")
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            end = cursor.fetchone()[0]
+            cnx.commit()
+            cursor.close()
+            return [end - self.block_size, end]
+        except mysql.connector.Error:
+            # Start over on a fresh connection next time
+            self._cnx = None
+            try:
+                cnx.close()
+            except mysql.connector.Error:
+                pass
+            raise
+
+    def _seed(self, cursor, name, table, column, start):
+        """Creates the sequence row from the table's current MAX(id) if it does not exist yet."""
+        cursor.execute(_CREATE_SEQUENCE_TABLE)
+        cursor.execute(
+            f"INSERT IGNORE INTO IdSequence (Name, NextId) "
+            f"SELECT %s, GREATEST(COALESCE(MAX({column}) + 1, %s), %s) FROM `{table}`",
+            (name, start, start))
+        self._seeded.add(name)
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_allocator(config):
+    """Returns the process-wide allocator for the given Flask config."""
+    pool = get_pool(config)
+    allocator = _allocators.get(id(pool))
+    if allocator is None:
+        with _allocators_lock:
+            allocator = _allocators.get(id(pool))
+            if allocator is None:
+                allocator = IdAllocator(pool.connect_args, config.get('ID_BLOCK_SIZE', 100))
+                _allocators[id(pool)] = allocator
+    return allocator
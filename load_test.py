@@ -0,0 +1,328 @@
+import csv
+import datetime
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from .dataset_generator import DEFAULT_PASSWORD
+
+
+def _sample_rows(path, key, count, rng):
+    """Reservoir-samples count rows of a CSV, returning {key value: row}."""
+    sample = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            if len(sample) < count:
+                sample.append(row)
+            else:
+                j = rng.randint(0, i)
+                if j < count:
+                    sample[j] = row
+    return {row[key]: row for row in sample}
+
+
+def sample_accounts(dataset_dir, students, lecturers, seed=0):
+    """
+    Picks generated students and lecturers to log in as.
+
+    Returns a list of (role, username, password, entity_id) including the
+    admin account. Files are streamed, so this works on million-row datasets.
+    """
+    rng = random.Random(seed)
+    wanted = {}
+    for table, id_column, role, count in (('Student', 'StudentID', 'student', students),
+                                          ('Lecturer', 'LecId', 'lecturer', lecturers)):
+        for row in _sample_rows(os.path.join(dataset_dir, f'{table}.csv'), 'UserId', count, rng).values():
+            wanted[row['UserId']] = (role, int(row[id_column]))
+
+    accounts = [('admin', 'admin', 'admin', None)]
+    with open(os.path.join(dataset_dir, 'User.csv'), newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row['UserId'] in wanted:
+                role, entity_id = wanted[row['UserId']]
+                accounts.append((role, row['Username'], DEFAULT_PASSWORD, entity_id))
+    return accounts
+
+
+class VirtualUser(object):
+    """A logged-in account and the course/assignment ids it works with."""
+
+    def __init__(self, role, username, entity_id, token):
+        self.role = role
+        self.username = username
+        self.entity_id = entity_id
+        self.token = token
+        self.course_ids = []
+        self.assignment_ids = []
+
+
+class _Client(object):
+    """Keep-alive HTTP client; one per worker thread."""
+
+    def __init__(self, base_url, timeout):
+        parts = urllib.parse.urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.prefix = parts.path.rstrip('/')
+        self.conn = connection_class(parts.netloc, timeout=timeout)
+
+    def request(self, method, path, token=None, body=None):
+        headers = {}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if body is not None:
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except Exception:
+            # Drop the socket; http.client reconnects on the next request
+            self.conn.close()
+            raise
+
+
+def _json(payload):
+    try:
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+def _student_courses(user, rng):
+    return ('GET', f'/student/{user.entity_id}/courses', None) if user.entity_id else None
+
+
+def _course_content(user, rng):
+    return ('GET', f'/course/{rng.choice(user.course_ids)}/content', None) if user.course_ids else None
+
+
+def _course_assignments(user, rng):
+    return ('GET', f'/course/{rng.choice(user.course_ids)}/assignments', None) if user.course_ids else None
+
+
+def _course_members(user, rng):
+    return ('GET', f'/course/{rng.choice(user.course_ids)}/members?limit=100', None) if user.course_ids else None
+
+
+def _submit(user, rng):
+    # Each (student, assignment) can only be submitted once; spent ones are dropped
+    try:
+        assignment_id = user.assignment_ids.pop(rng.randrange(len(user.assignment_ids)))
+    except (IndexError, ValueError):  # none left, or another worker took the last one
+        return None
+    return ('POST', f'/assignment/{assignment_id}/submit',
+            {'student_id': user.entity_id, 'submission': f'load test submission by {user.username}'})
+
+
+def _student_grades(user, rng):
+    return ('GET', f'/student/{user.entity_id}/grades', None) if user.entity_id else None
+
+
+# (name, weight, role, request builder); builders return (method, path, body) or None when
+# the virtual user has nothing to do for that route
+ROUTE_MIX = (
+    ('courses', 15, 'student', lambda user, rng: ('GET', '/courses', None)),
+    ('student_courses', 10, 'student', _student_courses),
+    ('course_content', 15, 'student', _course_content),
+    ('course_assignments', 10, 'student', _course_assignments),
+    ('submit', 8, 'student', _submit),
+    ('student_grades', 8, 'student', _student_grades),
+    ('lecturer_courses', 5, 'lecturer', lambda user, rng: ('GET', f'/lecturer/{user.entity_id}/courses', None)),
+    ('course_members', 8, 'lecturer', _course_members),
+    ('grade', 6, 'lecturer', None),  # grades submissions made during this run
+    ('top_enrolled', 5, 'admin', lambda user, rng: ('GET', '/courses/top-enrolled', None)),
+    ('top_performers', 5, 'admin', lambda user, rng: ('GET', '/students/top-performers', None)),
+    ('high_enrollment', 5, 'admin', lambda user, rng: ('GET', '/courses/high-enrollment', None)),
+)
+
+IDLE_BACKOFF_START = 0.01  # seconds a worker sleeps when it has nothing to send, doubling
+IDLE_BACKOFF_MAX = 0.5
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadTest(object):
+    """
+    Drives a weighted mix of routes at a fixed concurrency and records
+    per-endpoint latency and status codes.
+
+    Errors are transport failures and 5xx responses; 4xx responses (for
+    example a duplicate submission) are counted separately.
+    """
+
+    def __init__(self, base_url, accounts, concurrency=16, duration=60.0, timeout=30.0, seed=0, log=print):
+        self.base_url = base_url
+        self.accounts = accounts
+        self.concurrency = concurrency
+        self.duration = duration
+        self.timeout = timeout
+        self.seed = seed
+        self.log = log
+        self.users = {'student': [], 'lecturer': [], 'admin': []}
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._statuses = {}
+        self._submissions = []  # ids created by this run, waiting to be graded
+
+    def _record(self, name, elapsed, status):
+        with self._lock:
+            self._latencies.setdefault(name, []).append(elapsed)
+            statuses = self._statuses.setdefault(name, {})
+            statuses[status] = statuses.get(status, 0) + 1
+
+    def _login(self, account):
+        role, username, password, entity_id = account
+        client = _Client(self.base_url, self.timeout)
+        status, payload = client.request('POST', '/login', body={'username': username, 'password': password})
+        if status != 200:
+            self.log(f"Login failed for {username}: HTTP {status}")
+            return None
+        user = VirtualUser(role, username, entity_id, _json(payload)['token'])
+
+        # Find the courses and assignments this user can act on
+        if role in ('student', 'lecturer'):
+            status, payload = client.request('GET', f'/{role}/{entity_id}/courses', user.token)
+            if status == 200:
+                user.course_ids = [course['CourseID'] for course in _json(payload)]
+        if role == 'student':
+            for course_id in user.course_ids:
+                status, payload = client.request('GET', f'/course/{course_id}/assignments', user.token)
+                if status == 200:
+                    user.assignment_ids.extend(a['assignment_id'] for a in _json(payload))
+        return user
+
+    def prepare(self):
+        """Logs every account in (in parallel; logins are deliberately slow)."""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for user in executor.map(self._login, self.accounts):
+                if user:
+                    self.users[user.role].append(user)
+        self.log(", ".join(f"{len(users)} {role}s" for role, users in self.users.items()) + " logged in")
+
+    def _next_request(self, rng, routes, weights):
+        for _ in range(10):
+            name, _, role, build = rng.choices(routes, weights)[0]
+            user = rng.choice(self.users[role])
+            if name == 'grade':
+                with self._lock:
+                    if not self._submissions:
+                        continue
+                    submission_id = self._submissions.pop()
+                return name, user, ('POST', f'/submission/{submission_id}/grade', {'grade': rng.randint(40, 100)})
+            request = build(user, rng)
+            if request:
+                return name, user, request
+        return None
+
+    def _worker(self, worker_id, deadline):
+        rng = random.Random(self.seed * 1000 + worker_id)
+        routes = [route for route in ROUTE_MIX if self.users[route[2]]]
+        weights = [route[1] for route in routes]
+        client = _Client(self.base_url, self.timeout)
+        if not routes:
+            return
+        backoff = IDLE_BACKOFF_START
+        while time.monotonic() < deadline:
+            picked = self._next_request(rng, routes, weights)
+            if picked is None:
+                # Nothing to send yet (e.g. only grading left and no submissions);
+                # back off rather than spin and steal CPU from the other workers
+                time.sleep(min(backoff, max(0.0, deadline - time.monotonic())))
+                backoff = min(backoff * 2, IDLE_BACKOFF_MAX)
+                continue
+            backoff = IDLE_BACKOFF_START
+            name, user, (method, path, body) = picked
+            started = time.perf_counter()
+            try:
+                status, payload = client.request(method, path, user.token, body)
+            except Exception:
+                status, payload = 'error', None
+            self._record(name, time.perf_counter() - started, status)
+            if name == 'submit' and status == 201:
+                with self._lock:
+                    self._submissions.append(_json(payload)['submission_id'])
+
+    def run(self):
+        """Runs the mix for self.duration seconds and returns the results dict."""
+        started = time.monotonic()
+        deadline = started + self.duration
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for future in [executor.submit(self._worker, i, deadline) for i in range(self.concurrency)]:
+                future.result()
+        return self.results(time.monotonic() - started)
+
+    def results(self, elapsed):
+        endpoints = {}
+        total_requests = total_errors = 0
+        for name, latencies in sorted(self._latencies.items()):
+            latencies.sort()
+            statuses = self._statuses[name]
+            errors = sum(count for status, count in statuses.items() if status == 'error' or status >= 500)
+            client_errors = sum(count for status, count in statuses.items()
+                                if status != 'error' and 400 <= status < 500)
+            endpoints[name] = {
+                'requests': len(latencies),
+                'req_per_sec': round(len(latencies) / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+                'error_rate': round(errors / len(latencies), 4),
+                'client_error_rate': round(client_errors / len(latencies), 4),
+                'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+            }
+            total_requests += len(latencies)
+            total_errors += errors
+        return {
+            'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'base_url': self.base_url,
+            'concurrency': self.concurrency,
+            'duration_seconds': round(elapsed, 2),
+            'seed': self.seed,
+            'users': {role: len(users) for role, users in self.users.items()},
+            'total': {
+                'requests': total_requests,
+                'req_per_sec': round(total_requests / elapsed, 2) if elapsed else 0,
+                'error_rate': round(total_errors / total_requests, 4) if total_requests else 0,
+            },
+            'endpoints': endpoints,
+        }
+
+
+def format_results(results):
+    lines = [f"{'endpoint':<20}{'reqs':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err %':>8}{'4xx %':>8}"]
+    for name, e in results['endpoints'].items():
+        lines.append(f"{name:<20}{e['requests']:>8}{e['req_per_sec']:>9}{e['p50_ms']:>9}{e['p95_ms']:>9}"
+                     f"{e['p99_ms']:>9}{e['error_rate'] * 100:>8.2f}{e['client_error_rate'] * 100:>8.2f}")
+    total = results['total']
+    lines.append(f"{'TOTAL':<20}{total['requests']:>8}{total['req_per_sec']:>9}{'':>27}{total['error_rate'] * 100:>8.2f}")
+    return "\n".join(lines)
+
+
+def compare_results(baseline, current, threshold=0.10):
+    """
+    Lists endpoints whose p95 latency or throughput got worse by more than
+    threshold (a fraction) between two saved runs.
+    """
+    regressions = []
+    for name, now in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if not before:
+            continue
+        if before['p95_ms'] and now['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if before['req_per_sec'] and now['req_per_sec'] < before['req_per_sec'] * (1 - threshold):
+            regressions.append(f"{name}: {before['req_per_sec']} -> {now['req_per_sec']} req/s")
+        if now['error_rate'] > before['error_rate'] + 0.01:
+            regressions.append(f"{name}: error rate {before['error_rate']} -> {now['error_rate']}")
+    return regressions
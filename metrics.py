@@ -0,0 +1,176 @@
+import threading
+import time
+from flask import g, request, Response
+from .db_pool import all_pool_stats
+from .query_stats import RequestStats, current_stats
+from .serializer import FastJSONProvider
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+POOL_GAUGES = (
+    ('open', 'Connections currently open'),
+    ('in_use', 'Connections checked out'),
+    ('idle', 'Connections idle in the pool'),
+    ('size', 'Configured pool size'),
+    ('max_overflow', 'Configured overflow connections'),
+)
+POOL_COUNTERS = (
+    ('checkouts', 'Connections checked out since start'),
+    ('waits', 'Checkouts that had to wait for a connection'),
+    ('wait_time_seconds', 'Time spent waiting for a connection'),
+    ('timeouts', 'Checkouts that timed out'),
+    ('created', 'Connections opened'),
+    ('discarded', 'Connections closed after failing a ping or overflowing'),
+)
+
+
+class _Histogram(object):
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, buckets, value):
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry(object):
+    """
+    Per-route request metrics, aggregated in process.
+
+    Each finished request takes the lock once to fold its RequestStats in,
+    so the cost per request is a handful of additions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}  # (route, method, status) -> count
+        self._latency = {}  # route -> _Histogram
+        self._query_counts = {}  # route -> _Histogram
+        self._totals = {}  # route -> [queries, db_seconds, rows, serialize_seconds]
+
+    def observe(self, route, method, status, elapsed, stats):
+        with self._lock:
+            key = (route, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            latency = self._latency.get(route)
+            if latency is None:
+                latency = self._latency[route] = _Histogram(LATENCY_BUCKETS)
+                self._query_counts[route] = _Histogram(QUERY_COUNT_BUCKETS)
+                self._totals[route] = [0, 0.0, 0, 0.0]
+            latency.observe(LATENCY_BUCKETS, elapsed)
+            self._query_counts[route].observe(QUERY_COUNT_BUCKETS, stats.queries)
+            totals = self._totals[route]
+            totals[0] += stats.queries
+            totals[1] += stats.db_seconds
+            totals[2] += stats.rows
+            totals[3] += stats.serialize_seconds
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            requests = dict(self._requests)
+            histograms = [(name, help_text, buckets, {r: (list(h.counts), h.total, h.count) for r, h in source.items()})
+                          for name, help_text, buckets, source in (
+                              ('lms_request_duration_seconds', 'Request latency', LATENCY_BUCKETS, self._latency),
+                              ('lms_request_queries', 'SQL statements per request', QUERY_COUNT_BUCKETS,
+                               self._query_counts))]
+            totals = {route: list(values) for route, values in self._totals.items()}
+
+        lines = ['# HELP lms_requests_total Requests handled', '# TYPE lms_requests_total counter']
+        for (route, method, status), count in sorted(requests.items()):
+            lines.append(f'lms_requests_total{{route="{_escape(route)}",method="{method}",status="{status}"}} {count}')
+
+        for name, help_text, buckets, data in histograms:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for route, (counts, total, count) in sorted(data.items()):
+                label = f'route="{_escape(route)}"'
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{{label}}} {total}')
+                lines.append(f'{name}_count{{{label}}} {count}')
+
+        for index, (name, help_text) in enumerate((
+                ('lms_db_queries_total', 'SQL statements executed'),
+                ('lms_db_seconds_total', 'Time spent in MySQL (execute and fetch)'),
+                ('lms_db_rows_total', 'Rows returned by MySQL'),
+                ('lms_json_serialize_seconds_total', 'Time spent serializing JSON responses'))):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for route, values in sorted(totals.items()):
+                lines.append(f'{name}{{route="{_escape(route)}"}} {values[index]}')
+
+        pools = all_pool_stats()
+        for kind, fields in (('gauge', POOL_GAUGES), ('counter', POOL_COUNTERS)):
+            for key, help_text in fields:
+                name = f'lms_pool_{key}' + ('_total' if kind == 'counter' else '')
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for pool in pools:
+                    lines.append(f'{name}{{database="{_escape(pool["database"])}"}} {pool[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry()
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """The app's JSON provider, timing each dumps() into the current request's stats."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            stats = current_stats()
+            if stats is not None:
+                stats.serialize_seconds += time.perf_counter() - started
+
+
+def _start_request():
+    g.request_stats = RequestStats()
+
+
+def _capture_status(response):
+    stats = g.get('request_stats')
+    if stats is not None:
+        stats.status = response.status_code
+    return response
+
+
+def _finish_request(exception=None):
+    # teardown_request runs after a streamed body has been fully sent
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    status = stats.status if stats.status is not None else 500
+    metrics.observe(route, request.method, status, time.perf_counter() - stats.started, stats)
+
+
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app):
+    """Installs the request hooks, the timing JSON provider and the /metrics route."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.json = TimedJSONProvider(app)
+    app.before_request(_start_request)
+    app.after_request(_capture_status)
+    app.teardown_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
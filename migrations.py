@@ -0,0 +1,318 @@
+from .report_tables import rebuild_reports
+
+_CREATE_MIGRATION_TABLE = """
+    CREATE TABLE IF NOT EXISTS SchemaMigration (
+        Version INT PRIMARY KEY,
+        Description VARCHAR(255) NOT NULL,
+        AppliedAt DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def create_table(table, ddl):
+    return ('table', table, None, ddl)
+
+
+def add_column(table, column, ddl):
+    return ('column', table, column, ddl)
+
+
+def add_index(table, index, ddl):
+    return ('index', table, index, ddl)
+
+
+def run_sql(ddl):
+    """A step that always runs; it must be idempotent on its own."""
+    return ('sql', None, None, ddl)
+
+
+def run_python(function):
+    """A step that always runs function(cnx); it must be idempotent and commit its own work."""
+    return ('python', None, None, function)
+
+
+# Each migration is a list of steps; a step only runs if the object it
+# creates is missing, so a database built from the current create_tables.sql
+# (or one where a migration half-failed) can be migrated safely.
+MIGRATIONS = [
+    (1, 'IdSequence table for the block ID allocator', [
+        create_table('IdSequence', """
+            CREATE TABLE IdSequence (
+                Name VARCHAR(64) PRIMARY KEY,
+                NextId BIGINT NOT NULL
+            )"""),
+    ]),
+    (2, 'Materialized report tables', [
+        create_table('CourseEnrollmentStats', """
+            CREATE TABLE CourseEnrollmentStats (
+                CourseId INT PRIMARY KEY,
+                CourseName VARCHAR(255) NOT NULL,
+                NumberOfStudents INT NOT NULL DEFAULT 0,
+                INDEX idx_course_stats_students (NumberOfStudents),
+                FOREIGN KEY (CourseId) REFERENCES Course(CourseId)
+            )"""),
+        create_table('StudentCourseStats', """
+            CREATE TABLE StudentCourseStats (
+                StudentID INT PRIMARY KEY,
+                FirstName VARCHAR(255) NOT NULL,
+                LastName VARCHAR(255) NOT NULL,
+                NumberOfCourses INT NOT NULL DEFAULT 0,
+                GradeSum INT NOT NULL DEFAULT 0,
+                GradedCourses INT NOT NULL DEFAULT 0,
+                OverallAverage DECIMAL(14,4) AS (GradeSum / NULLIF(GradedCourses, 0)) STORED,
+                INDEX idx_student_stats_courses (NumberOfCourses),
+                INDEX idx_student_stats_average (OverallAverage),
+                FOREIGN KEY (StudentID) REFERENCES Student(StudentID)
+            )"""),
+        create_table('LecturerCourseStats', """
+            CREATE TABLE LecturerCourseStats (
+                LecId INT PRIMARY KEY,
+                LecFirstName VARCHAR(255) NOT NULL,
+                LecLastName VARCHAR(255) NOT NULL,
+                NumberOfCourses INT NOT NULL DEFAULT 0,
+                INDEX idx_lecturer_stats_courses (NumberOfCourses),
+                FOREIGN KEY (LecId) REFERENCES Lecturer(LecId)
+            )"""),
+        create_table('ReportState', """
+            CREATE TABLE ReportState (
+                ReportName VARCHAR(64) PRIMARY KEY,
+                RebuiltAt DATETIME NOT NULL
+            )"""),
+        # The record_* helpers only adjust counts, so the tables must start out complete
+        run_python(rebuild_reports),
+    ]),
+    (3, 'Blob store hashes and reference counts', [
+        create_table('BlobRef', """
+            CREATE TABLE BlobRef (
+                Hash CHAR(64) PRIMARY KEY,
+                Size BIGINT NOT NULL,
+                RefCount INT NOT NULL DEFAULT 0,
+                UpdatedAt DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_blobref_refcount (RefCount, UpdatedAt)
+            )"""),
+        add_column('CourseContent', 'ContentHash', "ALTER TABLE CourseContent ADD COLUMN ContentHash CHAR(64)"),
+        add_column('CourseContent', 'ContentSize', "ALTER TABLE CourseContent ADD COLUMN ContentSize BIGINT"),
+        add_column('Submission', 'SubmissionHash', "ALTER TABLE Submission ADD COLUMN SubmissionHash CHAR(64)"),
+        add_column('Submission', 'SubmissionSize', "ALTER TABLE Submission ADD COLUMN SubmissionSize BIGINT"),
+    ]),
+    (4, 'Secondary indexes for route queries', [
+        # Members, grade recalculation and course counts: covers (CourseId) lookups
+        # in StudentID order and carries Grade so averages never touch the rows
+        add_index('Enrollment', 'idx_enrollment_course_student',
+                  "CREATE INDEX idx_enrollment_course_student ON Enrollment (CourseId, StudentID, Grade)"),
+        add_index('CourseLecturer', 'idx_courselecturer_lecturer',
+                  "CREATE INDEX idx_courselecturer_lecturer ON CourseLecturer (LecId, CourseId)"),
+        add_index('Assignment', 'idx_assignment_course_due',
+                  "CREATE INDEX idx_assignment_course_due ON Assignment (CourseId, DueDate)"),
+        add_index('Submission', 'idx_submission_student',
+                  "CREATE INDEX idx_submission_student ON Submission (StudentID, AssignmentId)"),
+        add_index('CourseContent', 'idx_coursecontent_course_section',
+                  "CREATE INDEX idx_coursecontent_course_section ON CourseContent (CourseId, Section)"),
+        add_index('CalendarEvent', 'idx_calendarevent_course_date',
+                  "CREATE INDEX idx_calendarevent_course_date ON CalendarEvent (CourseId, EventDate)"),
+    ]),
+    (5, 'Department prefix column for course code lookups', [
+        add_column('Course', 'DeptPrefix',
+                   "ALTER TABLE Course ADD COLUMN DeptPrefix CHAR(3) AS (LEFT(CourseCode, 3)) STORED"),
+        add_index('Course', 'idx_course_dept_code',
+                  "CREATE INDEX idx_course_dept_code ON Course (DeptPrefix, CourseCode)"),
+    ]),
+    (6, 'CourseCount counters replace the COUNT(*) limit triggers', [
+        add_column('Student', 'CourseCount', "ALTER TABLE Student ADD COLUMN CourseCount INT NOT NULL DEFAULT 0"),
+        add_column('Lecturer', 'CourseCount', "ALTER TABLE Lecturer ADD COLUMN CourseCount INT NOT NULL DEFAULT 0"),
+        run_sql("""
+            UPDATE Student S
+            LEFT JOIN (SELECT StudentID, COUNT(*) AS Actual FROM Enrollment GROUP BY StudentID) X
+                ON X.StudentID = S.StudentID
+            SET S.CourseCount = COALESCE(X.Actual, 0)"""),
+        run_sql("""
+            UPDATE Lecturer L
+            LEFT JOIN (SELECT LecId, COUNT(*) AS Actual FROM CourseLecturer GROUP BY LecId) X
+                ON X.LecId = L.LecId
+            SET L.CourseCount = COALESCE(X.Actual, 0)"""),
+        run_sql("DROP TRIGGER IF EXISTS check_student_enrollment_limit"),
+        run_sql("""
+            CREATE TRIGGER check_student_enrollment_limit
+            BEFORE INSERT ON Enrollment
+            FOR EACH ROW
+            BEGIN
+                UPDATE Student SET CourseCount = CourseCount + 1
+                WHERE StudentID = NEW.StudentID AND CourseCount < 6;
+                IF ROW_COUNT() = 0 THEN
+                    SIGNAL SQLSTATE '45000'
+                    SET MESSAGE_TEXT = 'Student cannot enroll in more than 6 courses.';
+                END IF;
+            END"""),
+        run_sql("DROP TRIGGER IF EXISTS release_student_enrollment"),
+        run_sql("""
+            CREATE TRIGGER release_student_enrollment
+            AFTER DELETE ON Enrollment
+            FOR EACH ROW
+            BEGIN
+                UPDATE Student SET CourseCount = CourseCount - 1
+                WHERE StudentID = OLD.StudentID AND CourseCount > 0;
+            END"""),
+        run_sql("DROP TRIGGER IF EXISTS check_lecturer_course_limit"),
+        run_sql("""
+            CREATE TRIGGER check_lecturer_course_limit
+            BEFORE INSERT ON CourseLecturer
+            FOR EACH ROW
+            BEGIN
+                UPDATE Lecturer SET CourseCount = CourseCount + 1
+                WHERE LecId = NEW.LecId AND CourseCount < 5;
+                IF ROW_COUNT() = 0 THEN
+                    SIGNAL SQLSTATE '45000'
+                    SET MESSAGE_TEXT = 'Lecturer cannot teach more than 5 courses.';
+                END IF;
+            END"""),
+        run_sql("DROP TRIGGER IF EXISTS release_lecturer_course"),
+        run_sql("""
+            CREATE TRIGGER release_lecturer_course
+            AFTER DELETE ON CourseLecturer
+            FOR EACH ROW
+            BEGIN
+                UPDATE Lecturer SET CourseCount = CourseCount - 1
+                WHERE LecId = OLD.LecId AND CourseCount > 0;
+            END"""),
+    ]),
+    (7, 'CourseVersion counters for conditional GETs', [
+        create_table('CourseVersion', """
+            CREATE TABLE CourseVersion (
+                CourseId INT PRIMARY KEY,
+                Version BIGINT NOT NULL DEFAULT 0
+            )"""),
+    ]),
+    (8, 'CourseVersion.GradeVersion for cached grade statistics', [
+        add_column('CourseVersion', 'GradeVersion',
+                   "ALTER TABLE CourseVersion ADD COLUMN GradeVersion BIGINT NOT NULL DEFAULT 0"),
+    ]),
+    (9, 'RevokedToken table shared by all workers', [
+        create_table('RevokedToken', """
+            CREATE TABLE RevokedToken (
+                Digest CHAR(64) PRIMARY KEY,
+                ExpiresAt BIGINT NOT NULL,
+                INDEX idx_revokedtoken_expires (ExpiresAt)
+            )"""),
+    ]),
+    (10, 'CourseContent.ContentDigest for legacy inline downloads', [
+        add_column('CourseContent', 'ContentDigest', "ALTER TABLE CourseContent ADD COLUMN ContentDigest CHAR(64)"),
+        run_sql("""
+            UPDATE CourseContent SET ContentDigest = SHA2(Content, 256), ContentSize = LENGTH(Content)
+            WHERE ContentHash IS NULL AND Content IS NOT NULL AND ContentDigest IS NULL"""),
+    ]),
+]
+
+# Route queries whose plans the indexes above are meant to change. Sample
+# parameters are picked from the data so the plans reflect the real dataset.
+EXPLAIN_QUERIES = [
+    ('course members', """
+        SELECT S.StudentID, S.FirstName, S.LastName
+        FROM Enrollment E JOIN Student S ON S.StudentID = E.StudentID
+        WHERE E.CourseID = %s AND E.StudentID > 0 ORDER BY E.StudentID LIMIT 101""", ['course']),
+    ('lecturer courses', """
+        SELECT Course.CourseID, CourseName, CourseCode FROM Course
+        JOIN CourseLecturer ON Course.CourseID = CourseLecturer.CourseID WHERE LecID = %s""", ['lecturer']),
+    ('course assignments', """
+        SELECT AssignmentId, Title, Description, DueDate FROM Assignment WHERE CourseId = %s""", ['course']),
+    ('student submissions', """
+        SELECT SubmissionId, AssignmentId FROM Submission WHERE StudentID = %s""", ['student']),
+    ('course content', """
+        SELECT ContentId, Section, Metadata FROM CourseContent WHERE CourseId = %s""", ['course']),
+    ('course calendar', """
+        SELECT EventId, EventDate FROM CalendarEvent WHERE CourseId = %s ORDER BY EventDate""", ['course']),
+    ('course grade averages', """
+        SELECT E.StudentID, AVG(G.Grade) FROM Enrollment E
+        JOIN Assignment A ON A.CourseId = E.CourseId
+        JOIN Submission S ON S.AssignmentId = A.AssignmentId AND S.StudentID = E.StudentID
+        JOIN Grade G ON G.SubmissionId = S.SubmissionId
+        WHERE E.CourseId = %s GROUP BY E.StudentID""", ['course']),
+    ('next course code (before)', """
+        SELECT MAX(CourseCode) FROM Course WHERE LEFT(CourseCode, 3) = %s""", ['prefix']),
+]
+
+_SAMPLE_PARAMS = {
+    'course': "SELECT CourseId FROM Enrollment GROUP BY CourseId ORDER BY COUNT(*) DESC LIMIT 1",
+    'lecturer': "SELECT LecId FROM CourseLecturer LIMIT 1",
+    'student': "SELECT StudentID FROM Submission LIMIT 1",
+    'prefix': "SELECT LEFT(CourseCode, 3) FROM Course LIMIT 1",
+}
+
+
+def _exists(cursor, kind, table, name):
+    if kind == 'table':
+        cursor.execute("""
+            SELECT 1 FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s""", (table,))
+    elif kind == 'column':
+        cursor.execute("""
+            SELECT 1 FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s""", (table, name))
+    else:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1""", (table, name))
+    return cursor.fetchone() is not None
+
+
+def applied_versions(cnx):
+    cursor = cnx.cursor()
+    try:
+        cursor.execute(_CREATE_MIGRATION_TABLE)
+        cursor.execute("SELECT Version FROM SchemaMigration")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def run_migrations(cnx, log=print):
+    """Applies every migration not yet recorded in SchemaMigration, in version order."""
+    done = applied_versions(cnx)
+    cursor = cnx.cursor()
+    try:
+        for version, description, steps in MIGRATIONS:
+            if version in done:
+                continue
+            log(f"Applying {version}: {description}")
+            for kind, table, name, ddl in steps:
+                if kind == 'sql':
+                    cursor.execute(ddl)
+                    continue
+                if kind == 'python':
+                    ddl(cnx)
+                    continue
+                if _exists(cursor, kind, table, name or table):
+                    log(f"  {kind} {table}{'.' + name if name else ''} already exists")
+                    continue
+                cursor.execute(ddl)
+                log(f"  created {kind} {table}{'.' + name if name else ''}")
+            cursor.execute("INSERT INTO SchemaMigration (Version, Description) VALUES (%s, %s)",
+                           (version, description))
+            cnx.commit()
+    finally:
+        cursor.close()
+
+
+def explain_route_queries(cnx, log=print):
+    """Prints the EXPLAIN plan of each query in EXPLAIN_QUERIES for a sample of the data."""
+    cursor = cnx.cursor(dictionary=True)
+    try:
+        samples = {}
+        for name, sql in _SAMPLE_PARAMS.items():
+            cursor.execute(sql)
+            row = cursor.fetchone()
+            samples[name] = list(row.values())[0] if row else None
+
+        if _exists(cursor, 'column', 'Course', 'DeptPrefix'):
+            queries = EXPLAIN_QUERIES + [('next course code (after)', """
+                SELECT MAX(CourseCode) FROM Course WHERE DeptPrefix = %s""", ['prefix'])]
+        else:
+            queries = EXPLAIN_QUERIES
+
+        for label, sql, params in queries:
+            cursor.execute("EXPLAIN " + sql, [samples[p] for p in params])
+            log(f"-- {label}")
+            for row in cursor.fetchall():
+                log(f"   {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                    f"rows={row.get('rows')} extra={row.get('Extra')}")
+    finally:
+        cursor.close()
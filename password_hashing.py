@@ -0,0 +1,121 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from .utilities import generate_hashed_password
+
+ALGORITHM = 'pbkdf2_sha256'
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing pool already has as much work queued as it accepts, or a hash timed out."""
+
+
+def _pbkdf2(password, salt, iterations):
+    # Runs in a worker process
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+
+def parse_hash(stored):
+    """Returns (iterations, digest) for a KDF hash, or (None, stored) for a legacy SHA-256 hash."""
+    parts = stored.split('$')
+    if len(parts) == 3 and parts[0] == ALGORITHM:
+        return int(parts[1]), parts[2]
+    return None, stored
+
+
+class PasswordHasher(object):
+    """
+    Runs PBKDF2-SHA256 in a bounded process pool.
+
+    At most `workers + queue_limit` hashes are admitted at once; beyond that
+    HashingBusyError is raised straight away so the route can answer 503
+    instead of piling up request threads behind the CPU-bound work.
+    """
+
+    def __init__(self, iterations=600000, workers=2, queue_limit=16, timeout=10.0):
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self.configure(iterations, workers, queue_limit, timeout)
+
+    def configure(self, iterations, workers, queue_limit, timeout):
+        self.iterations = iterations
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+    def _get_executor(self):
+        # A pool inherited through fork() is unusable, so each process makes its own
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, password, salt, iterations):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise HashingBusyError('Password hashing is saturated, try again shortly')
+        try:
+            future = self._get_executor().submit(_pbkdf2, password, salt, iterations)
+        except Exception:
+            slots.release()
+            raise
+        # The slot is held until the worker has finished, even if this caller
+        # stops waiting, so admission counts every hash still being computed
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingBusyError(f'Password hashing took longer than {self.timeout}s, try again shortly')
+
+    def hash(self, password, salt):
+        """Returns the encoded hash to store in User.Password."""
+        digest = self._run(password, salt, self.iterations)
+        return f"{ALGORITHM}${self.iterations}${digest}"
+
+    def verify(self, password, salt, stored):
+        """
+        Checks a password against a stored hash of either scheme.
+
+        Returns (matches, needs_rehash); needs_rehash is True for legacy
+        SHA-256 hashes and for KDF hashes made with fewer iterations than
+        currently configured.
+        """
+        iterations, digest = parse_hash(stored)
+        if iterations is None:
+            return hmac.compare_digest(generate_hashed_password(password, salt), digest), True
+        matches = hmac.compare_digest(self._run(password, salt, iterations), digest)
+        return matches, iterations < self.iterations
+
+
+password_hasher = PasswordHasher()
+
+
+def configure_password_hasher(config):
+    password_hasher.configure(config['PASSWORD_HASH_ITERATIONS'], config['HASH_POOL_WORKERS'],
+                              config['HASH_QUEUE_LIMIT'], config['HASH_TIMEOUT'])
+
+
+def calibrate_iterations(target_ms, start=10000, max_iterations=10000000):
+    """
+    Benchmarks PBKDF2-SHA256 on this machine and returns the iteration count
+    that takes roughly target_ms for one hash, with the timings measured.
+    """
+    timings = []
+    iterations = start
+    while True:
+        started = time.perf_counter()
+        _pbkdf2('calibration-password', 'calibration-salt', iterations)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        timings.append((iterations, round(elapsed_ms, 1)))
+        if elapsed_ms >= target_ms / 4 or iterations >= max_iterations:
+            break
+        iterations *= 2
+    per_iteration_ms = elapsed_ms / iterations
+    recommended = min(max_iterations, int(target_ms / per_iteration_ms) // 1000 * 1000 or 1000)
+    return recommended, timings
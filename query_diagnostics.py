@@ -0,0 +1,135 @@
+import re
+from collections import Counter
+from flask import current_app, g, request
+from .db_pool import get_pool
+from .query_stats import RequestStats
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES_LIST = re.compile(r'(\(\?(?:, \?)*\))(?:\s*,\s*\1)+')
+_WHITESPACE = re.compile(r'\s+')
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict diagnostics mode when a request exceeds its query budget or N+1 threshold."""
+
+
+def normalize_statement(statement):
+    """
+    Reduces a statement to its shape: literals and placeholders become ?,
+    IN lists and multi-row VALUES collapse, whitespace is squeezed.
+    """
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _WHITESPACE.sub(' ', shape).strip()
+    shape = _VALUES_LIST.sub(r'\1...', shape)
+    return _IN_LIST.sub('(?...)', shape)
+
+
+def query_budget(max_queries):
+    """Declares the most SQL statements a route may run per request (checked in diagnostics mode)."""
+    def decorator(f):
+        # Outer decorators built with functools.wraps carry the attribute up to the view
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+
+class RequestDiagnostics(object):
+    """Statement shapes and slow statements seen during one request."""
+
+    def __init__(self, route, budget, n_plus_one_threshold, slow_seconds, strict):
+        self.route = route
+        self.budget = budget
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_seconds = slow_seconds
+        self.strict = strict
+        self.shapes = Counter()
+        self.queries = 0
+
+    def record(self, statement, params, elapsed):
+        self.queries += 1
+        if isinstance(statement, bytes):
+            statement = statement.decode('utf-8')
+        shape = normalize_statement(statement)
+        self.shapes[shape] += 1
+
+        if elapsed >= self.slow_seconds:
+            log_slow_query(self.route, statement, params, elapsed)
+
+        if self.strict:
+            if self.budget is not None and self.queries > self.budget:
+                raise QueryBudgetExceeded(f"{self.route} ran more than its budget of {self.budget} queries")
+            if self.shapes[shape] > self.n_plus_one_threshold:
+                raise QueryBudgetExceeded(
+                    f"{self.route} ran the same statement {self.shapes[shape]} times (N+1?): {shape}")
+
+    def report(self):
+        logger = current_app.logger
+        for shape, count in self.shapes.most_common():
+            if count <= self.n_plus_one_threshold:
+                break
+            logger.warning("N+1 suspect on %s: %d x %s", self.route, count, shape)
+        if self.budget is not None and self.queries > self.budget:
+            logger.warning("%s ran %d queries, over its budget of %d", self.route, self.queries, self.budget)
+
+
+def explain(statement, params):
+    """Runs EXPLAIN for a statement on a separate pooled connection; returns the plan rows or None."""
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    pool = get_pool(current_app.config)
+    cnx = pool.acquire()
+    try:
+        cursor = cnx.cursor(dictionary=True)
+        cursor.execute('EXPLAIN ' + statement, params)
+        plan = cursor.fetchall()
+        cursor.close()
+        return plan
+    finally:
+        pool.release(cnx)
+
+
+def log_slow_query(route, statement, params, elapsed):
+    try:
+        plan = explain(statement, params)
+    except Exception as e:
+        plan = f'EXPLAIN failed: {e}'
+    current_app.logger.warning("Slow query on %s (%.1f ms): %s params=%r plan=%r",
+                               route, elapsed * 1000, _WHITESPACE.sub(' ', statement).strip(), params, plan)
+
+
+def _start_request():
+    stats = g.get('request_stats')
+    if stats is None:
+        stats = g.request_stats = RequestStats()
+    config = current_app.config
+    view = current_app.view_functions.get(request.endpoint)
+    stats.diagnostics = RequestDiagnostics(
+        route=request.url_rule.rule if request.url_rule is not None else request.path,
+        budget=getattr(view, 'query_budget', config['DEFAULT_QUERY_BUDGET']),
+        n_plus_one_threshold=config['N_PLUS_ONE_THRESHOLD'],
+        slow_seconds=config['SLOW_QUERY_MS'] / 1000.0,
+        strict=config['QUERY_DIAGNOSTICS_STRICT'] or current_app.testing,
+    )
+
+
+def _finish_request(exception=None):
+    stats = g.get('request_stats')
+    if stats is not None and stats.diagnostics is not None:
+        stats.diagnostics.report()
+
+
+def init_query_diagnostics(app):
+    """
+    Turns on N+1 detection, the slow-query log and query budgets when
+    QUERY_DIAGNOSTICS is set. Must be called after init_metrics.
+    """
+    if not app.config.get('QUERY_DIAGNOSTICS'):
+        return
+    app.before_request(_start_request)
+    app.teardown_request(_finish_request)
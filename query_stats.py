@@ -0,0 +1,99 @@
+import time
+from flask import g, has_app_context
+
+
+class RequestStats(object):
+    """Database and serialization work done by one request; lives on flask.g."""
+
+    __slots__ = ('started', 'queries', 'db_seconds', 'rows', 'serialize_seconds', 'status', 'diagnostics')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.serialize_seconds = 0.0
+        self.status = None
+        self.diagnostics = None  # query_diagnostics.RequestDiagnostics when QUERY_DIAGNOSTICS is on
+
+
+def current_stats():
+    """Returns the RequestStats of the current request, or None outside a request."""
+    if has_app_context():
+        return g.get('request_stats')
+    return None
+
+
+def record_query(statement, params, elapsed):
+    """Counts one executed statement against the current request."""
+    stats = current_stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if stats.diagnostics is not None:
+            stats.diagnostics.record(statement, params, elapsed)
+
+
+def record_fetch(elapsed, rows):
+    """Adds time spent and rows returned while fetching a result set."""
+    stats = current_stats()
+    if stats is not None:
+        stats.db_seconds += elapsed
+        stats.rows += rows
+
+
+class InstrumentedCursor(object):
+    """
+    Cursor proxy that reports statement count, time and rows to query_stats.
+
+    Everything other than execute/fetch is passed straight through, so it
+    can stand in for any mysql.connector cursor.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        rows = 0
+        started = time.perf_counter()
+        try:
+            for row in self._cursor:
+                rows += 1
+                yield row
+        finally:
+            record_fetch(time.perf_counter() - started, rows)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            record_query(operation, params, time.perf_counter() - started)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            record_query(operation, seq_params, time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        record_fetch(time.perf_counter() - started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        record_fetch(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        record_fetch(time.perf_counter() - started, len(rows))
+        return rows
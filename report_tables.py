@@ -0,0 +1,148 @@
+import time
+from collections import Counter
+
+REPORT_TABLES = ('CourseEnrollmentStats', 'StudentCourseStats', 'LecturerCourseStats')
+
+_REBUILD_SQL = {
+    'CourseEnrollmentStats': """
+        INSERT INTO CourseEnrollmentStats (CourseId, CourseName, NumberOfStudents)
+        SELECT c.CourseId, c.CourseName, COUNT(e.StudentID)
+        FROM Course c
+        JOIN Enrollment e ON c.CourseId = e.CourseId
+        GROUP BY c.CourseId, c.CourseName
+    """,
+    'StudentCourseStats': """
+        INSERT INTO StudentCourseStats (StudentID, FirstName, LastName, NumberOfCourses, GradeSum, GradedCourses)
+        SELECT s.StudentID, s.FirstName, s.LastName, COUNT(e.CourseId),
+               COALESCE(SUM(e.Grade), 0), COUNT(e.Grade)
+        FROM Student s
+        JOIN Enrollment e ON s.StudentID = e.StudentID
+        GROUP BY s.StudentID, s.FirstName, s.LastName
+    """,
+    'LecturerCourseStats': """
+        INSERT INTO LecturerCourseStats (LecId, LecFirstName, LecLastName, NumberOfCourses)
+        SELECT l.LecId, l.LecFirstName, l.LecLastName, COUNT(cl.CourseId)
+        FROM Lecturer l
+        JOIN CourseLecturer cl ON l.LecId = cl.LecId
+        GROUP BY l.LecId, l.LecFirstName, l.LecLastName
+    """,
+}
+
+
+def rebuild_reports(cnx, tables=REPORT_TABLES):
+    """
+    Repopulates the report tables from the base tables in one transaction.
+
+    Readers keep seeing the previous contents until the commit. Returns the
+    row count and elapsed time per table.
+    """
+    cursor = cnx.cursor()
+    results = {}
+    try:
+        for table in tables:
+            started = time.monotonic()
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(_REBUILD_SQL[table])
+            results[table] = {'rows': cursor.rowcount,
+                              'elapsed_seconds': round(time.monotonic() - started, 3)}
+            cursor.execute("""
+                INSERT INTO ReportState (ReportName, RebuiltAt) VALUES (%s, NOW())
+                ON DUPLICATE KEY UPDATE RebuiltAt = NOW()
+            """, (table,))
+        cnx.commit()
+        return results
+    except Exception:
+        cnx.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def record_enrollment(cursor, student_id, course_id):
+    """Counts a new Enrollment row in the course and student reports; the caller commits."""
+    cursor.execute("""
+        INSERT INTO CourseEnrollmentStats (CourseId, CourseName, NumberOfStudents)
+        SELECT CourseId, CourseName, 1 FROM Course WHERE CourseId = %s
+        ON DUPLICATE KEY UPDATE NumberOfStudents = NumberOfStudents + 1
+    """, (course_id,))
+    cursor.execute("""
+        INSERT INTO StudentCourseStats (StudentID, FirstName, LastName, NumberOfCourses)
+        SELECT StudentID, FirstName, LastName, 1 FROM Student WHERE StudentID = %s
+        ON DUPLICATE KEY UPDATE NumberOfCourses = NumberOfCourses + 1
+    """, (student_id,))
+
+
+def record_enrollments(cursor, pairs):
+    """
+    Counts many new (student_id, course_id) Enrollment rows at once, with one
+    statement per report table; the caller commits.
+    """
+    if not pairs:
+        return
+    course_counts = Counter(course_id for _, course_id in pairs)
+    student_counts = Counter(student_id for student_id, _ in pairs)
+    rows = ', '.join(['ROW(%s, %s)'] * len(course_counts))
+    cursor.execute(f"""
+        INSERT INTO CourseEnrollmentStats (CourseId, CourseName, NumberOfStudents)
+        SELECT C.CourseId, C.CourseName, N.Added
+        FROM Course C JOIN (VALUES {rows}) AS N (CourseId, Added) ON N.CourseId = C.CourseId
+        ON DUPLICATE KEY UPDATE NumberOfStudents = NumberOfStudents + N.Added
+    """, [value for item in course_counts.items() for value in item])
+    rows = ', '.join(['ROW(%s, %s)'] * len(student_counts))
+    cursor.execute(f"""
+        INSERT INTO StudentCourseStats (StudentID, FirstName, LastName, NumberOfCourses)
+        SELECT S.StudentID, S.FirstName, S.LastName, N.Added
+        FROM Student S JOIN (VALUES {rows}) AS N (StudentID, Added) ON N.StudentID = S.StudentID
+        ON DUPLICATE KEY UPDATE NumberOfCourses = NumberOfCourses + N.Added
+    """, [value for item in student_counts.items() for value in item])
+
+
+def record_lecturer_assignment(cursor, lecturer_id):
+    """Counts a new CourseLecturer row in the lecturer report; the caller commits."""
+    cursor.execute("""
+        INSERT INTO LecturerCourseStats (LecId, LecFirstName, LecLastName, NumberOfCourses)
+        SELECT LecId, LecFirstName, LecLastName, 1 FROM Lecturer WHERE LecId = %s
+        ON DUPLICATE KEY UPDATE NumberOfCourses = NumberOfCourses + 1
+    """, (lecturer_id,))
+
+
+def refresh_student_averages(cursor, course_id=None):
+    """
+    Recomputes the grade totals of students enrolled in course_id (or of
+    every student) after Enrollment grades changed; the caller commits.
+    """
+    where, params = ("WHERE StudentID IN (SELECT StudentID FROM Enrollment WHERE CourseId = %s)", (course_id,)) \
+        if course_id is not None else ("", ())
+    cursor.execute(f"""
+        UPDATE StudentCourseStats SCS
+        JOIN (
+            SELECT StudentID, COALESCE(SUM(Grade), 0) AS GradeSum, COUNT(Grade) AS GradedCourses
+            FROM Enrollment
+            {where}
+            GROUP BY StudentID
+        ) X ON X.StudentID = SCS.StudentID
+        SET SCS.GradeSum = X.GradeSum, SCS.GradedCourses = X.GradedCourses
+    """, params)
+
+
+def report_freshness(cnx, table):
+    """Returns (rebuilt_at, age_in_seconds) for a report table, or (None, None) if never rebuilt."""
+    cursor = cnx.cursor()
+    try:
+        cursor.execute("SELECT RebuiltAt, NOW() FROM ReportState WHERE ReportName = %s", (table,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not row:
+        return None, None
+    rebuilt_at, now = row
+    return rebuilt_at, int((now - rebuilt_at).total_seconds())
+
+
+def add_freshness_headers(response, rebuilt_at, age_seconds):
+    # The tables are kept current row by row; these only say when the last
+    # full rebuild ran, not how stale the data is
+    if rebuilt_at is not None:
+        response.headers['X-Report-Rebuilt-At'] = rebuilt_at.isoformat()
+        response.headers['X-Report-Rebuilt-Age'] = str(age_seconds)
+    return response
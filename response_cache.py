@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, make_response, request, current_app
+
+
+AGE_HEADER = 'X-Report-Rebuilt-Age'  # set by report_tables.add_freshness_headers
+
+
+class ResponseCache(object):
+    """
+    In-process LRU cache of rendered responses with a TTL and tag invalidation.
+
+    Entries are tagged with the data they were built from (e.g. 'enrollment');
+    write routes call invalidate() with the tags they touched after they
+    commit. The cache is per process, so other workers only see a write once
+    their entry's TTL runs out.
+
+    Each tag has a generation that invalidate() bumps. A miss takes the
+    generation of its tags before it reads the database and passes it to
+    set(), which drops the entry if an invalidation happened in between, so
+    a body read before a write committed is not cached after it.
+    """
+
+    def __init__(self, max_entries=256, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, tags, data, status, headers)
+        self._lock = threading.Lock()
+        self._generations = {}  # tag -> number of invalidations
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def generation(self, tags):
+        """Snapshot to pass to set() as generation, taken before the data is read."""
+        with self._lock:
+            return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def set(self, key, tags, data, status, headers, ttl=None, generation=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and generation != tuple(self._generations.get(tag, 0) for tag in tags):
+                return  # invalidated while the entry was being built
+            self._entries[key] = (expires_at, frozenset(tags), data, status, headers)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Drops every entry carrying any of the given tags."""
+        tags = set(tags)
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            stale = [key for key, entry in self._entries.items() if entry[1] & tags]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+            }
+
+
+report_cache = ResponseCache()
+
+
+def configure_report_cache(config):
+    report_cache.max_entries = config.get('REPORT_CACHE_MAX_ENTRIES', report_cache.max_entries)
+    report_cache.ttl = config.get('REPORT_CACHE_TTL', report_cache.ttl)
+
+
+def cached_response(*tags):
+    """
+    Caches a token-protected GET view per endpoint, role and query string.
+
+    Goes below @token_required so the decorated view receives user_data.
+    Only 200 responses are cached.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(user_data, *args, **kwargs):
+            if current_app.config.get('REPORT_CACHE_TTL', 1) <= 0:
+                return f(user_data, *args, **kwargs)
+
+            key = (request.endpoint, user_data['role'], tuple(sorted(kwargs.items())),
+                   request.query_string)
+            entry = report_cache.get(key)
+            if entry is not None:
+                _, _, data, status, (headers, age, cached_at) = entry
+                response = Response(data, status=status, headers=headers)
+                if age is not None:
+                    # The body is as old as when it was cached, plus the time since
+                    response.headers[AGE_HEADER] = str(age + int(time.monotonic() - cached_at))
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            generation = report_cache.generation(tags)
+            response = make_response(f(user_data, *args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                age = response.headers.get(AGE_HEADER, type=int)
+                headers = [(name, value) for name, value in response.headers.items() if name != AGE_HEADER]
+                report_cache.set(key, tags, response.get_data(), response.status_code,
+                                 (headers, age, time.monotonic()), generation=generation)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+
+        return decorated_function
+    return decorator
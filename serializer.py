@@ -0,0 +1,234 @@
+import datetime
+import decimal
+import gzip
+import json
+import random
+import time
+from flask import request, current_app
+from flask.json.provider import DefaultJSONProvider
+from mysql.connector import FieldType
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/calendar')
+
+
+def _text(value):
+    if value.__class__ is not bytes:
+        return value
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return f'[Binary data: {len(value)} bytes]'
+
+
+def _decimal(value):
+    return float(value)
+
+
+def _date(value):
+    return value.isoformat()
+
+
+def _datetime(value):
+    return value.isoformat(' ', 'seconds')  # same text as strftime('%Y-%m-%d %H:%M:%S'), ~4x faster
+
+
+def _time(value):
+    return str(value)  # TIME columns come back as timedelta, e.g. '9:30:00'
+
+
+# Converter per MySQL column type; int, float and character columns are
+# already JSON-ready and have none
+_CONVERTERS = {
+    FieldType.DECIMAL: _decimal,
+    FieldType.NEWDECIMAL: _decimal,
+    FieldType.DATE: _date,
+    FieldType.NEWDATE: _date,
+    FieldType.DATETIME: _datetime,
+    FieldType.TIMESTAMP: _datetime,
+    FieldType.TIME: _time,
+    FieldType.TINY_BLOB: _text,
+    FieldType.MEDIUM_BLOB: _text,
+    FieldType.LONG_BLOB: _text,
+    FieldType.BLOB: _text,  # TEXT columns report as BLOB too
+    FieldType.VAR_STRING: _text,
+    FieldType.STRING: _text,
+    FieldType.JSON: _text,
+}
+
+
+class RowSerializer(object):
+    """
+    Turns the rows of one query into JSON-ready dicts.
+
+    Output keys and a converter per column are worked out once from
+    cursor.description, so each row is built in a single pass and columns
+    that need no conversion cost nothing beyond the dict itself.
+    """
+
+    def __init__(self, description, keys=None):
+        keys = keys or {}
+        self.keys = tuple(keys.get(column[0], column[0]) for column in description)
+        self.converters = tuple((key, _CONVERTERS[column[1]]) for key, column in zip(self.keys, description)
+                                if column[1] in _CONVERTERS)
+
+    def rows(self, rows):
+        keys, converters = self.keys, self.converters
+        if not converters:
+            return [dict(zip(keys, row)) for row in rows]
+        result = []
+        for row in rows:
+            item = dict(zip(keys, row))
+            for key, convert in converters:
+                value = item[key]
+                if value is not None:
+                    item[key] = convert(value)
+            result.append(item)
+        return result
+
+
+def serialize_rows(cursor, keys=None):
+    """
+    Fetches the rest of a (tuple) cursor's result as JSON-ready dicts.
+
+    keys renames columns, e.g. {'CourseId': 'course_id'}; columns not in it
+    keep their name.
+    """
+    return RowSerializer(cursor.description, keys).rows(cursor.fetchall())
+
+
+def dumps(obj):
+    """Compact JSON for JSON-ready values (e.g. RowSerializer output), via orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding with orjson when it is installed."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:  # indented debug output and explicit options go the slow way
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME  # dates keep Flask's format
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the json module handles
+            return super().dumps(obj)
+
+
+def compress_response(response):
+    """Compresses large textual responses with brotli or gzip, as the client accepts."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    level = current_app.config['COMPRESS_LEVEL']
+    if brotli is not None and request.accept_encodings['br']:
+        response.set_data(brotli.compress(data, quality=min(level, 11)))
+        response.headers['Content-Encoding'] = 'br'
+    elif request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=level))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def init_serialization(app):
+    """Installs the orjson-backed JSON provider and response compression (COMPRESS_RESPONSES)."""
+    app.json = FastJSONProvider(app)
+    if app.config.get('COMPRESS_RESPONSES'):
+        app.after_request(compress_response)
+
+
+def _legacy_rows(rows):
+    """The per-row rebuild get_course_content did before RowSerializer, kept for the benchmark."""
+    content_list = []
+    for content_row in rows:
+        section_value = content_row.get('Section')
+        metadata_value = content_row.get('Metadata')
+        if isinstance(section_value, bytes):
+            try:
+                section_string = section_value.decode('utf-8')
+            except UnicodeDecodeError:
+                section_string = f"[Binary data Section: {len(section_value)} bytes]"
+        else:
+            section_string = str(section_value) if section_value is not None else None
+        if isinstance(metadata_value, bytes):
+            try:
+                metadata_string = metadata_value.decode('utf-8')
+            except UnicodeDecodeError:
+                metadata_string = f"[Binary data Metadata: {len(metadata_value)} bytes]"
+        else:
+            metadata_string = str(metadata_value) if metadata_value is not None else None
+        item = {
+            "content_id": content_row.get('ContentId'),
+            "section": section_string,
+            "metadata": metadata_string,
+            "size": content_row.get('Size'),
+            "updated": content_row.get('Updated'),
+            "weight": content_row.get('Weight'),
+        }
+        for key, value in item.items():
+            if isinstance(value, datetime.datetime):
+                item[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+            elif isinstance(value, decimal.Decimal):
+                item[key] = float(value)
+        content_list.append(item)
+    return content_list
+
+
+def benchmark_serialization(rows=10000, repeat=5, seed=1):
+    """
+    Times the old dict-cursor loop plus json.dumps against RowSerializer plus
+    the fast encoder on synthetic CourseContent-like rows. Returns seconds
+    per run (best of repeat) for each, as a dict.
+    """
+    rng = random.Random(seed)
+    description = [('ContentId', FieldType.LONG), ('Section', FieldType.VAR_STRING),
+                   ('Metadata', FieldType.BLOB), ('Size', FieldType.LONGLONG),
+                   ('Updated', FieldType.DATETIME), ('Weight', FieldType.NEWDECIMAL)]
+    keys = {'ContentId': 'content_id', 'Section': 'section', 'Metadata': 'metadata', 'Size': 'size',
+            'Updated': 'updated', 'Weight': 'weight'}
+    start = datetime.datetime(2025, 1, 1)
+    tuples = [(i, f'Week {i % 12 + 1}'.encode('utf-8'),
+               f'{{"filename": "lecture-{i}.pdf"}}'.encode('utf-8'), rng.randint(1000, 10 ** 7),
+               start + datetime.timedelta(minutes=i), decimal.Decimal(rng.randint(0, 10000)) / 100)
+              for i in range(rows)]
+    dicts = [dict(zip([column[0] for column in description], row)) for row in tuples]
+
+    def legacy():
+        json.dumps(_legacy_rows(dicts))
+
+    def current():
+        data = RowSerializer(description, keys).rows(tuples)
+        if orjson is not None:
+            orjson.dumps(data)
+        else:
+            json.dumps(data, separators=(',', ':'))
+
+    results = {}
+    for name, run in (('legacy', legacy), ('serializer', current)):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+    return results
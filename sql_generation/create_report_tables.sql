@@ -0,0 +1,42 @@
+-- Materialized versions of the report views in create_views.sql.
+-- The API keeps these current as it writes Enrollment, CourseLecturer and
+-- grades; `flask rebuild-reports` repopulates them from the base tables.
+
+-- Backs CoursesWith50PlusStudents and Top10EnrolledCourses
+CREATE TABLE CourseEnrollmentStats (
+    CourseId INT PRIMARY KEY,
+    CourseName VARCHAR(255) NOT NULL,
+    NumberOfStudents INT NOT NULL DEFAULT 0,
+    INDEX idx_course_stats_students (NumberOfStudents),
+    FOREIGN KEY (CourseId) REFERENCES Course(CourseId)
+);
+
+-- Backs StudentsWith5PlusCourses and Top10StudentsByAverage
+CREATE TABLE StudentCourseStats (
+    StudentID INT PRIMARY KEY,
+    FirstName VARCHAR(255) NOT NULL,
+    LastName VARCHAR(255) NOT NULL,
+    NumberOfCourses INT NOT NULL DEFAULT 0,
+    GradeSum INT NOT NULL DEFAULT 0, -- SUM(Enrollment.Grade) over graded courses
+    GradedCourses INT NOT NULL DEFAULT 0, -- COUNT(Enrollment.Grade)
+    OverallAverage DECIMAL(14,4) AS (GradeSum / NULLIF(GradedCourses, 0)) STORED,
+    INDEX idx_student_stats_courses (NumberOfCourses),
+    INDEX idx_student_stats_average (OverallAverage),
+    FOREIGN KEY (StudentID) REFERENCES Student(StudentID)
+);
+
+-- Backs LecturersWith3PlusCourses
+CREATE TABLE LecturerCourseStats (
+    LecId INT PRIMARY KEY,
+    LecFirstName VARCHAR(255) NOT NULL,
+    LecLastName VARCHAR(255) NOT NULL,
+    NumberOfCourses INT NOT NULL DEFAULT 0,
+    INDEX idx_lecturer_stats_courses (NumberOfCourses),
+    FOREIGN KEY (LecId) REFERENCES Lecturer(LecId)
+);
+
+-- When each report table was last fully rebuilt
+CREATE TABLE ReportState (
+    ReportName VARCHAR(64) PRIMARY KEY,
+    RebuiltAt DATETIME NOT NULL
+);
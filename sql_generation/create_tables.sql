@@ -14,6 +14,7 @@ CREATE TABLE Lecturer (
     LecFirstName VARCHAR(255) NOT NULL,
     LecLastName VARCHAR(255) NOT NULL,
     Department VARCHAR(255) NOT NULL,
+    CourseCount INT NOT NULL DEFAULT 0, -- maintained by the CourseLecturer triggers
     UserId INT,
     FOREIGN KEY (UserId) REFERENCES User(UserId)
 );
@@ -21,13 +22,16 @@ CREATE TABLE Lecturer (
 CREATE TABLE Course (
     CourseId INT PRIMARY KEY,
     CourseName VARCHAR(255) NOT NULL UNIQUE,
-    CourseCode VARCHAR(10) NOT NULL UNIQUE
+    CourseCode VARCHAR(10) NOT NULL UNIQUE,
+    DeptPrefix CHAR(3) AS (LEFT(CourseCode, 3)) STORED,
+    INDEX idx_course_dept_code (DeptPrefix, CourseCode)
 );
 
 CREATE TABLE CourseLecturer (
     CourseId INT,
     LecId INT,
     PRIMARY KEY (CourseId, LecId),
+    INDEX idx_courselecturer_lecturer (LecId, CourseId),
     FOREIGN KEY (CourseId) REFERENCES Course(CourseId),
     FOREIGN KEY (LecId) REFERENCES Lecturer(LecId)
 );
@@ -36,6 +40,7 @@ CREATE TABLE Student (
     StudentID INT PRIMARY KEY,
     FirstName VARCHAR(255) NOT NULL,
     LastName VARCHAR(255) NOT NULL,
+    CourseCount INT NOT NULL DEFAULT 0, -- maintained by the Enrollment triggers
     UserId INT,
     FOREIGN KEY (UserId) REFERENCES User(UserId)
 );
@@ -45,6 +50,7 @@ CREATE TABLE Enrollment (
     CourseId INT,
     Grade INT CHECK (Grade >= 0 AND Grade <= 100),
     PRIMARY KEY (StudentID, CourseId),
+    INDEX idx_enrollment_course_student (CourseId, StudentID, Grade),
     FOREIGN KEY (StudentID) REFERENCES Student(StudentID),
     FOREIGN KEY (CourseId) REFERENCES Course(CourseId),
     CHECK (Grade >= 0 AND Grade <= 100)
@@ -56,6 +62,7 @@ CREATE TABLE Assignment (
     Title VARCHAR(255) NOT NULL,
     Description TEXT,
     DueDate DATETIME,
+    INDEX idx_assignment_course_due (CourseId, DueDate),
     FOREIGN KEY (CourseId) REFERENCES Course(CourseId)
 );
 
@@ -82,6 +89,7 @@ CREATE TABLE CalendarEvent (
     EventDate DATETIME NOT NULL,
     EventTime TIME NOT NULL,
     Description TEXT,
+    INDEX idx_calendarevent_course_date (CourseId, EventDate),
     FOREIGN KEY (CourseId) REFERENCES Course(CourseId)
 );
 
@@ -89,8 +97,12 @@ CREATE TABLE CourseContent (
     ContentId INT PRIMARY KEY,
     CourseId INT,
     Section INT NOT NULL,
-    Content BLOB,
+    Content BLOB, -- legacy inline body; new content lives in the blob store
+    ContentHash CHAR(64), -- SHA-256 of the body in the blob store
+    ContentSize BIGINT,
+    ContentDigest CHAR(64), -- SHA-256 of a legacy inline body, the ETag of its downloads
     Metadata TEXT,
+    INDEX idx_coursecontent_course_section (CourseId, Section),
     FOREIGN KEY (CourseId) REFERENCES Course(CourseId)
 );
 
@@ -99,7 +111,10 @@ CREATE TABLE Submission (
     SubmissionId INT PRIMARY KEY,
     AssignmentId INT NOT NULL,
     StudentID INT NOT NULL,
-    SubmissionContent BLOB, -- Or TEXT/VARCHAR if storing links/text only
+    SubmissionContent BLOB, -- legacy inline body; new submissions live in the blob store
+    SubmissionHash CHAR(64), -- SHA-256 of the body in the blob store
+    SubmissionSize BIGINT,
+    INDEX idx_submission_student (StudentID, AssignmentId),
     SubmissionDate DATETIME DEFAULT CURRENT_TIMESTAMP, -- Track when it was submitted
     FOREIGN KEY (AssignmentId) REFERENCES Assignment(AssignmentId) ON DELETE CASCADE, -- If assignment is deleted, remove submissions
     FOREIGN KEY (StudentID) REFERENCES Student(StudentID) ON DELETE CASCADE, -- If student is deleted, remove their submissions
@@ -116,22 +131,59 @@ CREATE TABLE Grade (
     FOREIGN KEY (SubmissionId) REFERENCES Submission(SubmissionId) ON DELETE CASCADE -- If submission is deleted, remove the grade
 );
 
+-- Reference counts for bodies in the content-addressed blob store
+CREATE TABLE BlobRef (
+    Hash CHAR(64) PRIMARY KEY,
+    Size BIGINT NOT NULL,
+    RefCount INT NOT NULL DEFAULT 0,
+    UpdatedAt DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_blobref_refcount (RefCount, UpdatedAt)
+);
+
+-- Next free primary key per table; the API reserves IDs from here in blocks
+CREATE TABLE IdSequence (
+    Name VARCHAR(64) PRIMARY KEY,
+    NextId BIGINT NOT NULL
+);
+
+-- Logged-out JWTs (SHA-256 of the token) until their exp, in Unix seconds
+CREATE TABLE RevokedToken (
+    Digest CHAR(64) PRIMARY KEY,
+    ExpiresAt BIGINT NOT NULL,
+    INDEX idx_revokedtoken_expires (ExpiresAt)
+);
+
+-- Change counters per course (CourseId 0 is the catalog); the API derives ETags
+-- from Version and caches grade statistics on Version and GradeVersion
+CREATE TABLE CourseVersion (
+    CourseId INT PRIMARY KEY,
+    Version BIGINT NOT NULL DEFAULT 0,
+    GradeVersion BIGINT NOT NULL DEFAULT 0
+);
+
 DELIMITER //
 
+-- The limit check is a single guarded increment of Student.CourseCount
 CREATE TRIGGER check_student_enrollment_limit
 BEFORE INSERT ON Enrollment
 FOR EACH ROW
 BEGIN
-    DECLARE student_course_count INT;
-    SELECT COUNT(*) INTO student_course_count
-    FROM Enrollment
-    WHERE StudentID = NEW.StudentID;
-    IF student_course_count >= 6 THEN
+    UPDATE Student SET CourseCount = CourseCount + 1
+    WHERE StudentID = NEW.StudentID AND CourseCount < 6;
+    IF ROW_COUNT() = 0 THEN
         SIGNAL SQLSTATE '45000'
         SET MESSAGE_TEXT = 'Student cannot enroll in more than 6 courses.';
     END IF;
 END//
 
+CREATE TRIGGER release_student_enrollment
+AFTER DELETE ON Enrollment
+FOR EACH ROW
+BEGIN
+    UPDATE Student SET CourseCount = CourseCount - 1
+    WHERE StudentID = OLD.StudentID AND CourseCount > 0;
+END//
+
 
 DELIMITER ;
 
@@ -154,20 +206,27 @@ END;
 
 DELIMITER //
 
+-- The limit check is a single guarded increment of Lecturer.CourseCount
 CREATE TRIGGER check_lecturer_course_limit
 BEFORE INSERT ON CourseLecturer
 FOR EACH ROW
 BEGIN
-    DECLARE lecturer_course_count INT;
-    SELECT COUNT(*) INTO lecturer_course_count
-    FROM CourseLecturer
-    WHERE LecId = NEW.LecId;
-    IF lecturer_course_count >= 5 THEN
+    UPDATE Lecturer SET CourseCount = CourseCount + 1
+    WHERE LecId = NEW.LecId AND CourseCount < 5;
+    IF ROW_COUNT() = 0 THEN
         SIGNAL SQLSTATE '45000'
         SET MESSAGE_TEXT = 'Lecturer cannot teach more than 5 courses.';
     END IF;
 END//
 
+CREATE TRIGGER release_lecturer_course
+AFTER DELETE ON CourseLecturer
+FOR EACH ROW
+BEGIN
+    UPDATE Lecturer SET CourseCount = CourseCount - 1
+    WHERE LecId = OLD.LecId AND CourseCount > 0;
+END//
+
 DELIMITER ;
 
 /*
@@ -91,6 +91,7 @@ const sqlFiles = [
     'create_database.sql',
    'create_tables.sql',
    'create_views.sql',
+   'create_report_tables.sql',
    'insert_users.sql',
    'insert_lecturers.sql',
 'insert_students.sql',
@@ -0,0 +1,109 @@
+import threading
+import time
+import weakref
+from .query_stats import record_query, record_fetch
+
+# Named SQL shared by the blueprints. Each is prepared once per pooled
+# connection and then executed through the binary protocol.
+STATEMENTS = {
+    'course_exists': "SELECT CourseID FROM Course WHERE CourseID = %s",
+    'student_exists': "SELECT StudentID FROM Student WHERE StudentID = %s",
+    'lecturer_exists': "SELECT LecId FROM Lecturer WHERE LecId = %s",
+    'assignment_exists': "SELECT AssignmentId FROM Assignment WHERE AssignmentId = %s",
+    'submission_exists': "SELECT SubmissionId FROM Submission WHERE SubmissionId = %s",
+    'course_lecturer_id': "SELECT LecId FROM CourseLecturer WHERE CourseID = %s",
+    'enrollment_exists': "SELECT 1 FROM Enrollment WHERE StudentID = %s AND CourseID = %s",
+    'submission_for_student': "SELECT 1 FROM Submission WHERE AssignmentId = %s AND StudentID = %s",
+    'grade_for_submission': "SELECT 1 FROM Grade WHERE SubmissionId = %s",
+    'user_by_username': "SELECT * FROM User WHERE Username = %s",
+    'course_versions': """
+        SELECT C.CourseId, COALESCE(V.Version, 0)
+        FROM (SELECT 0 AS CourseId UNION ALL SELECT CourseID FROM Course WHERE CourseID = %s) C
+        LEFT JOIN CourseVersion V ON V.CourseId = C.CourseId""",  # the course's row only if it exists
+    'course_grade_versions': "SELECT CourseId, Version, GradeVersion FROM CourseVersion WHERE CourseId IN (0, %s)",
+    'version_totals': "SELECT COUNT(*), COALESCE(SUM(Version), 0), COALESCE(SUM(GradeVersion), 0) FROM CourseVersion",  # 0 = catalog
+    'all_courses': "SELECT CourseID, CourseName, CourseCode FROM Course",
+    'student_courses': """
+        SELECT Course.CourseID, CourseName, CourseCode FROM Course
+        JOIN Enrollment ON Course.CourseID = Enrollment.CourseID WHERE StudentID = %s""",
+    'lecturer_courses': """
+        SELECT Course.CourseID, CourseName, CourseCode FROM Course
+        JOIN CourseLecturer ON Course.CourseID = CourseLecturer.CourseID WHERE LecID = %s""",
+    'course_lecturer': """
+        SELECT L.LecId, L.LecFirstName, L.LecLastName
+        FROM Lecturer L
+        JOIN CourseLecturer CL ON L.LecId = CL.LecId
+        WHERE CL.CourseID = %s""",
+    'course_assignments': """
+        SELECT AssignmentId, Title, Description, DueDate
+        FROM Assignment
+        WHERE CourseId = %s""",
+    'student_enrolled_for_assignment': """
+        SELECT COUNT(*)
+        FROM Enrollment E
+        JOIN Assignment A ON E.CourseId = A.CourseId
+        WHERE E.StudentID = %s AND A.AssignmentId = %s""",
+}
+
+
+class StatementStats(object):
+    """Execution count and cumulative time per named statement."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}  # name -> [executions, total_seconds]
+
+    def record(self, name, elapsed):
+        with self._lock:
+            entry = self._stats.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def snapshot(self):
+        with self._lock:
+            return sorted(({'statement': name, 'executions': count, 'total_seconds': round(total, 6),
+                            'mean_ms': round(total / count * 1000, 3)}
+                           for name, (count, total) in self._stats.items()),
+                          key=lambda s: s['total_seconds'], reverse=True)
+
+
+statement_stats = StatementStats()
+
+# raw connection -> {name: prepared cursor}; entries go away with the connection
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def _prepared_cursor(cnx, name):
+    raw = getattr(cnx, 'raw', cnx)  # unwrap db_pool.PooledConnection
+    with _prepared_lock:
+        cursors = _prepared.setdefault(raw, {})
+    cursor = cursors.get(name)
+    if cursor is None:
+        cursor = cursors[name] = raw.cursor(prepared=True)
+    return cursor
+
+
+def fetch_all(cnx, name, params=()):
+    """Executes a registered statement on cnx and returns all rows as tuples."""
+    return fetch_described(cnx, name, params)[1]
+
+
+def fetch_described(cnx, name, params=()):
+    """fetch_all, also returning the cursor description: (description, rows)."""
+    cursor = _prepared_cursor(cnx, name)
+    started = time.perf_counter()
+    cursor.execute(STATEMENTS[name], params)
+    executed = time.perf_counter()
+    rows = cursor.fetchall()
+    fetched = time.perf_counter()
+    statement_stats.record(name, fetched - started)
+    record_query(STATEMENTS[name], params, executed - started)
+    record_fetch(fetched - executed, len(rows))
+    return cursor.description, rows
+
+
+def fetch_one(cnx, name, params=()):
+    """Executes a registered statement on cnx and returns its first row, or None."""
+    rows = fetch_all(cnx, name, params)
+    return rows[0] if rows else None
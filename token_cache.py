@@ -0,0 +1,80 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class TokenCache(object):
+    """
+    Bounded LRU of verified JWT payloads keyed by a SHA-256 digest of the token.
+
+    An entry is only returned for `ttl` seconds and never past the token's
+    own `exp`, so a logout recorded in the RevokedToken table by another
+    worker takes effect here within `ttl`. Tokens revoked in this process
+    are also remembered locally until they would have expired anyway.
+    """
+
+    def __init__(self, max_entries=10000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._payloads = OrderedDict()  # digest -> (payload, expires_at)
+        self._revoked = {}  # digest -> exp
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest):
+        now = time.time()
+        with self._lock:
+            entry = self._payloads.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= now:
+                del self._payloads[digest]
+                self.misses += 1
+                return None
+            self._payloads.move_to_end(digest)
+            self.hits += 1
+            return payload
+
+    def put(self, digest, payload):
+        if 'exp' not in payload:
+            return  # only tokens with a known lifetime are cached
+        with self._lock:
+            if digest in self._revoked:
+                return
+            self._payloads[digest] = (payload, min(payload['exp'], time.time() + self.ttl))
+            self._payloads.move_to_end(digest)
+            while len(self._payloads) > self.max_entries:
+                self._payloads.popitem(last=False)
+
+    def revoke(self, digest, exp):
+        now = time.time()
+        with self._lock:
+            self._payloads.pop(digest, None)
+            self._revoked[digest] = exp
+            # Forget revocations for tokens that have expired on their own
+            for expired in [d for d, e in self._revoked.items() if e <= now]:
+                del self._revoked[expired]
+
+    def is_revoked(self, digest):
+        with self._lock:
+            return digest in self._revoked
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._payloads),
+                'revoked': len(self._revoked),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+token_cache = TokenCache()
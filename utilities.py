@@ -5,23 +5,40 @@ import uuid
 from .config import Config
 import jwt
 import datetime
-from flask import Flask, request, make_response, jsonify, current_app
-
-
-def connect_to_mysql(config):
+import time
+from flask import Flask, request, make_response, jsonify, current_app, g, has_app_context
+from .db_pool import get_pool, PoolTimeoutError
+from .id_allocator import get_allocator
+from .token_cache import token_cache, token_digest
+
+
+def connect_to_mysql(config=None):
+    """
+    Returns the pooled MySQL connection for the current request.
+
+    The first call in a request checks a connection out of the pool and
+    stores it on flask.g; later calls in the same request reuse it. The
+    connection is handed back to the pool by release_request_connection
+    when the request is torn down.
+    """
+    if config is None:
+        config = current_app.config
+    if has_app_context() and 'db_cnx' in g:
+        return g.db_cnx
     try:
-        con = mysql.connector.connect(
-            host=config['MYSQL_HOST'],
-            user=config['MYSQL_USER'],
-            password=config['MYSQL_PASSWORD'],
-            database=config['MYSQL_DB'],
-            port=config['MYSQL_PORT']
-        )
-        print("Successfully connected to MYSQL")
-        return con
-    except mysql.connector.Error as err:
+        cnx = get_pool(config).connection()
+    except (mysql.connector.Error, PoolTimeoutError) as err:
         print(f"Error connecting to MySQL: {err}")
         return None
+    if has_app_context():
+        g.db_cnx = cnx
+    return cnx
+
+def release_request_connection(exception=None):
+    """Teardown handler that returns the request's connection to the pool."""
+    cnx = g.pop('db_cnx', None)
+    if cnx is not None:
+        cnx.release()
 
 # github.com/MoTechStore/Vue-JS-3-Flask-2-REST-API-and-MYSQL---CRUD-App
 def dictfetchall(cursor):
@@ -42,37 +59,16 @@ def generate_hashed_password(password, salt):
     return hash_object.hexdigest()
 
 def get_next_id(cnx, table_name, id_column):
-    """Helper function to get the next available ID."""
-#     cnx = connect_to_mysql()
-    cursor = cnx.cursor()
-    cursor.execute(f"SELECT MAX({id_column}) FROM {table_name}")
-    max_id = cursor.fetchone()[0]
-    if max_id is None:
-        return 1
-    else:
-        return max_id + 1
+    """Helper function to get the next available ID from the block allocator."""
+    return get_allocator(current_app.config).next_id(table_name, table_name, id_column)
 
 def get_next_student_id(cnx):
-    """Helper function to get the next StudentID."""
-#     cnx = connect_to_mysql()
-    cursor = cnx.cursor()
-    cursor.execute("SELECT MAX(StudentID) FROM Student")
-    max_id = cursor.fetchone()[0]
-    if max_id is None:
-        return 62001
-    else:
-        return max_id + 1
+    """Helper function to get the next StudentID (numbering starts at 62001)."""
+    return get_next_id(cnx, "Student", "StudentID")
 
 def get_next_lec_id(cnx):
     """Helper function to get the next LecId."""
-#     cnx = connect_to_mysql()
-    cursor = cnx.cursor()
-    cursor.execute("SELECT MAX(LecId) FROM Lecturer")
-    max_id = cursor.fetchone()[0]
-    if max_id is None:
-        return 1
-    else:
-        return max_id + 1
+    return get_next_id(cnx, "Lecturer", "LecId")
 
 def get_next_user_id(cnx):
     """Helper function to get the next UserId."""
@@ -102,6 +98,55 @@ def decode_jwt(token, secret_key):
         return None  # Invalid token format
 
 
+def verify_token(token):
+    """Returns the token's payload, from the verified-token cache when possible."""
+    digest = token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+    if token_cache.is_revoked(digest):
+        return None
+
+    payload = decode_jwt(token, current_app.config['SECRET_KEY'])
+    if payload and not _revoked_elsewhere(digest):
+        token_cache.put(digest, payload)
+        return payload
+    return None
+
+def _revoked_elsewhere(digest):
+    """Checks the shared RevokedToken table; fails closed when the database is unreachable."""
+    cnx = connect_to_mysql(current_app.config)
+    if cnx is None:
+        return True
+    cursor = cnx.raw.cursor()  # uninstrumented: authentication is not part of a route's query budget
+    try:
+        cursor.execute("SELECT 1 FROM RevokedToken WHERE Digest = %s", (digest,))
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+
+def revoke_token(token):
+    """
+    Revokes a valid token until it expires, for every worker. Returns False
+    if it was not valid.
+    """
+    payload = verify_token(token)
+    if not payload:
+        return False
+    digest = token_digest(token)
+    cnx = connect_to_mysql(current_app.config)
+    cursor = cnx.cursor()
+    try:
+        cursor.execute("INSERT IGNORE INTO RevokedToken (Digest, ExpiresAt) VALUES (%s, %s)",
+                       (digest, int(payload['exp'])))
+        # Revocations of tokens that have expired on their own are no longer needed
+        cursor.execute("DELETE FROM RevokedToken WHERE ExpiresAt < %s LIMIT 1000", (int(time.time()),))
+        cnx.commit()
+    finally:
+        cursor.close()
+    token_cache.revoke(digest, payload['exp'])
+    return True
+
 def token_required(f):
     """Decorator to protect routes and get user info from the token."""
     @wraps(f)
@@ -111,8 +156,7 @@ def token_required(f):
             return jsonify({'message': 'Token is missing or invalid'}), 401
 
         token = auth_header.split(' ')[1]
-        secret_key = current_app.config['SECRET_KEY']
-        payload = decode_jwt(token, secret_key)
+        payload = verify_token(token)
 
         if not payload:
             return jsonify({'message': 'Invalid token'}), 401
@@ -129,7 +173,7 @@ def get_next_course_code(cnx, department):
   """
   cursor = cnx.cursor()
   cursor.execute(
-    "SELECT MAX(CourseCode) FROM Course WHERE LEFT(CourseCode, 3) = %s",
+    "SELECT MAX(CourseCode) FROM Course WHERE DeptPrefix = %s", # indexed LEFT(CourseCode, 3)
     (department[:3].upper(),)
     )
   last_code = cursor.fetchone()[0]
@@ -145,12 +189,4 @@ def get_next_course_code(cnx, department):
 
 def get_next_course_id(cnx):
     """Helper function to get the next CourseID."""
-    cursor = cnx.cursor()
-    cursor.execute("SELECT MAX(CourseID) FROM Course")
-    max_id = cursor.fetchone()[0]
-    cursor.close()
-
-    if max_id is None:
-        return 1
-    else:
-        return int(max_id) + 1
\ No newline at end of file
+    return get_next_id(cnx, "Course", "CourseId")
@@ -0,0 +1,111 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response, current_app
+from .utilities import connect_to_mysql
+from .statements import fetch_all
+
+CATALOG = 0  # CourseVersion row for the course catalog itself
+
+
+def bump_course_version(cursor, course_id):
+    """Marks a course's content, assignments or members as changed; runs in the caller's transaction."""
+    cursor.execute("""
+        INSERT INTO CourseVersion (CourseId, Version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1
+    """, (course_id,))
+
+
+def bump_course_versions(cursor, course_ids):
+    """bump_course_version for several courses in one statement."""
+    course_ids = sorted(set(course_ids))  # fixed order keeps concurrent bulk writers from deadlocking
+    if course_ids:
+        cursor.execute("INSERT INTO CourseVersion (CourseId, Version) VALUES " +
+                       ', '.join(['(%s, 1)'] * len(course_ids)) +
+                       " ON DUPLICATE KEY UPDATE Version = Version + 1", course_ids)
+
+
+def bump_catalog_version(cursor):
+    """
+    Marks the course list as changed. Course ETags include the catalog
+    version too, so this also invalidates every per-course ETag.
+    """
+    bump_course_version(cursor, CATALOG)
+
+
+def bump_grade_version(cursor, course_id):
+    """Marks a course's grades as changed; content and member ETags are not affected."""
+    cursor.execute("""
+        INSERT INTO CourseVersion (CourseId, GradeVersion) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE GradeVersion = GradeVersion + 1
+    """, (course_id,))
+
+
+def bump_submission_grade_version(cursor, submission_id):
+    """bump_grade_version for the course a submission belongs to."""
+    cursor.execute("""
+        INSERT INTO CourseVersion (CourseId, GradeVersion)
+        SELECT A.CourseId, 1
+        FROM Submission S
+        JOIN Assignment A ON A.AssignmentId = S.AssignmentId
+        WHERE S.SubmissionId = %s
+        ON DUPLICATE KEY UPDATE GradeVersion = GradeVersion + 1
+    """, (submission_id,))
+
+
+def grade_version_key(cnx, course_id=None):
+    """
+    A key that changes whenever anything a course's grade statistics are
+    built from changes; without a course_id, when any course's does.
+    """
+    if course_id is None:
+        return tuple(fetch_all(cnx, 'version_totals')[0])
+    rows = {row[0]: tuple(row[1:]) for row in fetch_all(cnx, 'course_grade_versions', (course_id,))}
+    return rows.get(CATALOG, (0, 0)) + rows.get(course_id, (0, 0))
+
+
+def version_etag(cnx, role, course_id=None):
+    """
+    Returns the ETag for the current catalog (and course) version, the
+    caller's role and this request's URL, or None if the course does not exist.
+    """
+    versions = dict(fetch_all(cnx, 'course_versions', (course_id if course_id is not None else CATALOG,)))
+    if course_id is not None and course_id not in versions:
+        return None
+    tag = f'{request.endpoint}|{role}|{request.query_string.decode()}|{versions.get(CATALOG, 0)}'
+    if course_id is not None:
+        tag += f'|{course_id}:{versions.get(course_id, 0)}'
+    return hashlib.sha1(tag.encode('utf-8')).hexdigest()
+
+
+def conditional_on_version(roles):
+    """
+    Answers If-None-Match with 304 from the version counters alone.
+
+    Goes below @token_required. A view with a course_id argument is keyed
+    on that course's version, any other on the catalog version. 304 is only
+    given to the roles the view itself admits, and only for a course that
+    exists; anything else runs the view so its own 403 or 404 is returned.
+    The ETag is only attached to 200 responses.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(user_data, *args, **kwargs):
+            if user_data['role'] not in roles:
+                return f(user_data, *args, **kwargs)
+            cnx = connect_to_mysql(current_app.config)
+            etag = version_etag(cnx, user_data['role'], kwargs.get('course_id'))
+            if etag is None:
+                return f(user_data, *args, **kwargs)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(user_data, *args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return decorated_function
+
+    return decorator
@@ -1,16 +1,20 @@
 from flask import Blueprint, jsonify, request, current_app as app
 from .utilities import connect_to_mysql, token_required
 from .config import Config
+from .report_tables import report_freshness, add_freshness_headers
+from .response_cache import cached_response, report_cache
+from .serializer import serialize_rows
 
 views_bp = Blueprint('views', __name__)
 
 #Courses with 50 or more students
 @views_bp.route('/courses/high-enrollment', methods=['GET'])
 @token_required
+@cached_response('enrollment')
 def get_high_enrollment_courses(user_data):
     """
     Retrieves a list of courses with 50 or more students enrolled,
-    based on the 'courseswith50plusstudents' database view.
+    based on the 'CourseEnrollmentStats' report table.
     Accessible by admins and lecturers.
     """
     # Define roles allowed to access this view/report
@@ -22,32 +26,29 @@ def get_high_enrollment_courses(user_data):
     cursor = None
     try:
         cnx = connect_to_mysql(app.config)
-        cursor = cnx.cursor(dictionary=True) # Use dictionary cursor
+        cursor = cnx.cursor()
 
         cursor.execute("""
-            SELECT *
-            FROM `courseswith50plusstudents`
+            SELECT CourseId, CourseName, NumberOfStudents
+            FROM CourseEnrollmentStats
+            WHERE NumberOfStudents >= 50
+            ORDER BY CourseId
         """)
 
-        courses_raw = cursor.fetchall()
-        courses_list = []
+        courses_list = serialize_rows(cursor, {
+            'CourseId': 'course_id',
+            'CourseName': 'course_name',
+            'NumberOfStudents': 'student_count',
+        })
 
-        for course_row in courses_raw:
-
-            # Append formatted data to the list
-            courses_list.append({
-                "course_id": course_row.get('CourseId'),
-                "course_name": course_row.get('CourseName'),
-                "student_count": course_row.get('NumberOfStudents')
-            })
-
-        return jsonify(courses_list), 200
+        rebuilt_at, age_seconds = report_freshness(cnx, 'CourseEnrollmentStats')
+        return add_freshness_headers(jsonify(courses_list), rebuilt_at, age_seconds), 200
 
     except Exception as e:
         # Check for specific error like table/view not found (MySQL error code 1146)
         if "1146" in str(e):
-             app.logger.error(f"Error accessing view 'courseswith50plusstudents': View might not exist. {e}", exc_info=True)
-             return jsonify({'message': "Database view 'courseswith50plusstudents' not found or inaccessible."}), 500
+             app.logger.error(f"Error accessing report table 'CourseEnrollmentStats': Table might not exist. {e}", exc_info=True)
+             return jsonify({'message': "Report table 'CourseEnrollmentStats' not found or inaccessible."}), 500
         else:
              app.logger.error(f"Error retrieving high enrollment courses: {e}", exc_info=True)
              return jsonify({'message': f'Failed to retrieve high enrollment courses: {str(e)}'}), 500
@@ -60,10 +61,11 @@ def get_high_enrollment_courses(user_data):
 #Lecturers with 3 or more courses
 @views_bp.route('/lecturers/high-workload', methods=['GET'])
 @token_required
+@cached_response('lecturer')
 def get_high_workload_lecturers(user_data):
     """
     Retrieves a list of lecturers teaching 3 or more courses,
-    based on the 'lecturerswith3pluscourses' database view.
+    based on the 'LecturerCourseStats' report table.
     Accessible by admins.
     """
 
@@ -75,33 +77,30 @@ def get_high_workload_lecturers(user_data):
     cursor = None
     try:
         cnx = connect_to_mysql(app.config)
-        cursor = cnx.cursor(dictionary=True) # Use dictionary cursor
+        cursor = cnx.cursor()
 
         cursor.execute("""
-            SELECT *
-            FROM `lecturerswith3pluscourses`
+            SELECT LecId, LecFirstName, LecLastName, NumberOfCourses
+            FROM LecturerCourseStats
+            WHERE NumberOfCourses >= 3
+            ORDER BY LecId
         """)
 
-        lecturers_raw = cursor.fetchall()
-        lecturers_list = []
-
-        for lec_row in lecturers_raw:
+        lecturers_list = serialize_rows(cursor, {
+            'LecId': 'lecturer_id',
+            'LecFirstName': 'first_name',
+            'LecLastName': 'last_name',
+            'NumberOfCourses': 'course_count',
+        })
 
-            # Append formatted data to the list
-            lecturers_list.append({
-                "lecturer_id": lec_row.get('LecId'),
-                "first_name": lec_row.get('LecFirstName'),
-                "last_name": lec_row.get('LecLastName'),
-                "course_count": lec_row.get('NumberOfCourses')
-            })
-
-        return jsonify(lecturers_list), 200
+        rebuilt_at, age_seconds = report_freshness(cnx, 'LecturerCourseStats')
+        return add_freshness_headers(jsonify(lecturers_list), rebuilt_at, age_seconds), 200
 
     except Exception as e:
         # Check for specific error like table/view not found (MySQL error code 1146)
         if "1146" in str(e):
-             app.logger.error(f"Error accessing view 'lecturerswith3pluscourses': View might not exist. {e}", exc_info=True)
-             return jsonify({'message': "Database view 'lecturerswith3pluscourses' not found or inaccessible."}), 500
+             app.logger.error(f"Error accessing report table 'LecturerCourseStats': Table might not exist. {e}", exc_info=True)
+             return jsonify({'message': "Report table 'LecturerCourseStats' not found or inaccessible."}), 500
         else:
              app.logger.error(f"Error retrieving high workload lecturers: {e}", exc_info=True)
              return jsonify({'message': f'Failed to retrieve high workload lecturers: {str(e)}'}), 500
@@ -113,10 +112,11 @@ def get_high_workload_lecturers(user_data):
 #Students with 5 or more courses
 @views_bp.route('/students/high-load', methods=['GET'])
 @token_required
+@cached_response('enrollment')
 def get_high_load_students(user_data):
     """
     Retrieves a list of students enrolled in 5 or more courses,
-    based on the 'studentswith5pluscourses' database view.
+    based on the 'StudentCourseStats' report table.
     Accessible by admins and lecturers.
     """
     # Define roles allowed to access this view/report
@@ -128,34 +128,30 @@ def get_high_load_students(user_data):
     cursor = None
     try:
         cnx = connect_to_mysql(app.config)
-        cursor = cnx.cursor(dictionary=True) # Use dictionary cursor
+        cursor = cnx.cursor()
 
         cursor.execute("""
-            SELECT *
-            FROM `studentswith5pluscourses`
-
+            SELECT StudentID, FirstName, LastName, NumberOfCourses
+            FROM StudentCourseStats
+            WHERE NumberOfCourses >= 5
+            ORDER BY StudentID
         """)
 
-        students_raw = cursor.fetchall()
-        students_list = []
+        students_list = serialize_rows(cursor, {
+            'StudentID': 'student_id',
+            'FirstName': 'first_name',
+            'LastName': 'last_name',
+            'NumberOfCourses': 'course_count',
+        })
 
-        for student_row in students_raw:
-
-           # Append formatted data to the list
-            students_list.append({
-                "student_id": student_row.get('StudentID'),
-                "first_name": student_row.get('FirstName'),
-                "last_name": student_row.get('LastName'),
-                "course_count": student_row.get('NumberOfCourses')
-            })
-
-        return jsonify(students_list), 200
+        rebuilt_at, age_seconds = report_freshness(cnx, 'StudentCourseStats')
+        return add_freshness_headers(jsonify(students_list), rebuilt_at, age_seconds), 200
 
     except Exception as e:
         # Check for specific error like table/view not found (MySQL error code 1146)
         if "1146" in str(e):
-             app.logger.error(f"Error accessing view 'studentswith5pluscourses': View might not exist. {e}", exc_info=True)
-             return jsonify({'message': "Database view 'studentswith5pluscourses' not found or inaccessible."}), 500
+             app.logger.error(f"Error accessing report table 'StudentCourseStats': Table might not exist. {e}", exc_info=True)
+             return jsonify({'message': "Report table 'StudentCourseStats' not found or inaccessible."}), 500
         else:
              app.logger.error(f"Error retrieving high load students: {e}", exc_info=True)
              return jsonify({'message': f'Failed to retrieve high load students: {str(e)}'}), 500
@@ -167,10 +163,11 @@ def get_high_load_students(user_data):
 #Top 10 Enrolled Courses
 @views_bp.route('/courses/top-enrolled', methods=['GET'])
 @token_required
+@cached_response('enrollment')
 def get_top_10_enrolled_courses(user_data):
     """
     Retrieves the top 10 courses based on student enrollment count,
-    based on the 'top10enrolledcourses' database view.
+    based on the 'CourseEnrollmentStats' report table.
     Accessible by admins and lecturers.
     """
     # Define roles allowed to access this view/report
@@ -182,32 +179,29 @@ def get_top_10_enrolled_courses(user_data):
     cursor = None
     try:
         cnx = connect_to_mysql(app.config)
-        cursor = cnx.cursor(dictionary=True) # Use dictionary cursor
+        cursor = cnx.cursor()
 
         cursor.execute("""
-            SELECT *
-            FROM `top10enrolledcourses`
-        """) # The view should already be ordered and limited
-
-        top_courses_raw = cursor.fetchall()
-        top_courses_list = []
-
-        for course_row in top_courses_raw:
+            SELECT CourseId, CourseName, NumberOfStudents
+            FROM CourseEnrollmentStats
+            ORDER BY NumberOfStudents DESC
+            LIMIT 10
+        """)
 
-            # Append formatted data to the list
-            top_courses_list.append({
-                "course_id": course_row.get('CourseId'),
-                "course_name": course_row.get('CourseName'),
-                "enrollment_count": course_row.get('NumberOfStudents')
-            })
+        top_courses_list = serialize_rows(cursor, {
+            'CourseId': 'course_id',
+            'CourseName': 'course_name',
+            'NumberOfStudents': 'enrollment_count',
+        })
 
-        return jsonify(top_courses_list), 200
+        rebuilt_at, age_seconds = report_freshness(cnx, 'CourseEnrollmentStats')
+        return add_freshness_headers(jsonify(top_courses_list), rebuilt_at, age_seconds), 200
 
     except Exception as e:
         # Check for specific error like table/view not found (MySQL error code 1146)
         if "1146" in str(e):
-             app.logger.error(f"Error accessing view 'top10enrolledcourses': View might not exist. {e}", exc_info=True)
-             return jsonify({'message': "Database view 'top10enrolledcourses' not found or inaccessible."}), 500
+             app.logger.error(f"Error accessing report table 'CourseEnrollmentStats': Table might not exist. {e}", exc_info=True)
+             return jsonify({'message': "Report table 'CourseEnrollmentStats' not found or inaccessible."}), 500
         else:
              app.logger.error(f"Error retrieving top 10 enrolled courses: {e}", exc_info=True)
              return jsonify({'message': f'Failed to retrieve top 10 enrolled courses: {str(e)}'}), 500
@@ -220,10 +214,11 @@ def get_top_10_enrolled_courses(user_data):
 #Top 10 Students
 @views_bp.route('/students/top-performers', methods=['GET'])
 @token_required
+@cached_response('enrollment', 'grades')
 def get_top_10_students(user_data):
     """
     Retrieves the top 10 students based on their average grade across all courses,
-    based on the 'top10studentsbyaverage' database view.
+    based on the 'StudentCourseStats' report table.
     Accessible by admins and lecturers.
     """
     # Define roles allowed to access this performance view/report
@@ -235,38 +230,48 @@ def get_top_10_students(user_data):
     cursor = None
     try:
         cnx = connect_to_mysql(app.config)
-        cursor = cnx.cursor(dictionary=True) # Use dictionary cursor
+        cursor = cnx.cursor()
 
 
         cursor.execute("""
-            SELECT *
-            FROM `top10studentsbyaverage`
+            SELECT StudentID, FirstName, LastName, OverallAverage
+            FROM StudentCourseStats
+            ORDER BY OverallAverage DESC
+            LIMIT 10
         """)
 
-        top_students_raw = cursor.fetchall()
-        top_students_list = []
+        top_students_list = serialize_rows(cursor, {
+            'StudentID': 'student_id',
+            'FirstName': 'first_name',
+            'LastName': 'last_name',
+            'OverallAverage': 'average_grade',
+        })
 
-        for student_row in top_students_raw:
-
-            # Append formatted data to the list
-            top_students_list.append({
-                "student_id": student_row.get('StudentID'),
-                "first_name": student_row.get('FirstName'),
-                "last_name": student_row.get('LastName'),
-                "average_grade": student_row.get('OverallAverage')
-            })
-
-        return jsonify(top_students_list), 200
+        rebuilt_at, age_seconds = report_freshness(cnx, 'StudentCourseStats')
+        return add_freshness_headers(jsonify(top_students_list), rebuilt_at, age_seconds), 200
 
     except Exception as e:
         # Check for specific error like table/view not found (MySQL error code 1146)
         if "1146" in str(e):
-             app.logger.error(f"Error accessing view 'top10studentsbyaverage': View might not exist. {e}", exc_info=True)
-             return jsonify({'message': "Database view 'top10studentsbyaverage' not found or inaccessible."}), 500
+             app.logger.error(f"Error accessing report table 'StudentCourseStats': Table might not exist. {e}", exc_info=True)
+             return jsonify({'message': "Report table 'StudentCourseStats' not found or inaccessible."}), 500
         else:
              app.logger.error(f"Error retrieving top 10 students: {e}", exc_info=True)
              return jsonify({'message': f'Failed to retrieve top 10 students: {str(e)}'}), 500
     finally:
         # Ensure resources are closed even if errors occur
         if cursor: cursor.close()
-        if cnx: cnx.close()
\ No newline at end of file
+        if cnx: cnx.close()
+
+
+#Report cache statistics
+@views_bp.route('/reports/cache-stats', methods=['GET'])
+@token_required
+def get_report_cache_stats(user_data):
+    """
+    Returns hit/miss counters for the report response cache.
+    Accessible by admins.
+    """
+    if user_data['role'] != 'admin':
+        return jsonify({'message': 'Access denied: Insufficient privileges'}), 403
+    return jsonify(report_cache.stats()), 200